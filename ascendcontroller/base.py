@@ -38,15 +38,32 @@
 
 import os
 import re
+import glob
+import sys
 import errno
 import time
+import socket
+import hashlib
+import inspect
+import traceback
+import numpy
 import pandas
 from enum import Enum
-import multiprocessing as mp
 from typing_extensions import Self
 from abc import ABC, abstractmethod
 from multiprocessing import cpu_count
-from typing import Iterable, NamedTuple, Sequence
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union
+from ascendcontroller import shared
+from ascendcontroller import metrics
+from ascendcontroller.jobs import JobQueue
+from ascendcontroller.cache import ColumnarCache
+from ascendcontroller.executor import EXECUTORS, Executor
+from ascendcontroller.manifest import RunManifest, atomic_write
+from ascendcontroller.output import FORMATS, CsvFormat
+from ascendcontroller.writer import BackgroundWriter, Writer, completed
+from ascendcontroller import telemetry
+from ascendcontroller.telemetry import Telemetry
 
 
 class ResultType(Enum):
@@ -61,36 +78,379 @@ class ConfusionMatrix(Enum):
     FN = 4
 
 
+# Attacker types flagged as misbehavior in the VeReMi dataset
+ATTACKER_TYPES = (1, 2, 4, 8, 16)
+
+# Verdict labels indexed by the detection flag [Normal, Attack]
+RESULT_LABELS = numpy.array([ResultType.Normal.name, ResultType.Attack.name], dtype=object)
+
+# Confusion matrix labels indexed by [real attack][detected attack]
+CONFUSION_LABELS = numpy.array([
+    [ConfusionMatrix.TN.name, ConfusionMatrix.FP.name],
+    [ConfusionMatrix.FN.name, ConfusionMatrix.TP.name]
+], dtype=object)
+
+# Categorical dtypes of the verdict and confusion matrix columns
+RESULT_DTYPE = pandas.CategoricalDtype(RESULT_LABELS)
+CONFUSION_DTYPE = pandas.CategoricalDtype(CONFUSION_LABELS.ravel())
+
+
+class DerivedColumn(NamedTuple):
+    # Raw or derived columns consumed by the compute function, in argument order
+    requires: Sequence[str]
+    compute: Callable[..., numpy.ndarray]
+
+
+def _vectors(x: numpy.ndarray, y: numpy.ndarray, z: numpy.ndarray) -> numpy.ndarray:
+    return numpy.column_stack((x, y, z)).astype(float)
+
+
+def _norm(vectors: numpy.ndarray) -> numpy.ndarray:
+    return numpy.linalg.norm(vectors, axis=1)
+
+
+def _distance(sender: numpy.ndarray, receiver: numpy.ndarray) -> numpy.ndarray:
+    return numpy.linalg.norm(sender - receiver, axis=1)
+
+
+def _receiver_sender_order(receiver: numpy.ndarray, sender: numpy.ndarray) -> numpy.ndarray:
+    # Stable sort: messages of a track keep the file order
+    return numpy.lexsort((sender, receiver))
+
+
+def _sender_time_order(sender: numpy.ndarray, time: numpy.ndarray) -> numpy.ndarray:
+    return numpy.lexsort((time, sender))
+
+
+def _previous_message(order: numpy.ndarray, receiver: numpy.ndarray, sender: numpy.ndarray) -> numpy.ndarray:
+    receiver = receiver[order]
+    sender = sender[order]
+    previous = numpy.empty(len(order), dtype=numpy.intp)
+    previous[order[1:]] = order[:-1]
+    first = numpy.ones(len(order), dtype=bool)
+    first[1:] = (receiver[1:] != receiver[:-1]) | (sender[1:] != sender[:-1])
+    previous[order[first]] = -1
+    return previous
+
+
+def _pair_key(receiver: numpy.ndarray, sender: numpy.ndarray) -> numpy.ndarray:
+    return (receiver.astype(numpy.int64) << 32) | (sender.astype(numpy.int64) & 0xFFFFFFFF)
+
+
+def _first_message(key: numpy.ndarray) -> numpy.ndarray:
+    # Hash based, linear in the number of rows
+    return ~pandas.Series(key).duplicated().to_numpy()
+
+
+def _track_index(key: numpy.ndarray) -> numpy.ndarray:
+    # Hash based, tracks are numbered in order of first appearance
+    return pandas.factorize(key)[0]
+
+
+def _track_rows(index: numpy.ndarray) -> numpy.ndarray:
+    # First row of each track, written backwards so the earliest row wins
+    rows = numpy.empty(index.max() + 1 if len(index) > 0 else 0, dtype=numpy.intp)
+    rows[index[::-1]] = numpy.arange(len(index) - 1, -1, -1)
+    return rows
+
+
+def _time_delta(previous: numpy.ndarray, time: numpy.ndarray) -> numpy.ndarray:
+    return numpy.where(previous < 0, 0.0, time - time[previous])
+
+
+def _position_delta(previous: numpy.ndarray, position: numpy.ndarray) -> numpy.ndarray:
+    return numpy.where(previous < 0, 0.0, numpy.linalg.norm(position - position[previous], axis=1))
+
+
+# Derived columns shared by the features. All arrays are aligned with the rows
+# of the simulation Data Frame.
+DERIVED_COLUMNS: Dict[str, DerivedColumn] = {
+    # (x, y, z) arrays
+    'senderPosition': DerivedColumn(('pxSnd', 'pySnd', 'pzSnd'), _vectors),
+    'receiverPosition': DerivedColumn(('pxRcv', 'pyRcv', 'pzRcv'), _vectors),
+    'senderSpeed': DerivedColumn(('sxSnd', 'sySnd', 'szSnd'), _vectors),
+    # Reported sender speed magnitude
+    'senderSpeedNorm': DerivedColumn(('senderSpeed',), _norm),
+    # Sender to receiver distance
+    'distance': DerivedColumn(('senderPosition', 'receiverPosition'), _distance),
+    # Row permutations sorting the (receiver, sender) and the sender tracks
+    'receiverSenderOrder': DerivedColumn(('receiver', 'sender'), _receiver_sender_order),
+    'senderTimeOrder': DerivedColumn(('sender', 'rcvTime'), _sender_time_order),
+    'senderSendOrder': DerivedColumn(('sender', 'sendTime'), _sender_time_order),
+    # Integer key of the (receiver, sender) pair and its first message in file order
+    'pairKey': DerivedColumn(('receiver', 'sender'), _pair_key),
+    'firstMessage': DerivedColumn(('pairKey',), _first_message),
+    # Sender track of each row (one track per sent message) and first row of each track
+    'messageKey': DerivedColumn(('sender', 'messageID'), _pair_key),
+    'trackIndex': DerivedColumn(('messageKey',), _track_index),
+    'trackRows': DerivedColumn(('trackIndex',), _track_rows),
+    # Row of the previous message in the same (receiver, sender) track or -1
+    'previousMessage': DerivedColumn(('receiverSenderOrder', 'receiver', 'sender'), _previous_message),
+    # Arrival time and sender position deltas to the previous message in the track
+    'timeDelta': DerivedColumn(('previousMessage', 'rcvTime'), _time_delta),
+    'positionDelta': DerivedColumn(('previousMessage', 'senderPosition'), _position_delta),
+}
+
+
+# Compact dtypes of the raw VeReMi simulation columns
+COLUMN_DTYPES: Dict[str, str] = {
+    'Unnamed: 0': 'int64',
+    'rcvTime': 'float64', 'sendTime': 'float64', 'gpsTime': 'float64',
+    'sender': 'int32', 'messageID': 'int32', 'receiver': 'int32', 'attackerType': 'int8',
+    **{f'{kind}{axis}{side}': 'float32' for kind in 'ps' for axis in 'xyz' for side in ('Snd', 'Rcv')},
+}
+
+# Raw columns identifying each message and its ground truth
+MESSAGE_COLUMNS: Dict[str, str] = {
+    name: COLUMN_DTYPES[name] for name in ('sender', 'messageID', 'receiver', 'attackerType')
+}
+
+# Raw columns describing a sent message, equal in every received copy
+SENDER_COLUMNS = (
+    'sender', 'messageID', 'sendTime', 'gpsTime', 'pxSnd', 'pySnd', 'pzSnd', 'sxSnd', 'sySnd', 'szSnd',
+    'senderPosition', 'senderSpeed',
+)
+
+
+def raw_columns(names: Iterable[str]) -> Sequence[str]:
+    """ Raw simulation columns needed to compute the given raw or derived columns. """
+    columns = []
+    for name in names:
+        column = DERIVED_COLUMNS.get(name)
+        for raw in ([name] if column is None else raw_columns(column.requires)):
+            if raw not in columns:
+                columns.append(raw)
+    return columns
+
+
+class DerivedColumns:
+    """ Memoized derived columns of a simulation Data Frame.
+
+        Each column in DERIVED_COLUMNS is computed at most once, the first time a
+        feature asks for it, and then shared by every feature processing the same
+        Data Frame. Names not in the graph are read from the Data Frame, so features
+        also work with frames built with (x, y, z) tuple columns.
+    """
+
+    def __init__(self, data: pandas.DataFrame):
+        self.data = data
+        self.cache: Dict[str, numpy.ndarray] = {}
+        self._tracks: SenderTracks = None
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        if name not in self.cache:
+            self.cache[name] = self.compute(name)
+        return self.cache[name]
+
+    def __contains__(self, name: str) -> bool:
+        if name in self.cache or name in self.data.columns:
+            return True
+        column = DERIVED_COLUMNS.get(name)
+        return column is not None and all(dep in self for dep in column.requires)
+
+    def compute(self, name: str) -> numpy.ndarray:
+        column = DERIVED_COLUMNS.get(name)
+        if column is not None and all(dep in self for dep in column.requires):
+            return column.compute(*[self[dep] for dep in column.requires])
+        if name not in self.data.columns:
+            raise KeyError(f'Column {name} is not available in the Data Frame')
+        values = self.data[name]
+        if values.dtype == object and len(values) > 0 and isinstance(values.iloc[0], tuple):
+            return numpy.array(values.tolist(), dtype=float)
+        return values.to_numpy()
+
+    def publish(self, result: 'FeatureResult') -> List[str]:
+        """ Share the verdicts and the score of a feature result with the next features.
+
+            Verdict columns are published by name as boolean arrays and the 'score'
+            column as '{prefix}score', both in the row order of the Data Frame. Rows
+            missing from the result are not flagged (NaN score). Returns the names.
+        """
+        data = result.data
+        rows = numpy.arange(len(data)) if result.rows is None else result.rows
+        size = len(self.data)
+        names = []
+        for name in data.columns:
+            values = data[name]
+            if values.dtype == RESULT_DTYPE:
+                shared = numpy.zeros(size, dtype=bool)
+                shared[rows] = values.cat.codes.to_numpy() == 1
+            elif name == 'score':
+                name = f'{result.prefix}score'
+                shared = numpy.full(size, numpy.nan)
+                shared[rows] = values.to_numpy(dtype=float)
+            else:
+                continue
+            self.cache[name] = shared
+            names.append(name)
+        return names
+
+    @property
+    def tracks(self) -> 'SenderTracks':
+        """ Deduplicated sender tracks of the Data Frame, built on first use. """
+        if self._tracks is None:
+            self._tracks = SenderTracks(self)
+        return self._tracks
+
+
+class SenderTracks(DerivedColumns):
+    """ Derived columns of the sent messages, one row per (sender, messageID).
+
+        Every beacon appears once per receiver that heard it; the sender columns
+        (positions, speeds and send times) are equal in all the copies. Track level
+        checks run once on these rows and 'broadcast' maps their results back to
+        the rows of the simulation Data Frame, dividing the work by the average
+        number of neighbours. Columns already computed for the rows are reused.
+    """
+    # Row level derived columns equal in every copy of a message
+    SHARED = ('senderPosition', 'senderSpeed', 'senderSpeedNorm')
+
+    def __init__(self, rows: DerivedColumns):
+        self.rows = rows
+        self.index = rows['trackIndex']
+        self.first = rows['trackRows']
+        data = rows.data
+        positions = [data.columns.get_loc(name) for name in SENDER_COLUMNS if name in data.columns]
+        super().__init__(data.iloc[self.first, positions].reset_index(drop=True))
+
+    def compute(self, name: str) -> numpy.ndarray:
+        if name in self.rows.cache and (name in self.SHARED or name in self.data.columns):
+            return self.rows.cache[name][self.first]
+        return super().compute(name)
+
+    def broadcast(self, values: numpy.ndarray) -> numpy.ndarray:
+        """ Map values computed for the tracks back to the rows of the Data Frame. """
+        return values[self.index]
+
+
 class FeatureResult(NamedTuple):
     data: pandas.DataFrame
     error: RuntimeError = None
     prefix: str = ''
     suffix: str = ''
+    # Rows of the processed Data Frame in the result order, None when the order is kept
+    rows: numpy.ndarray = None
 
 
 class FeatureParam(ABC):
     # Data Frame to process
     data: pandas.DataFrame
+    # Bounds of the state streamed between chunks: entries, and seconds (in message
+    # time) an entry is kept without new messages
+    capacity = 100_000
+    ttl = 60
 
     @staticmethod
     def build(data: pandas.DataFrame) -> Self:
         raise NotImplementedError
 
 
+def _code_digest(code) -> str:
+    """ Bytecode, names and constants of a code object, without memory addresses. """
+    parts = [code.co_code.hex(), repr(code.co_names)]
+    for const in code.co_consts:
+        parts.append(_code_digest(const) if inspect.iscode(const) else repr(const))
+    return '|'.join(parts)
+
+
+def _class_digest(cls: type) -> str:
+    """ Stable description of a class without source, e.g. defined in a notebook cell.
+
+        The code of its methods and its plain attributes are described; objects
+        whose representation holds a memory address are left out.
+    """
+    parts = [cls.__qualname__]
+    for name, value in sorted(vars(cls).items()):
+        value = value.fget if isinstance(value, property) else getattr(value, '__func__', value)
+        if inspect.isfunction(value):
+            parts.append(f'{name}={_code_digest(value.__code__)}')
+        elif ' at 0x' not in repr(value):
+            parts.append(f'{name}={value!r}')
+    return '\n'.join(parts)
+
+
 class Feature(ABC):
     """ Feature Base class
 
         Extend this class to implement new algorithms.
         The 'process' method should return required value and an optional filename.
+        Features list the derived columns they consume in 'requires'; the runner
+        shares one DerivedColumns per file between all features. The factory
+        'build' must keep the rows of the input Data Frame in the same order.
+        Features declaring their raw 'inputs' let the runner load only the
+        columns (and dtypes) of their 'schema'. Features reordering the rows
+        return the original row of each result row in 'FeatureResult.rows'.
     """
+    # Derived columns consumed by the feature
+    requires: Sequence[str] = ()
+    # Raw columns and dtypes used directly or kept in the result (None loads every column)
+    inputs: Dict[str, str] = None
+    # Combines the verdicts of the features before it in the runner (see DerivedColumns.publish)
+    fusion: bool = False
 
     def __init__(self, factory: FeatureParam):
         self.factory = factory
 
     @abstractmethod
-    def process(self, data: pandas.DataFrame) -> FeatureResult:
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
         pass
 
+    def process_chunk(self, data: pandas.DataFrame, state: Dict, columns: DerivedColumns = None) -> FeatureResult:
+        """ Process one chunk of a simulation streamed in file order.
+
+            'state' belongs to the feature and is carried between the chunks of the
+            same file. Stateful features keep there the bounded context they need
+            from previous chunks; the default implementation is stateless.
+        """
+        return self.process(data, columns=columns) if self.shares_columns else self.process(data)
+
+    def schema(self) -> Dict[str, str]:
+        """ Raw columns and dtypes loaded for the feature, None when it does not declare its inputs. """
+        if self.inputs is None:
+            return None
+        schema = {name: COLUMN_DTYPES.get(name) for name in raw_columns(self.requires)}
+        schema.update(self.inputs)
+        return schema
+
+    def build(self, data: pandas.DataFrame) -> FeatureParam:
+        """ Build the feature parameters with the factory, timing it for the run telemetry. """
+        start_time = time.perf_counter()
+        params = self.factory.build(data)
+        telemetry.add_build_time(time.perf_counter() - start_time)
+        return params
+
+    @property
+    def shares_columns(self) -> bool:
+        """ Whether the runner passes the shared derived columns of the file to 'process'. """
+        return bool(self.requires) or self.fusion
+
+    @property
+    def name(self) -> str:
+        """ Feature name used in the run manifest. """
+        factory = getattr(self.factory, '__qualname__', type(self.factory).__qualname__)
+        return f'{type(self).__qualname__}.{factory}'
+
+    def signature(self) -> str:
+        """ Hash of the feature configuration.
+
+            The source of the feature and factory classes is hashed, so changing the
+            thresholds in a factory 'build' invalidates the previous results. Classes
+            without source (defined in a notebook) hash their methods code instead.
+        """
+        factory = self.factory if inspect.isclass(self.factory) else type(self.factory)
+        parts = [f'{type(self).__module__}.{self.name}']
+        for cls in (type(self), factory):
+            try:
+                parts.append(inspect.getsource(cls))
+            except (OSError, TypeError):
+                parts.append(_class_digest(cls))
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:16]
+
+    # noinspection PyMethodMayBeStatic
+    def columns(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> DerivedColumns:
+        """ Shared derived columns of the Data Frame or a new graph when not provided. """
+        return columns if columns is not None else DerivedColumns(data)
+
     # noinspection PyMethodMayBeStatic
     def confusion_matrix(self, real: bool, dectected: bool):
         if real is True and dectected is True:
@@ -102,12 +462,56 @@ class Feature(ABC):
         elif real is False and dectected is True:
             return ConfusionMatrix.FP
 
+    def evict(self, time: numpy.ndarray) -> numpy.ndarray:
+        """ Mask of the streaming state entries to keep, given the time of their last message.
+
+            Entries not updated for the factory 'ttl' seconds before the newest one
+            are evicted, then the oldest entries beyond its 'capacity'.
+        """
+        if len(time) == 0:
+            return numpy.ones(0, dtype=bool)
+        keep = time >= time.max() - self.factory.ttl
+        if numpy.count_nonzero(keep) > self.factory.capacity:
+            rows = numpy.flatnonzero(keep)
+            keep = numpy.zeros(len(time), dtype=bool)
+            keep[rows[numpy.argsort(time[rows], kind='stable')[-self.factory.capacity:]]] = True
+        return keep
+
+    # noinspection PyMethodMayBeStatic
+    def attacks(self, attacker_type: pandas.Series) -> numpy.ndarray:
+        """ Boolean array with the real attack flag for each row. """
+        return numpy.isin(attacker_type.to_numpy(), ATTACKER_TYPES)
+
+    def verdicts(
+        self, df: pandas.DataFrame, prefix: str, thresholds: Sequence, detected: numpy.ndarray
+    ) -> pandas.DataFrame:
+        """ Append the verdict and confusion matrix columns for all thresholds.
+
+            'detected' is a (rows x thresholds) boolean matrix with the attack
+            detection of each row for each threshold. The columns
+            '{prefix}{threshold}' are followed by the columns 'cmtx{threshold}',
+            all categorical with 'int8' codes.
+        """
+        detected = detected.astype(numpy.int8)
+        real = self.attacks(df.attackerType).astype(numpy.int8)
+        # Codes index the flattened CONFUSION_LABELS
+        matrix = 2 * real[:, numpy.newaxis] + detected
+        columns = {}
+        for col, threshold in enumerate(thresholds):
+            columns[f'{prefix}{threshold}'] = pandas.Categorical.from_codes(detected[:, col], dtype=RESULT_DTYPE)
+        for col, threshold in enumerate(thresholds):
+            columns[f'cmtx{threshold}'] = pandas.Categorical.from_codes(matrix[:, col], dtype=CONFUSION_DTYPE)
+        return pandas.concat([df, pandas.DataFrame(columns, index=df.index)], axis=1)
+
 
 class CsvRunner:
     def __init__(
         self, path: str, destination: str, features: Iterable[Feature],
         processes: int = 0, prefix: str = 'result', ext: str = 'csv',
-        idxfilter: Sequence = []
+        idxfilter: Sequence = [], cache: str = None, chunksize: int = 0,
+        shared_memory: bool = False, executor: Union[str, Executor] = 'processes',
+        metrics_only: bool = False, breakdown: str = None, write_behind: int = 2,
+        distributed: bool = False, lease: float = 300, minimal_columns: bool = False
     ):
         # Root path for files
         self.path = path
@@ -123,58 +527,521 @@ class CsvRunner:
         self.processes = cpu_count() if processes <= 0 else processes
         # Result file prefix
         self.prefix = prefix
-        # Result file extension
+        # Result file extension, selects the output format (CSV for unknown extensions)
         self.ext = ext
+        self.format = FORMATS.get(ext, CsvFormat)()
         # File filter indexes
         self.idxfilter = idxfilter
+        # Columnar cache of the simulation files (disabled when None)
+        self.cache = ColumnarCache(cache) if cache else None
+        # Rows per chunk in streaming mode (disabled when 0)
+        self.chunksize = chunksize
+        if chunksize > 0 and not self.format.appendable:
+            raise ValueError(f"Streaming mode requires an appendable output format, '{ext}' is not.")
+        # Run the features of each file in parallel over shared memory
+        self.shared_memory = shared_memory
+        # Share the verdicts of the features of each file with the fusion features
+        self.fused = any(feature.fusion for feature in self.features)
+        if shared_memory and self.fused:
+            raise ValueError('Fusion features require the results in the worker, shared memory mode is not supported.')
+        # Executor backend name ('serial', 'threads', 'processes' or 'isolated') or instance
+        self.executor = executor
+        # Return confusion matrix counts instead of writing the result files
+        self.metrics_only = metrics_only
+        # Column breaking down the confusion matrix counts (e.g. 'attackerType')
+        self.breakdown = breakdown
+        # Results queued for the background writer of each worker (0 writes synchronously)
+        self.write_behind = write_behind
+        # Claim the files from a job queue shared with other runners
+        self.distributed = distributed
+        if distributed and metrics_only:
+            raise ValueError('Distributed mode requires the result files, metrics-only mode is not supported.')
+        # Lease duration in seconds of the files claimed in distributed mode
+        self.lease = lease
+        # Load only the columns (and compact dtypes) declared by the features
+        self.minimal_columns = minimal_columns
+        # Completion manifest file name in the destination
+        self.manifest = 'manifest.json'
+        # Run telemetry file name in the destination
+        self.telemetry = 'telemetry.jsonl'
+        # Confusion matrix counts file name in the destination (metrics-only mode)
+        self.metrics = 'metrics.csv'
+        # Job queue file name in the destination (distributed mode)
+        self.jobs = 'jobs.db'
 
-    def process(self):
-        # Finished file list
-        finished = [int(re.search(r'\d+', f).group()) for f in os.listdir(self.destination)
-                    if os.path.isfile(f'{self.destination}{f}')]
-        finished.sort()
+    def process(self) -> pandas.DataFrame:
+        """ Run the pending features over the simulation files.
+
+            Returns the telemetry summary by feature of this run. In metrics-only
+            mode all features run, no result file is written and the confusion
+            matrix counts by feature and threshold (and breakdown column) merged
+            from all files are saved in the destination and returned instead.
+
+            In distributed mode the files are claimed from a job queue in the
+            destination, shared by all the runners started on that destination.
+        """
+        # Completed (file, feature) work
+        manifest = RunManifest(f'{self.destination}{self.manifest}')
+        # Run telemetry records
+        records = Telemetry(f'{self.destination}{self.telemetry}')
+        signatures = [feature.signature() for feature in self.features]
         # List files in current directory
         files = [f for f in os.listdir('.') if os.path.isfile(f)]
         files.sort()
-        # Filter unprocessed files
-        files = list(filter(lambda f: int(re.search(r'\d+', f).group()) not in finished, files))
         # Filter index files
         files = list(filter(lambda f: int(re.search(r'\d+', f).group()) in self.idxfilter, files))
-        # Create files Data Frame
-        simulations = pandas.Series(dtype=pandas.StringDtype(), data=files).reset_index(drop=True)
-        if simulations.count() > 0:
+        # Schedule the most expensive files first
+        files.sort(key=self.cost, reverse=True)
+        # Features not finished for each file
+        pending = [self.pending(f, manifest, signatures) for f in files]
+        # Confusion matrix counts of the finished features (metrics-only mode)
+        counts = []
+        tasks = [(f, idxs) for f, idxs in zip(files, pending) if len(idxs) > 0]
+        if len(tasks) > 0 or self.distributed:
             start_time = time.time()
             print('Running features...')
             print("Start time: " + time.strftime("%H:%M:%S.{}".format(str(start_time %
                   1)[2:])[:15], time.localtime(start_time)))
-            # Process files within workers
-            with mp.Pool(processes=self.processes) as pool:
-                pool.map(self.worker, enumerate(simulations))
+            if self.distributed:
+                self.process_distributed(files, signatures, manifest, records)
+            else:
+                self.execute(tasks, manifest, records, counts)
             elapsed = time.time() - start_time
             print("Elapsed time: " + time.strftime("%H:%M:%S.{}".format(str(elapsed %
                   1)[2:])[:15], time.gmtime(elapsed)))
+        summary = records.summary()
+        if not summary.empty:
+            print(summary.to_string())
+        if self.metrics_only:
+            counts = metrics.merge(counts)
+            atomic_write(f'{self.destination}{self.metrics}', counts.to_csv(index=False))
+            return counts
+        return summary
+
+    def pending(self, file: str, manifest: RunManifest, signatures: Sequence[str]) -> List[int]:
+        """ Indexes of the features not finished for a file.
+
+            A pending fusion feature needs the verdicts of every feature, so all
+            of them run again.
+        """
+        pending = [idx for idx, feature in enumerate(self.features)
+                   if self.metrics_only or not manifest.done(file, feature.name, signatures[idx])]
+        if any(self.features[idx].fusion for idx in pending):
+            return list(range(len(self.features)))
+        return pending
+
+    def execute(
+        self, tasks: Sequence, manifest: RunManifest, records: Telemetry, counts: List,
+        jobs: Tuple[JobQueue, str] = None
+    ):
+        """ Run the (file, features) tasks on the executor backend and record the finished work.
+
+            'jobs' is the queue and the lease owner of the tasks in distributed mode.
+        """
+        if self.shared_memory:
+            # Process the features of each file in parallel
+            self.process_shared(tasks, manifest, records, counts, jobs)
+            return
+        # Process files within workers, one file per task
+        with self.start(self.processes) as executor:
+            results = executor.imap_unordered('worker', tasks)
+            for done, (file, task_time, entries, task_records) in enumerate(results, start=1):
+                self.collect(file, entries, manifest, counts, jobs)
+                records.emit(task_records)
+                print(f'[{done}/{len(tasks)}] {file} finished in {task_time:.2f}s')
+
+    def process_distributed(self, files: Sequence, signatures: Sequence, manifest: RunManifest, records: Telemetry):
+        """ Claim the files from the job queue of the destination until every file is finished.
+
+            Each runner enqueues its pending work (jobs already queued are kept)
+            and claims batches of one file per process. The leases of the claimed
+            files are renewed while they run; when no file is left to claim, the
+            runner waits for the files leased by other runners, taking over the
+            ones whose lease expires.
+        """
+        jobs = JobQueue(f'{self.destination}{self.jobs}', self.lease)
+        owner = f'{socket.gethostname()}:{os.getpid()}'
+        index = {feature.name: idx for idx, feature in enumerate(self.features)}
+        try:
+            with jobs.lock():
+                manifest.reload()
+                pending = [(f, [self.features[idx].name for idx in self.pending(f, manifest, signatures)])
+                           for f in files]
+                jobs.enqueue([(f, names, self.cost(f)) for f, names in pending if len(names) > 0])
+            with jobs.heartbeat(owner):
+                while True:
+                    claimed = jobs.claim(owner, self.processes)
+                    if len(claimed) == 0:
+                        if jobs.remaining() == 0:
+                            break
+                        time.sleep(min(self.lease / 10, 5))
+                        continue
+                    unknown = sorted({name for _, names in claimed for name in names if name not in index})
+                    if len(unknown) > 0:
+                        raise ValueError(f'Features {unknown} queued in {jobs.path} are not configured in this '
+                                         'runner, the runners of a destination must run the same features.')
+                    tasks = [(file, [index[name] for name in names]) for file, names in claimed]
+                    print(f'{owner} claimed {", ".join(file for file, _ in claimed)}')
+                    self.execute(tasks, manifest, records, [], (jobs, owner))
+        finally:
+            jobs.close()
+
+    # noinspection PyMethodMayBeStatic
+    def collect(
+        self, file: str, entries: Sequence, manifest: RunManifest, counts: List, jobs: Tuple[JobQueue, str] = None
+    ):
+        """ Record the finished features of a file: manifest entries or confusion matrix counts.
+
+            In distributed mode ('jobs' is the queue and the lease owner) the
+            manifest is merged with the entries of the other runners and the job
+            is completed under the queue lock.
+        """
+        if self.metrics_only:
+            counts.extend(entries)
+            return
+        if jobs is None:
+            for entry in entries:
+                manifest.record(file, entry)
+            manifest.save()
+            return
+        queue, owner = jobs
+        with queue.lock():
+            manifest.reload()
+            for entry in entries:
+                manifest.record(file, entry)
+            manifest.save()
+            queue.complete(file, owner, [entry['feature'] for entry in entries])
+
+    def start(self, workers: int) -> Executor:
+        """ Start the executor backend with the given number of workers. """
+        executor = self.executor
+        if isinstance(executor, str):
+            executor = EXECUTORS[executor](workers)
+        return executor.start(self)
+
+    def writer(self) -> Writer:
+        """ Writer of the results of one worker task. """
+        return BackgroundWriter(self.write_behind) if self.write_behind > 0 else Writer()
 
     # noinspection PyMethodMayBeStatic
-    def worker(self, sim):
+    def cost(self, file: str) -> int:
+        """ Estimated processing cost of a simulation file (its size in bytes). """
+        return os.path.getsize(file)
+
+    # noinspection PyMethodMayBeStatic
+    def worker(self, task):
+        file, pending = task
+        features = [self.features[idx] for idx in pending]
+        start_time = time.time()
+        entries = []
+        records = []
         try:
-            idsim, file = sim
             # print(f'Processing file {file} on Thread "{mp.current_process().name}"...')
-            data_frame = pandas.read_csv(file)
-            # Run all features for each simulation file.
-            for feature in self.features:
+            if self.chunksize > 0:
+                entries, records = self.stream(file, features)
+                return file, time.time() - start_time, entries, records
+            load_time = time.perf_counter()
+            data_frame = self.read(file)
+            load_time = time.perf_counter() - load_time
+            # Derived columns shared by all features
+            columns = DerivedColumns(data_frame)
+            # Run all features for each simulation file, writing the results in background.
+            with self.writer() as writer:
+                futures = [self.run(file, feature, data_frame, columns, load_time, writer) for feature in features]
+                for future in futures:
+                    entry, record = future.result()
+                    records.append(record)
+                    if entry is not None:
+                        entries.append(entry)
+        except Exception as e:
+            records.append(self.failure(file, None, e))
+        return file, time.time() - start_time, entries, records
+
+    # noinspection PyMethodMayBeStatic
+    def failure(self, file: str, feature: Feature, error: Exception, record: Dict = None) -> Dict:
+        """ Report an exception raised while processing a file and return its telemetry record. """
+        name = None if feature is None else feature.name
+        trace = traceback.format_exc() if sys.exc_info()[0] is not None else ''
+        print(f'Error processing {file} on feature {name}. Error: {error}\n{trace}')
+        record = Telemetry.record(file, name) if record is None else record
+        record['error'] = repr(error)
+        return Telemetry.finish(record)
+
+    def abandoned(self, method: str, task, pid: int):
+        """ Remove the temporary outputs of a task attempt process stopped before it finished. """
+        for temporary in glob.glob(self.temporary(f'{glob.escape(self.destination)}*', pid)):
+            os.remove(temporary)
+
+    def failed(self, method: str, task, error: Exception):
+        """ Result of a task abandoned by the executor, e.g. timed out on every attempt. """
+        if method == 'feature_worker':
+            file, _, idx, _ = task
+            return None, self.failure(file, self.features[idx], error)
+        file, pending = task
+        return file, 0.0, [], [self.failure(file, self.features[idx], error) for idx in pending]
+
+    def run(
+        self, file: str, feature: Feature, data_frame: pandas.DataFrame, columns: DerivedColumns, load_time: float,
+        writer: Writer
+    ) -> Future:
+        """ Run one feature over a loaded simulation and submit its result to the writer.
+
+            Returns a future of the manifest entry and telemetry record of the feature.
+            In metrics-only mode the entry is the confusion matrix counts of the result.
+        """
+        record = Telemetry.record(file, feature.name, len(data_frame), load_time)
+        try:
+            telemetry.reset_build_time()
+            process_time = time.perf_counter()
+            if feature.shares_columns:
+                result: FeatureResult = feature.process(data_frame, columns=columns)
+            else:
                 result: FeatureResult = feature.process(data_frame)
-                # Check for current feature output error
-                if result.error is not None:
-                    print(f'Error processing {file} on feature {feature}. Error: {result.error}')
+            record['build'] = telemetry.build_time()
+            record['process'] = time.perf_counter() - process_time - record['build']
+        except Exception as e:
+            return completed((None, self.failure(file, feature, e, record)))
+        # Check for current feature output error
+        if result.error is not None:
+            print(f'Error processing {file} on feature {feature}. Error: {result.error}')
+            record['error'] = str(result.error)
+            return completed((None, Telemetry.finish(record)))
+        if self.fused:
+            columns.publish(result)
+        if self.metrics_only:
+            return completed((self.counts(feature, result.data), Telemetry.finish(record)))
+        return writer.submit(self.save, file, feature, result, record)
+
+    def save(self, file: str, feature: Feature, result: FeatureResult, record: Dict) -> Tuple[Dict, Dict]:
+        """ Write and publish a feature result and return its manifest entry and telemetry record. """
+        try:
+            write_time = time.perf_counter()
+            output_file = self.commit(self.write(file, result))
+            record['write'] = time.perf_counter() - write_time
+        except Exception as e:
+            self.discard(self.output_file(file, result))
+            return None, self.failure(file, feature, e, record)
+        elapsed = record['build'] + record['process'] + record['write']
+        return RunManifest.entry(feature.name, feature.signature(), output_file, elapsed), \
+            Telemetry.finish(record, output_file)
+
+    def process_shared(
+        self, tasks: Sequence, manifest: RunManifest, records: Telemetry, counts: List,
+        jobs: Tuple[JobQueue, str] = None
+    ):
+        """ Process the files one at a time running their features in parallel.
+
+            The numeric columns of each simulation and the derived columns required
+            by the features are published in shared memory, and the feature workers
+            attach to them without copying the Data Frame.
+        """
+        shared.prepare()
+        with self.start(min(self.processes, len(self.features))) as executor:
+            for done, (file, pending) in enumerate(tasks, start=1):
+                start_time = time.time()
+                try:
+                    load_time = time.perf_counter()
+                    data_frame = self.read(file)
+                    load_time = time.perf_counter() - load_time
+                    columns = DerivedColumns(data_frame)
+                    required = {name for idx in pending for name in self.features[idx].requires}
+                    frame, blocks = shared.publish(data_frame, {name: columns[name] for name in required})
+                    del data_frame, columns
+                except Exception as e:
+                    records.emit([self.failure(file, None, e)])
+                    self.collect(file, [], manifest, counts, jobs)
                     continue
-                else:
-                    # If the main data is not empty, save the CSV file.
-                    if not result.data.empty:
-                        idx = int(re.search(r'\d+', file).group())
-                        output_file = f'{self.destination}{result.prefix}{self.prefix}{idx:03d}{result.suffix}.{self.ext}'
-                        result.data.to_csv(output_file)
+                try:
+                    results = executor.map('feature_worker', [(file, frame, idx, load_time) for idx in pending])
+                finally:
+                    shared.release(blocks)
+                self.collect(file, [entry for entry, _ in results if entry is not None], manifest, counts, jobs)
+                records.emit([record for _, record in results])
+                print(f'[{done}/{len(tasks)}] {file} finished in {time.time() - start_time:.2f}s')
+
+    # noinspection PyMethodMayBeStatic
+    def feature_worker(self, task):
+        file, frame, idx, load_time = task
+        feature = self.features[idx]
+        blocks = []
+        try:
+            data_frame, derived, blocks = shared.attach(frame)
+            columns = DerivedColumns(data_frame)
+            columns.cache.update(derived)
+            return self.run(file, feature, data_frame, columns, load_time, Writer()).result()
         except Exception as e:
-            print(e)
+            return None, self.failure(file, feature, e)
+        finally:
+            data_frame = derived = columns = None
+            shared.detach(blocks)
+
+    def stream(self, file: str, features: Sequence[Feature]) -> Tuple[Sequence, Sequence]:
+        """ Run the features over time-ordered chunks of a simulation file.
+
+            Each feature keeps its own state between chunks and the results are
+            appended to the output files in background, so memory is bounded by
+            the chunk size and the writer queue depth.
+            Returns the manifest entries (confusion matrix counts in metrics-only
+            mode) and telemetry records of the features.
+        """
+        states = [{} for _ in features]
+        outputs = [None for _ in features]
+        parts = [[] for _ in features]
+        writes = [[] for _ in features]
+        records = [Telemetry.record(file, feature.name) for feature in features]
+        failed = set()
+        load_time = 0.0
+        chunks = iter(self.chunks(file))
+        with self.writer() as writer:
+            while True:
+                chunk_time = time.perf_counter()
+                chunk = next(chunks, None)
+                load_time += time.perf_counter() - chunk_time
+                if chunk is None:
+                    break
+                # Derived columns shared by all features for the current chunk
+                columns = DerivedColumns(chunk)
+                for idx, feature in enumerate(features):
+                    if idx in failed:
+                        continue
+                    record = records[idx]
+                    record['rows'] += len(chunk)
+                    try:
+                        telemetry.reset_build_time()
+                        process_time = time.perf_counter()
+                        result: FeatureResult = feature.process_chunk(chunk, states[idx], columns=columns)
+                        record['build'] += telemetry.build_time()
+                        record['process'] += time.perf_counter() - process_time - telemetry.build_time()
+                    except Exception as e:
+                        self.failure(file, feature, e, record)
+                        failed.add(idx)
+                        continue
+                    if result.error is not None:
+                        print(f'Error processing {file} on feature {feature}. Error: {result.error}')
+                        record['error'] = str(result.error)
+                        failed.add(idx)
+                        continue
+                    if self.fused:
+                        columns.publish(result)
+                    if self.metrics_only:
+                        parts[idx].append(self.counts(feature, result.data))
+                        continue
+                    # If the chunk result is empty, there is nothing to save.
+                    if result.data.empty:
+                        continue
+                    append = outputs[idx] is not None
+                    outputs[idx] = self.output_file(file, result)
+                    writes[idx].append(writer.submit(self.append, file, result, append, record))
+        # Publish the finished outputs
+        entries = []
+        for idx, feature in enumerate(features):
+            records[idx]['load'] = load_time
+            for write in writes[idx]:
+                try:
+                    write.result()
+                except Exception as e:
+                    if idx not in failed:
+                        self.failure(file, feature, e, records[idx])
+                        failed.add(idx)
+            if idx in failed:
+                # Remove the partial output of the failed feature
+                self.discard(outputs[idx])
+                Telemetry.finish(records[idx])
+                continue
+            if self.metrics_only:
+                entries.append(metrics.merge(parts[idx]))
+                Telemetry.finish(records[idx])
+                continue
+            output_file = self.commit(outputs[idx])
+            elapsed = records[idx]['build'] + records[idx]['process'] + records[idx]['write']
+            entries.append(RunManifest.entry(feature.name, feature.signature(), output_file, elapsed))
+            Telemetry.finish(records[idx], output_file)
+        return entries, records
+
+    def append(self, file: str, result: FeatureResult, append: bool, record: Dict):
+        """ Write a chunk result, accumulating the write time in the telemetry record. """
+        write_time = time.perf_counter()
+        self.write(file, result, append)
+        record['write'] += time.perf_counter() - write_time
+
+    def counts(self, feature: Feature, data: pandas.DataFrame) -> pandas.DataFrame:
+        """ Confusion matrix counts of a feature result. """
+        counts = metrics.counts(data, self.breakdown)
+        counts.insert(0, 'feature', feature.name)
+        return counts
+
+    def output_file(self, file: str, result: FeatureResult) -> str:
+        idx = int(re.search(r'\d+', file).group())
+        return f'{self.destination}{result.prefix}{self.prefix}{idx:03d}{result.suffix}.{self.ext}'
+
+    def write(self, file: str, result: FeatureResult, append: bool = False) -> str:
+        """ Write the result into the temporary file of its output, None when the result is empty. """
+        # If the main data is empty, there is nothing to save.
+        if result.data.empty:
+            return None
+        output_file = self.output_file(file, result)
+        self.format.write(result.data, self.temporary(output_file), append)
+        return output_file
+
+    # noinspection PyMethodMayBeStatic
+    def temporary(self, output_file: str, pid: int = None) -> str:
+        """ Temporary file of an output, unique per host and process so runners never share it. """
+        return f'{output_file}.{socket.gethostname()}-{os.getpid() if pid is None else pid}.tmp'
+
+    def commit(self, output_file: str) -> str:
+        """ Move a finished output from its temporary file to the final name. """
+        if output_file is not None:
+            os.replace(self.temporary(output_file), output_file)
+        return output_file
+
+    def discard(self, output_file: str):
+        """ Remove the temporary file of an unfinished output, if any. """
+        if output_file is not None and os.path.exists(self.temporary(output_file)):
+            os.remove(self.temporary(output_file))
+
+    def schema(self) -> Dict[str, str]:
+        """ Union of the feature schemas, None (every column) when a feature does not declare it. """
+        schema = {}
+        for feature in self.features:
+            columns = feature.schema()
+            if columns is None:
+                return None
+            for name, dtype in columns.items():
+                if dtype is not None and schema.get(name) is not None:
+                    dtype = numpy.promote_types(schema[name], dtype).name
+                schema[name] = dtype if dtype is not None else schema.get(name)
+        return schema
+
+    def options(self) -> Dict:
+        """ Keyword arguments of 'read_csv' loading only the columns of the schema.
+
+            Column pruning is opt-in ('minimal_columns'): the factories 'build' of
+            the features must then not expect columns outside their schema.
+        """
+        schema = self.schema() if self.minimal_columns else None
+        if schema is None:
+            return {}
+        return {'usecols': list(schema), 'dtype': {name: dtype for name, dtype in schema.items() if dtype}}
+
+    def select(self, data: pandas.DataFrame) -> pandas.DataFrame:
+        """ Columns of the schema of a cached simulation, in file order and with their dtypes. """
+        options = self.options()
+        if len(options) == 0:
+            return data
+        return data[[c for c in data.columns if c in options['usecols']]].astype(options['dtype'], copy=False)
+
+    def read(self, file: str) -> pandas.DataFrame:
+        if self.cache is not None:
+            return self.select(self.cache.load(file))
+        return pandas.read_csv(file, **self.options())
+
+    def chunks(self, file: str) -> Iterable[pandas.DataFrame]:
+        if self.cache is not None:
+            data = self.cache.load(file)
+            for start in range(0, len(data), self.chunksize):
+                yield self.select(data.iloc[start:start + self.chunksize]).copy()
+        else:
+            yield from pandas.read_csv(file, chunksize=self.chunksize, **self.options())
 
     def create_destination(self):
         dest = self.destination
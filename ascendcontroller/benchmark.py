@@ -0,0 +1,224 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+"""
+    Benchmark suite for the ASCEND Controller features.
+
+    Generates VeReMi-shaped simulation frames with a given number of rows and
+    times each feature end to end (FeatureParam.build + process). Results are
+    appended as JSON lines to a history file so performance changes can be
+    compared between commits:
+
+        python -m ascendcontroller.benchmark --rows 10000 100000 --features art ssc
+"""
+
+import sys
+import json
+import time
+import numpy
+import pandas
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Sequence
+from ascendcontroller.base import Feature, FeatureParam
+from ascendcontroller.features.art import ArtFeature, ArtFeatureParam
+from ascendcontroller.features.dmv import DmvFeature, DmvFeatureParam
+from ascendcontroller.features.ssc import SscFeature, SscFeatureParam
+from ascendcontroller.features.saw import SawFeature, SawFeatureParam
+
+# Default benchmark sizes
+ROWS = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Raw VeReMi columns not used by the features
+UNUSED_COLUMNS = ['Unnamed: 0', 'sendTime', 'gpsTime', 'pxSnd', 'pySnd', 'pzSnd', 'sxSnd', 'sySnd', 'szSnd',
+                  'pxRcv', 'pyRcv', 'pzRcv', 'sxRcv', 'syRcv', 'szRcv']
+
+
+def simulation(rows: int, attackers: float = 0.3, seed: int = 0) -> pandas.DataFrame:
+    """ Generate a VeReMi-shaped simulation Data Frame with the given number of rows.
+
+        Vehicles move on straight lines sending one beacon per second, and every
+        beacon is received by up to 10 neighbors. A fraction of the vehicles are
+        attackers of a random VeReMi type.
+    """
+    rng = numpy.random.default_rng(seed)
+    vehicles = int(numpy.clip(rows // 1000, 20, 2000))
+    neighbors = min(10, vehicles - 1)
+    steps = -(-rows // (vehicles * neighbors))
+
+    # Vehicle kinematics
+    origin = rng.uniform(0, 5000, (vehicles, 2))
+    velocity = rng.uniform(-20, 20, (vehicles, 2))
+    attacker = numpy.where(rng.random(vehicles) < attackers, rng.choice([1, 2, 4, 8, 16], vehicles), 0)
+
+    # One row per (beacon, receiver)
+    step = numpy.repeat(numpy.arange(steps), vehicles * neighbors)[:rows]
+    sender = numpy.tile(numpy.repeat(numpy.arange(vehicles), neighbors), steps)[:rows]
+    receiver = (sender + numpy.tile(numpy.arange(1, neighbors + 1), steps * vehicles)[:rows]) % vehicles
+    send_time = step.astype(float) + sender / vehicles
+    rcv_time = send_time + rng.uniform(0, 0.01, rows)
+
+    sender_pos = origin[sender] + velocity[sender] * send_time[:, numpy.newaxis]
+    receiver_pos = origin[receiver] + velocity[receiver] * rcv_time[:, numpy.newaxis]
+    sender_type = attacker[sender]
+    sender_pos[sender_type == 1] = (5560, 5820)
+    sender_pos[sender_type == 2] += (250, -150)
+    # Random positions are drawn per beacon, all received copies are equal
+    beacon = step * vehicles + sender
+    random = sender_type == 4
+    sender_pos[random] = rng.uniform(0, 5000, (steps * vehicles, 2))[beacon[random]]
+    random = sender_type == 8
+    sender_pos[random] += rng.uniform(-300, 300, (steps * vehicles, 2))[beacon[random]]
+    sender_pos[sender_type == 16] = origin[sender[sender_type == 16]]
+
+    data = pandas.DataFrame({
+        'Unnamed: 0': numpy.arange(rows),
+        'rcvTime': rcv_time,
+        'sendTime': send_time,
+        'gpsTime': send_time - 0.1,
+        'sender': sender + 1,
+        'messageID': beacon,
+        'pxSnd': sender_pos[:, 0], 'pySnd': sender_pos[:, 1], 'pzSnd': 0.0,
+        'sxSnd': velocity[sender, 0], 'sySnd': velocity[sender, 1], 'szSnd': 0.0,
+        'pxRcv': receiver_pos[:, 0], 'pyRcv': receiver_pos[:, 1], 'pzRcv': 0.0,
+        'sxRcv': velocity[receiver, 0], 'syRcv': velocity[receiver, 1], 'szRcv': 0.0,
+        'receiver': receiver + 1,
+        'attackerType': sender_type,
+    })
+    return data.sort_values('rcvTime', kind='stable', ignore_index=True)
+
+
+def _prepare(param: FeatureParam, data: pandas.DataFrame, thresholds: Sequence, keep: Sequence = ()) -> FeatureParam:
+    param.thresholds = thresholds
+    param.data = data.drop(columns=[c for c in UNUSED_COLUMNS if c not in keep], errors='ignore')
+    return param
+
+
+class ArtParam(ArtFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(ArtParam(), data, [100, 200, 300, 400, 450, 500, 550, 600, 700, 800])
+
+
+class SawParam(SawFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(SawParam(), data, [25, 100, 200])
+
+
+class SscParam(SscFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(SscParam(), data, [2.5, 5, 7.5, 10, 15, 20, 25])
+
+
+class DmvParam(DmvFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(DmvParam(), data, [1, 5, 10, 15, 20, 25])
+
+
+# Benchmarked features by name
+FEATURES: Dict[str, Feature] = {
+    'art': ArtFeature(factory=ArtParam),
+    'saw': SawFeature(factory=SawParam),
+    'ssc': SscFeature(factory=SscParam),
+    'dmv': DmvFeature(factory=DmvParam),
+}
+
+
+def revision() -> str:
+    """ Current git commit of the package, None outside a git checkout. """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(feature: Feature, data: pandas.DataFrame, memory: bool = True) -> Dict:
+    """ Time one feature end to end and, optionally, trace its peak memory in a second run. """
+    start_time = time.perf_counter()
+    result = feature.process(data.copy())
+    elapsed = time.perf_counter() - start_time
+    peak = None
+    if memory:
+        tracemalloc.start()
+        feature.process(data.copy())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {'seconds': elapsed, 'rows_per_sec': len(data) / elapsed if elapsed > 0 else None,
+            'peak_bytes': peak, 'output_rows': len(result.data), 'output_columns': len(result.data.columns)}
+
+
+def run(
+    rows: Sequence[int] = ROWS, features: Sequence[str] = tuple(FEATURES),
+    history: str = 'benchmark-history.jsonl', memory: bool = True, seed: int = 0
+) -> pandas.DataFrame:
+    """ Run the benchmark and append the results to the history file. """
+    environment = {
+        'revision': revision(), 'python': platform.python_version(),
+        'numpy': numpy.__version__, 'pandas': pandas.__version__, 'machine': platform.machine()
+    }
+    results = []
+    for count in rows:
+        data = simulation(count, seed=seed)
+        for name in features:
+            record = {'time': time.time(), 'feature': name, 'rows': count, **environment,
+                      **measure(FEATURES[name], data, memory)}
+            results.append(record)
+            print(f"{name:>4} {count:>10} rows: {record['seconds']:10.3f}s", file=sys.stderr)
+            if history:
+                with open(history, 'a') as fp:
+                    fp.write(json.dumps(record) + '\n')
+    return pandas.DataFrame(results)
+
+
+def main(args: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the ASCEND Controller features.')
+    parser.add_argument('--rows', type=int, nargs='+', default=ROWS, help='simulation sizes in rows')
+    parser.add_argument('--features', nargs='+', choices=list(FEATURES), default=list(FEATURES))
+    parser.add_argument('--history', default='benchmark-history.jsonl', help='JSON-lines history file')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(args)
+    results = run(options.rows, options.features, options.history, not options.no_memory, options.seed)
+    print(results[['feature', 'rows', 'seconds', 'rows_per_sec', 'peak_bytes']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
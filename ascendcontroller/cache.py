@@ -0,0 +1,110 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import numpy
+import pandas
+from typing import Dict
+
+
+class ColumnarCache:
+    """ Binary columnar cache of the simulation CSV files.
+
+        Each CSV file is converted once into a directory with one '.npy' file per
+        column and a 'manifest.json' with the column names and the size and
+        modification time of the source file. Numeric columns are loaded back with
+        memory mapping (copy-on-write), so loading a cached file costs almost
+        nothing. The cache of a file is rebuilt whenever its source changes.
+    """
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path: str = '.cache'):
+        # Root path for cached files
+        self.path = path
+
+    def location(self, file: str) -> str:
+        return os.path.join(self.path, os.path.basename(file))
+
+    # noinspection PyMethodMayBeStatic
+    def source(self, file: str) -> Dict:
+        stat = os.stat(file)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def manifest(self, file: str) -> Dict:
+        try:
+            with open(os.path.join(self.location(file), ColumnarCache.MANIFEST)) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def valid(self, file: str) -> bool:
+        manifest = self.manifest(file)
+        return manifest is not None and manifest['source'] == self.source(file)
+
+    def load(self, file: str) -> pandas.DataFrame:
+        """ Load a simulation file from the cache, converting it first when needed. """
+        if not self.valid(file):
+            return self.convert(file)
+        location = self.location(file)
+        columns = {}
+        for name, filename, numeric in self.manifest(file)['columns']:
+            columns[name] = numpy.load(os.path.join(location, filename),
+                                       mmap_mode='c' if numeric else None, allow_pickle=not numeric)
+        return pandas.DataFrame(columns, copy=False)
+
+    def convert(self, file: str, data: pandas.DataFrame = None) -> pandas.DataFrame:
+        """ Write the cache of a simulation file and return its Data Frame. """
+        source = self.source(file)
+        data = pandas.read_csv(file) if data is None else data
+        location = self.location(file)
+        os.makedirs(location, exist_ok=True)
+        columns = []
+        for idx, name in enumerate(data.columns):
+            values = data[name].to_numpy()
+            numeric = values.dtype != object
+            filename = f'c{idx:03d}.npy'
+            numpy.save(os.path.join(location, filename), values, allow_pickle=not numeric)
+            columns.append((name, filename, numeric))
+        # The manifest is written last, a partial cache is never valid
+        manifest = {'source': source, 'rows': len(data), 'columns': columns}
+        temp = os.path.join(location, f'{ColumnarCache.MANIFEST}.tmp')
+        with open(temp, 'w') as fp:
+            json.dump(manifest, fp)
+        os.replace(temp, os.path.join(location, ColumnarCache.MANIFEST))
+        return data
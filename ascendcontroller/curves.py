@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+from typing import Iterable
+from typing_extensions import Self
+from ascendcontroller import output
+from ascendcontroller.base import ATTACKER_TYPES
+
+
+class Curve:
+    """ Exact precision/recall, ROC and F1 curves of a continuous feature score.
+
+        Features emit a 'score' column where larger values are more suspicious,
+        a row being detected at the cut 'c' when 'score >= c'. The curve keeps,
+        for every distinct score, the number of attack and normal rows, so any
+        number of results (files or chunks) is added one at a time with memory
+        bounded by the distinct scores ('decimals' rounds the scores to bound it
+        further). The metrics at every cut come from one sort and cumulative sums.
+    """
+
+    def __init__(self, decimals: int = None):
+        # Score rounding (exact scores when None)
+        self.decimals = decimals
+        self.values = numpy.empty(0)
+        self.positives = numpy.empty(0, dtype=numpy.int64)
+        self.negatives = numpy.empty(0, dtype=numpy.int64)
+
+    def add(self, score: numpy.ndarray, real: numpy.ndarray) -> Self:
+        """ Add the scores and the real attack flags of a result. """
+        score = numpy.asarray(score, dtype=float)
+        if self.decimals is not None:
+            score = numpy.round(score, self.decimals)
+        # Rows without score are never detected
+        score = numpy.where(numpy.isnan(score), -numpy.inf, score)
+        real = numpy.asarray(real, dtype=bool)
+        self.merge(score[real], score[~real])
+        return self
+
+    def merge(self, positives: numpy.ndarray, negatives: numpy.ndarray):
+        values = numpy.concatenate((self.values, positives, negatives))
+        attack = numpy.concatenate((self.positives, numpy.ones(len(positives)), numpy.zeros(len(negatives))))
+        normal = numpy.concatenate((self.negatives, numpy.zeros(len(positives)), numpy.ones(len(negatives))))
+        self.values, inverse = numpy.unique(values, return_inverse=True)
+        inverse = inverse.ravel()
+        self.positives = numpy.bincount(inverse, attack, len(self.values)).astype(numpy.int64)
+        self.negatives = numpy.bincount(inverse, normal, len(self.values)).astype(numpy.int64)
+
+    def add_result(self, data: pandas.DataFrame) -> Self:
+        """ Add a feature result with the 'score' and 'attackerType' columns. """
+        real = numpy.isin(data['attackerType'].to_numpy(), ATTACKER_TYPES)
+        return self.add(data['score'].to_numpy(dtype=float), real)
+
+    def table(self) -> pandas.DataFrame:
+        """ Confusion matrix and metrics at every distinct score cut, from the highest cut. """
+        values = self.values[::-1]
+        tp = numpy.cumsum(self.positives[::-1])
+        fp = numpy.cumsum(self.negatives[::-1])
+        positives = tp[-1] if len(tp) > 0 else 0
+        negatives = fp[-1] if len(fp) > 0 else 0
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            precision = tp / (tp + fp)
+            recall = tp / positives if positives > 0 else numpy.full(len(tp), numpy.nan)
+            fpr = fp / negatives if negatives > 0 else numpy.full(len(fp), numpy.nan)
+            f1 = 2 * tp / (2 * tp + fp + (positives - tp))
+        return pandas.DataFrame({
+            'threshold': values,
+            'TP': tp, 'FP': fp, 'TN': negatives - fp, 'FN': positives - tp,
+            'Precision': precision, 'Recall': recall, 'FPR': fpr, 'F1': f1,
+        })
+
+    def roc_auc(self) -> float:
+        """ Area under the ROC curve. """
+        table = self.table()
+        if len(table) == 0:
+            return numpy.nan
+        fpr = numpy.r_[0, table.FPR]
+        tpr = numpy.r_[0, table.Recall]
+        return float(numpy.sum(numpy.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def average_precision(self) -> float:
+        """ Area under the precision/recall curve as the recall-weighted mean precision. """
+        table = self.table()
+        if len(table) == 0:
+            return numpy.nan
+        return float(numpy.sum(numpy.diff(numpy.r_[0, table.Recall]) * table.Precision))
+
+    def best(self) -> pandas.Series:
+        """ Cut with the highest F1 score. """
+        table = self.table()
+        return table.loc[table.F1.idxmax()]
+
+
+def curve(files: Iterable[str], decimals: int = None) -> Curve:
+    """ Curve of the results in the given files, read one file at a time. """
+    result = Curve(decimals)
+    for file in files:
+        result.add_result(output.read(file))
+    return result
@@ -0,0 +1,353 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import time
+import statistics
+import multiprocessing as mp
+from collections import deque
+from typing_extensions import Self
+from abc import ABC, abstractmethod
+from multiprocessing import cpu_count
+from multiprocessing.connection import wait
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Iterable, Iterator, List, NamedTuple, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Target object of the current process pool worker
+_target = None
+
+
+def _initialize(target: Any):
+    global _target
+    _target = target
+
+
+def _call(call):
+    method, task = call
+    return getattr(_target, method)(task)
+
+
+def _attempt(target: Any, method: str, task: Any, memory: int, connection):
+    # Address space limit of the attempt process
+    if memory is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    connection.send(getattr(target, method)(task))
+    connection.close()
+
+
+class Executor(ABC):
+    """ Executor Base class
+
+        Executors run tasks by calling a method of a target object (the runner)
+        for each task. The target is given once in 'start', so backends that
+        need to ship it to other processes do it once per worker, not per task.
+        Backends that give up on a task return 'target.failed(method, task, error)'
+        as its result, and backends that stop a task attempt process before it
+        finishes call 'target.abandoned(method, task, pid)' to remove its
+        partial outputs.
+    """
+
+    def __init__(self, workers: int = 0):
+        # Number of workers
+        self.workers = cpu_count() if workers <= 0 else workers
+        self.target = None
+
+    def start(self, target: Any) -> Self:
+        self.target = target
+        return self
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def imap_unordered(self, method: str, tasks: Iterable) -> Iterator:
+        """ Run 'target.method(task)' for each task, yielding results as they finish. """
+        pass
+
+    @abstractmethod
+    def map(self, method: str, tasks: Iterable) -> List:
+        """ Run 'target.method(task)' for each task, returning results in task order. """
+        pass
+
+    def __getstate__(self):
+        # Pools and the target are never shipped to the workers
+        state = dict(self.__dict__)
+        state.pop('pool', None)
+        state['target'] = None
+        return state
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SerialExecutor(Executor):
+    """ Runs every task in the calling thread, useful for profiling. """
+
+    def imap_unordered(self, method: str, tasks: Iterable) -> Iterator:
+        function = getattr(self.target, method)
+        for task in tasks:
+            yield function(task)
+
+    def map(self, method: str, tasks: Iterable) -> List:
+        return list(self.imap_unordered(method, tasks))
+
+
+class ThreadExecutor(Executor):
+    """ Runs the tasks in a thread pool, for vectorized features releasing the GIL. """
+
+    def start(self, target: Any) -> Self:
+        super().start(target)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def close(self):
+        self.pool.shutdown()
+
+    def imap_unordered(self, method: str, tasks: Iterable) -> Iterator:
+        function = getattr(self.target, method)
+        futures = [self.pool.submit(function, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def map(self, method: str, tasks: Iterable) -> List:
+        return list(self.pool.map(getattr(self.target, method), tasks))
+
+
+class ProcessExecutor(Executor):
+    """ Runs the tasks in a process pool.
+
+        The target is sent to each worker by the pool initializer, tasks only
+        carry the method name and the task arguments.
+    """
+
+    def start(self, target: Any) -> Self:
+        super().start(target)
+        self.pool = mp.Pool(processes=self.workers, initializer=_initialize, initargs=(target,))
+        return self
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def imap_unordered(self, method: str, tasks: Iterable) -> Iterator:
+        return self.pool.imap_unordered(_call, [(method, task) for task in tasks], chunksize=1)
+
+    def map(self, method: str, tasks: Iterable) -> List:
+        return self.pool.map(_call, [(method, task) for task in tasks], chunksize=1)
+
+
+class Attempt(NamedTuple):
+    index: int
+    number: int
+    process: mp.Process
+    started: float
+
+
+class IsolatedExecutor(Executor):
+    """ Runs each task attempt in a fresh process with wall-clock and memory limits.
+
+        An attempt taking more than 'timeout' seconds is terminated and an attempt
+        process dying without a result (crash, out of memory kill) is discarded.
+        Failed attempts are retried up to 'retries' times in a new process after
+        an exponential backoff of 'backoff' seconds. 'memory' limits the address
+        space (bytes) of each attempt, the allocation failures are reported by the
+        task itself.
+
+        With 'speculate' set, once no task is waiting, a duplicate attempt of a
+        running task is started when it runs longer than 'speculate' times the
+        median duration of the finished tasks. The first attempt to finish wins
+        and the other is terminated, so tasks must be idempotent.
+    """
+
+    def __init__(
+        self, workers: int = 0, timeout: float = None, memory: int = None,
+        retries: int = 2, backoff: float = 1.0, speculate: float = None
+    ):
+        super().__init__(workers)
+        # Wall-clock limit in seconds of each attempt
+        self.timeout = timeout
+        # Address space limit in bytes of each attempt
+        self.memory = memory
+        # Attempts after the first one
+        self.retries = retries
+        # Base delay in seconds before a retry, doubled at each attempt
+        self.backoff = backoff
+        # Running time over the median duration starting a speculative attempt
+        self.speculate = speculate
+
+    def imap_unordered(self, method: str, tasks: Iterable) -> Iterator:
+        for _, result in self.run(method, list(tasks)):
+            yield result
+
+    def map(self, method: str, tasks: Iterable) -> List:
+        tasks = list(tasks)
+        results = [None] * len(tasks)
+        for index, result in self.run(method, tasks):
+            results[index] = result
+        return results
+
+    def launch(self, method: str, task: Any, index: int, number: int) -> Tuple[Any, Attempt]:
+        receiver, sender = mp.Pipe(duplex=False)
+        process = mp.Process(target=_attempt, args=(self.target, method, task, self.memory, sender), daemon=True)
+        process.start()
+        # Only the attempt process keeps the sending end, so its exit closes the pipe
+        sender.close()
+        return receiver, Attempt(index, number, process, time.monotonic())
+
+    # noinspection PyMethodMayBeStatic
+    def stop(self, connection: Any, attempt: Attempt):
+        if attempt.process.is_alive():
+            attempt.process.terminate()
+        attempt.process.join()
+        connection.close()
+
+    def abandon(self, method: str, tasks: List, connection: Any, attempt: Attempt):
+        """ Stop an attempt that will not deliver its result and remove its partial outputs. """
+        self.stop(connection, attempt)
+        self.target.abandoned(method, tasks[attempt.index], attempt.process.pid)
+
+    def run(self, method: str, tasks: List) -> Iterator[Tuple[int, Any]]:
+        """ Run the tasks yielding (index, result) as they finish. """
+        # Attempts waiting to start: (index, attempt number, start not before)
+        waiting = deque((index, 0, 0.0) for index in range(len(tasks)))
+        running = {}
+        finished = set()
+        durations = []
+        try:
+            while len(finished) < len(tasks):
+                now = time.monotonic()
+                # Start the attempts ready to run and the speculative duplicates
+                while len(running) < self.workers:
+                    ready = next((item for item in waiting if item[2] <= now), None)
+                    if ready is not None:
+                        waiting.remove(ready)
+                        index, number, _ = ready
+                    else:
+                        straggler = self.straggler(running, durations, now) if len(waiting) == 0 else None
+                        if straggler is None:
+                            break
+                        index, number = straggler.index, straggler.number + 1
+                    connection, attempt = self.launch(method, tasks[index], index, number)
+                    running[connection] = attempt
+
+                # Wait for a result, a timeout or, with a free worker, a retry or a straggler
+                deadlines = []
+                if self.timeout is not None:
+                    deadlines += [attempt.started + self.timeout for attempt in running.values()]
+                if len(running) < self.workers:
+                    deadlines += [start for _, _, start in waiting]
+                    if self.speculate is not None and len(durations) > 0 and len(waiting) == 0:
+                        threshold = self.speculate * statistics.median(durations)
+                        deadlines += [attempt.started + threshold for attempt in running.values()
+                                      if attempt.started + threshold > now]
+                deadline = min(deadlines, default=None)
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                if len(running) == 0:
+                    time.sleep(timeout)
+                    continue
+                ready = wait(list(running), timeout)
+
+                failures = []
+                for connection in ready:
+                    attempt = running.pop(connection)
+                    try:
+                        result = connection.recv()
+                    except EOFError:
+                        self.abandon(method, tasks, connection, attempt)
+                        failures.append((attempt, RuntimeError(
+                            f'Task attempt {attempt.number + 1} exited with code {attempt.process.exitcode}.')))
+                        continue
+                    self.stop(connection, attempt)
+                    if attempt.index in finished:
+                        continue
+                    finished.add(attempt.index)
+                    durations.append(time.monotonic() - attempt.started)
+                    # Cancel the other attempts of the task
+                    for other, duplicate in list(running.items()):
+                        if duplicate.index == attempt.index:
+                            self.abandon(method, tasks, other, running.pop(other))
+                    yield attempt.index, result
+                if self.timeout is not None:
+                    now = time.monotonic()
+                    for connection, attempt in list(running.items()):
+                        if now - attempt.started > self.timeout:
+                            self.abandon(method, tasks, connection, running.pop(connection))
+                            failures.append((attempt, TimeoutError(
+                                f'Task attempt {attempt.number + 1} timed out after {self.timeout}s.')))
+
+                for attempt, error in failures:
+                    index = attempt.index
+                    if index in finished or any(other.index == index for other in running.values()):
+                        continue
+                    if attempt.number < self.retries:
+                        waiting.append((index, attempt.number + 1,
+                                        time.monotonic() + self.backoff * 2 ** attempt.number))
+                    else:
+                        finished.add(index)
+                        yield index, self.target.failed(method, tasks[index], error)
+        finally:
+            for connection, attempt in running.items():
+                self.abandon(method, tasks, connection, attempt)
+
+    def straggler(self, running: dict, durations: List[float], now: float) -> Attempt:
+        """ Longest running task without duplicate past the speculation threshold. """
+        if self.speculate is None or len(durations) == 0:
+            return None
+        counts = {}
+        for attempt in running.values():
+            counts[attempt.index] = counts.get(attempt.index, 0) + 1
+        threshold = self.speculate * statistics.median(durations)
+        candidates = [attempt for attempt in running.values()
+                      if counts[attempt.index] == 1 and now - attempt.started > threshold]
+        return min(candidates, key=lambda attempt: attempt.started, default=None)
+
+
+# Executor backends by name
+EXECUTORS = {
+    'serial': SerialExecutor,
+    'threads': ThreadExecutor,
+    'processes': ProcessExecutor,
+    'isolated': IsolatedExecutor,
+}
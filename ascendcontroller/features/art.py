@@ -36,11 +36,11 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ---------------------------------------------------------------------------
 
+import numpy
 import pandas
 from abc import ABC
 from typing import Sequence
-from scipy.spatial import distance
-from ascendcontroller.base import Feature, FeatureResult, ResultType, FeatureParam
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureResult, FeatureParam
 
 
 class ArtFeatureParam(FeatureParam, ABC):
@@ -51,37 +51,35 @@ class ArtFeatureParam(FeatureParam, ABC):
 class ArtFeature(Feature):
     """
         Required columns in Data Frame:
-            - senderPosition        - (x, y, z) tuple
-            - receiverPosition      - (x, y, z) tuple
+            - senderPosition        - (x, y, z) tuple or pxSnd, pySnd, pzSnd
+            - receiverPosition      - (x, y, z) tuple or pxRcv, pyRcv, pzRcv
             - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                                4-attack, 8-attack, 16-attack]
+
+        The 'score' of a message is its distance: it is an attack for the
+        threshold 't' when 'score > t'. The thresholds may be empty.
     """
+    requires = ('distance',)
+    inputs = MESSAGE_COLUMNS
 
     def __init__(self, factory: ArtFeatureParam):
         super().__init__(factory=factory)
 
     # noinspection PyMethodMayBeStatic
-    def process(self, data: pandas.DataFrame) -> FeatureResult:
-        params: ArtFeatureParam = self.factory.build(data)
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
+        params: ArtFeatureParam = self.build(data)
         df = params.data
 
         # Create distance column in Data Frame
-        df['distance'] = df.apply(
-            lambda row: distance.euclidean(row.senderPosition, row.receiverPosition), axis=1)
+        df['distance'] = self.columns(data, columns)['distance']
 
         # Remove position columns
-        df = df.drop(columns=['senderPosition', 'receiverPosition'])
-
-        # Check for attacker for the current threshold
-        for threshold in params.thresholds:
-            df[f'art{threshold}'] = df.apply(lambda row: ResultType.Normal.name
-                                             if row.distance <= threshold else ResultType.Attack.name, axis=1)
+        df = df.drop(columns=['senderPosition', 'receiverPosition'], errors='ignore')
 
-        # Check confusion matrix for each distance
-        for threshold in params.thresholds:
-            df[f'cmtx{threshold}'] = df.apply(lambda row: self.confusion_matrix(
-                row.attackerType == 1 or row.attackerType == 2 or row.attackerType == 4 or row.attackerType == 8
-                or row.attackerType == 16, row[f'art{threshold}'] == ResultType.Attack.name).name, axis=1)
+        # Check for attacker and confusion matrix for all thresholds at once
+        detected = df.distance.to_numpy()[:, numpy.newaxis] > numpy.asarray(params.thresholds, dtype=float)
+        df = self.verdicts(df, 'art', params.thresholds, detected)
+        df['score'] = df.distance
 
         # Return result DataFrame
         return FeatureResult(data=df, prefix='art-')
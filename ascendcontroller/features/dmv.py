@@ -39,9 +39,8 @@
 import numpy
 import pandas
 from abc import ABC
-from typing import Sequence, Tuple
-from scipy.spatial import distance
-from ascendcontroller.base import Feature, FeatureResult, ResultType, FeatureParam
+from typing import Dict, Sequence
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureResult, FeatureParam
 
 
 class DmvFeatureParam(FeatureParam, ABC):
@@ -54,74 +53,115 @@ class DmvFeature(Feature):
     """
         Required columns in Data Frame:
             - sender                - sender ID
-            - senderPosition        - (x, y, z) tuple
+            - messageID             - message ID
+            - senderPosition        - (x, y, z) tuple or pxSnd, pySnd, pzSnd
+            - sendTime              - Message send time
             - rcvTime               - Message arrival time
             - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                                4-attack, 8-attack, 16-attack]
+
+        A message is an attack when the sender moved no more than the threshold since
+        its oldest message sent within the last 'time_threshold' seconds. The check
+        runs once per sent message on the sender tracks and every received copy
+        gets its result.
+        The 'score' of a message is minus the distance moved (-inf for the first
+        message of a window): it is an attack for the threshold 't' when
+        'score >= -t'. The thresholds may be empty.
     """
+    requires = ('trackIndex', 'trackRows', 'senderPosition')
+    inputs = {**MESSAGE_COLUMNS, 'rcvTime': 'float64', 'sendTime': 'float64'}
 
     def __init__(self, factory: DmvFeatureParam):
         super().__init__(factory=factory)
 
-    def sender_distance(
-        self,
-        curr: Tuple[float, float, float],
-        prev: Tuple[float, float, float],
-        threshold: int
-    ) -> ResultType:
-        if prev is None:
-            return (0, ResultType.Normal.name)
-        dist = distance.euclidean(curr, prev)
-        result = ResultType.Normal.name if dist > threshold else ResultType.Attack.name
-        return (dist, result)
+    def window_start(self, sender: numpy.ndarray, time: numpy.ndarray, time_threshold: float) -> numpy.ndarray:
+        """ Sliding window over the sender tracks.
+
+            'sender' and 'time' must be sorted by sender and time. Returns, for each
+            row, the index of the oldest message of the same sender sent less
+            than 'time_threshold' seconds before it (the row itself if there is none).
+        """
+        start = numpy.empty(len(sender), dtype=numpy.intp)
+        bounds = numpy.flatnonzero(numpy.diff(sender)) + 1
+        for begin, end in zip(numpy.r_[0, bounds], numpy.r_[bounds, len(sender)]):
+            track = time[begin:end]
+            start[begin:end] = begin + numpy.searchsorted(track, track - time_threshold, side='right')
+        return start
 
     # noinspection PyMethodMayBeStatic
-    def process(self, data: pandas.DataFrame) -> FeatureResult:
-        params: DmvFeatureParam = self.factory.build(data)
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
+        params: DmvFeatureParam = self.build(data)
+        return self.evaluate(params, self.columns(data, columns))
+
+    def evaluate(self, params: DmvFeatureParam, columns: DerivedColumns) -> FeatureResult:
         df = params.data
+
+        # Sort the sent messages of each sender by send time
+        tracks = columns.tracks
+        order = tracks['senderSendOrder']
+        position = tracks['senderPosition'][order]
+        start = self.window_start(
+            tracks['sender'][order], tracks['sendTime'][order].astype(float), params.time_threshold)
+
+        # Distance moved since the oldest message inside the time window
+        moved = numpy.zeros(len(order))
+        moved[order] = numpy.linalg.norm(position - position[start], axis=1)
+        first = numpy.zeros(len(order), dtype=bool)
+        first[order] = start == numpy.arange(len(order))
+
+        # Broadcast the track results to the received copies
+        moved = tracks.broadcast(moved)
+        first = tracks.broadcast(first)
+
         # Create the distance moved column
-        df[f'distance'] = 0
+        df['distance'] = moved
         # Create a index Column
-        df['idx'] = list(range(len(df.index)))
-
-        # Create DVM Columns in the Data Frame
-        for threshold in params.thresholds:
-            df[f'dmv{threshold}'] = 'Unknown'
-        for threshold in params.thresholds:
-            df[f'cmtx{threshold}'] = 'Unknown'
-
-        # Calculate the distance between messages for each sender
-        for s in df.sender.unique():
-            selection = df[['idx', 'rcvTime', 'senderPosition']].loc[df.sender == s].values.tolist()
-            for seq, data in enumerate(selection):
-                idx, curr_time, curr_pos = data
-                for threshold in params.thresholds:
-                    if seq == 0:
-                        df.iloc[idx, df.columns.get_loc(f'dmv{threshold}')] = ResultType.Normal.name
-                        continue
-
-                    time_diff = 0.0
-                    dist = 0.0
-                    result = None
-                    prev_pos = None
-                    counter = 0
-                    while counter < len(selection) and time_diff < params.time_threshold and dist < threshold:
-                        # Avoid checking itself
-                        if selection[counter][0] == idx:
-                            break
-                        prev_pos = selection[counter][2]
-                        dist, result = self.sender_distance(curr_pos, prev_pos, threshold)
-                        time_diff = abs(curr_time - selection[counter][1])
-                        counter += 1
-
-                    df.iloc[idx, df.columns.get_loc(f'distance')] = dist
-                    df.iloc[idx, df.columns.get_loc(f'dmv{threshold}')] = result
-
-        # Check confusion matrix for each distance
-        for threshold in params.thresholds:
-            df[f'cmtx{threshold}'] = df.apply(lambda row: self.confusion_matrix(
-                row.attackerType == 1 or row.attackerType == 2 or row.attackerType == 4 or row.attackerType == 8
-                or row.attackerType == 16, row[f'dmv{threshold}'] == ResultType.Attack.name).name, axis=1)
+        df['idx'] = numpy.arange(len(df))
+
+        # Check for attacker and confusion matrix for all thresholds at once
+        thresholds = numpy.asarray(params.thresholds, dtype=float)
+        detected = ~first[:, numpy.newaxis] & (moved[:, numpy.newaxis] <= thresholds)
+        df = self.verdicts(df, 'dmv', params.thresholds, detected)
+        df['score'] = numpy.where(first, -numpy.inf, -moved)
 
         # Return result DataFrame
         return FeatureResult(data=df, prefix='dmv-')
+
+    def process_chunk(self, data: pandas.DataFrame, state: Dict, columns: DerivedColumns = None) -> FeatureResult:
+        """ Process a time-ordered chunk with the messages sent in the last
+            'time_threshold' seconds of the previous chunks, one copy of each,
+            prepended as context. The chunk is an error when its messages arrived
+            before the previous chunks or were sent before the carried window.
+        """
+        bounds = state.get('bounds')
+        if bounds is not None and len(data) > 0:
+            rcv_time, window = bounds
+            if data.rcvTime.min() < rcv_time:
+                return FeatureResult(data=data, error=RuntimeError(
+                    f'Chunk not in time order: rcvTime {data.rcvTime.min()} before {rcv_time}'))
+            if data.sendTime.min() <= window:
+                return FeatureResult(data=data, error=RuntimeError(
+                    f'Chunk not in time order: sendTime {data.sendTime.min()} not after the window start {window}'))
+
+        offset = state.get('offset', 0)
+        context = state.get('context')
+        if context is not None:
+            data = pandas.concat([context, data], ignore_index=True)
+        skip = 0 if context is None else len(context)
+        state['offset'] = offset + len(data) - skip
+
+        params: DmvFeatureParam = self.build(data)
+        result = self.evaluate(params, DerivedColumns(data))
+
+        # Keep one copy of the messages that can still be inside the window of the next chunk
+        send_time = data.sendTime.to_numpy(dtype=float)
+        if len(send_time) > 0:
+            window = send_time.max() - params.time_threshold
+            state['context'] = data[send_time > window].drop_duplicates(['sender', 'messageID'])
+            state['bounds'] = (data.rcvTime.max(), window)
+
+        # Remove the context rows from the result
+        df = result.data.iloc[skip:]
+        df = df.assign(idx=numpy.arange(offset, state['offset']))
+        df.index = pandas.RangeIndex(offset, state['offset'])
+        return result._replace(data=df)
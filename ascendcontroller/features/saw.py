@@ -36,11 +36,11 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ---------------------------------------------------------------------------
 
+import numpy
 import pandas
 from abc import ABC
-from typing import Sequence
-from scipy.spatial import distance
-from ascendcontroller.base import Feature, FeatureResult, ResultType, FeatureParam
+from typing import Dict, Sequence
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureResult, FeatureParam
 
 
 class SawFeatureParam(FeatureParam, ABC):
@@ -51,37 +51,65 @@ class SawFeatureParam(FeatureParam, ABC):
 class SawFeature(Feature):
     """
         Required columns in Data Frame:
-            - senderPosition        - (x, y, z) tuple
-            - receiverPosition      - (x, y, z) tuple
+            - sender                - sender ID
+            - receiver              - receiver ID
+            - senderPosition        - (x, y, z) tuple or pxSnd, pySnd, pzSnd
+            - receiverPosition      - (x, y, z) tuple or pxRcv, pyRcv, pzRcv
             - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                                4-attack, 8-attack, 16-attack]
+
+        A message is an attack when it is the first message of its sender received
+        by the receiver (in file order) and the sender is already closer than the
+        threshold, i.e. the sender suddenly appeared next to the receiver.
+        The 'score' of a first message is minus its distance (-inf for the other
+        messages): it is an attack for the threshold 't' when 'score > -t'.
+        The thresholds may be empty.
     """
+    requires = ('distance', 'pairKey', 'firstMessage')
+    inputs = {**MESSAGE_COLUMNS, 'rcvTime': 'float64'}
 
     def __init__(self, factory: SawFeatureParam):
         super().__init__(factory=factory)
 
     # noinspection PyMethodMayBeStatic
-    def process(self, data: pandas.DataFrame) -> FeatureResult:
-        params: SawFeatureParam = self.factory.build(data)
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
+        params: SawFeatureParam = self.build(data)
+        columns = self.columns(data, columns)
+        return self.evaluate(params, columns['distance'], columns['firstMessage'])
+
+    def evaluate(self, params: SawFeatureParam, distance: numpy.ndarray, first: numpy.ndarray) -> FeatureResult:
         df = params.data
 
         # Create distance column in Data Frame
-        df['distance'] = df.apply(
-            lambda row: distance.euclidean(row.senderPosition, row.receiverPosition), axis=1)
+        df['distance'] = distance
 
         # Remove position columns
-        df = df.drop(columns=['senderPosition', 'receiverPosition'])
+        df = df.drop(columns=['senderPosition', 'receiverPosition'], errors='ignore')
 
-        # Check for attacker for the current threshold
-        for threshold in params.thresholds:
-            df[f'saw{threshold}'] = df.apply(lambda row: ResultType.Normal.name
-                                             if row.distance <= threshold else ResultType.Attack.name, axis=1)
-
-        # Check confusion matrix for each distance
-        for threshold in params.thresholds:
-            df[f'cmtx{threshold}'] = df.apply(lambda row: self.confusion_matrix(
-                row.attackerType == 1 or row.attackerType == 2 or row.attackerType == 4 or row.attackerType == 8
-                or row.attackerType == 16, row[f'saw{threshold}'] == ResultType.Attack.name).name, axis=1)
+        # Check for attacker and confusion matrix for all thresholds at once
+        thresholds = numpy.asarray(params.thresholds, dtype=float)
+        detected = first[:, numpy.newaxis] & (distance[:, numpy.newaxis] < thresholds)
+        df = self.verdicts(df, 'saw', params.thresholds, detected)
+        df['score'] = numpy.where(first, -distance, -numpy.inf)
 
         # Return result DataFrame
         return FeatureResult(data=df, prefix='saw-')
+
+    def process_chunk(self, data: pandas.DataFrame, state: Dict, columns: DerivedColumns = None) -> FeatureResult:
+        """ Process a chunk keeping the (receiver, sender) pairs seen in the previous
+            chunks, whose messages are no longer first contacts, with the arrival
+            time of their last message. Pairs silent for the factory 'ttl' seconds, or
+            beyond its 'capacity', are evicted and their next message is a first contact.
+        """
+        params: SawFeatureParam = self.build(data)
+        columns = self.columns(data, columns)
+        key = columns['pairKey']
+        first = columns['firstMessage']
+        last = pandas.Series(data.rcvTime.to_numpy(dtype=float), index=key)
+        seen = state.get('seen')
+        if seen is not None:
+            first = first & ~pandas.Series(key).isin(seen.index).to_numpy()
+            last = pandas.concat([seen, last])
+        last = last[~last.index.duplicated(keep='last')]
+        state['seen'] = last[self.evict(last.to_numpy())]
+        return self.evaluate(params, columns['distance'], first)
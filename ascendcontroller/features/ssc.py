@@ -36,21 +36,12 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ---------------------------------------------------------------------------
 
-#import jpype
+import numpy
 import pandas
 from abc import ABC
-#import jpype.imports
-from math import sqrt
-from pathlib import Path
-#from jpype.types import *
-from typing import Sequence, Tuple
-from scipy.spatial import distance
-from ascendcontroller.base import Feature, FeatureResult, ResultType, FeatureParam
-
-# jpype.startJVM(classpath=[f'{Path(__file__).parent.parent}/lib/*'])
-# pyright: reportMissingImports=false
-# from br.ita import Initializer
-# from no.uio.subjective_logic.opinion import SubjectiveOpinion
+from typing import Dict, Sequence, Tuple
+from ascendcontroller.subjective import Opinion
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureResult, FeatureParam
 
 
 class SscFeatureParam(FeatureParam, ABC):
@@ -62,97 +53,108 @@ class SscFeature(Feature):
     """
         Required columns in Data Frame:
             - sender                - sender ID
-            - senderPosition        - (x, y, z) tuple
-            - senderSpeed           - (x, y, z) tuple
+            - receiver              - receiver ID
+            - senderPosition        - (x, y, z) tuple or pxSnd, pySnd, pzSnd
+            - senderSpeed           - (x, y, z) tuple or sxSnd, sySnd, szSnd
             - rcvTime               - Message arrival time
             - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack,
                                                                4-attack, 8-attack, 16-attack]
+
+        The implied speed of a message is the distance between its sender position
+        and the sender position of the previous message in the same (receiver, sender)
+        track divided by the elapsed arrival time (1 second when both arrive together).
+        The 'score' of a message is its speed deviation (-inf for the first message
+        of a track): it is an attack for the threshold 't' when 'score > 7t/9', where
+        the belief in the reported speed falls below 0.2. The thresholds may be empty.
+        The 'subj{t}' columns are the expectation of the Subjective Logic opinion
+        on the reported speed for each threshold.
     """
     _UNCERTAINTY_FACTOR = 0.1
-
-    # @staticmethod
-    # def lib():
-    #     Initializer().init()
+    requires = ('receiverSenderOrder', 'previousMessage', 'timeDelta', 'positionDelta', 'senderSpeedNorm')
+    inputs = MESSAGE_COLUMNS
 
     def __init__(self, factory: SscFeatureParam):
         super().__init__(factory=factory)
 
-    def check_speed(self, threshold: float, curr: pandas.Series, prev: pandas.Series) -> Tuple[int, ResultType]:
-        if prev is None or curr.sender != prev.sender:
-            # opition = SubjectiveOpinion(1 - SscFeature._UNCERTAINTY_FACTOR, 0.0, SscFeature._UNCERTAINTY_FACTOR)
-            return (-1, 1, ResultType.Normal.name)
-        curr_time = curr['rcvTime']
-        prev_time = prev['rcvTime']
-        curr_pos = curr['senderPosition']
-        prev_pos = prev['rcvTime']
-        curr_speed = curr['senderSpeed']
-        time_diff = curr_time - prev_time
-        dist_diff = distance.euclidean(curr_pos, prev_pos)
-        actual_speed = dist_diff / 1 if time_diff == 0 else time_diff  # v = s/t
-        last_speed = sqrt(pow(curr_speed[0], 2) + pow(curr_speed[1], 2) + pow(curr_speed[2], 2))
-        delta_speed = abs(last_speed - actual_speed)
-        if delta_speed < threshold:
-            if delta_speed <= 0:
-                # opition = SubjectiveOpinion(1 - SscFeature._UNCERTAINTY_FACTOR, 0.0, SscFeature._UNCERTAINTY_FACTOR)
-                return (delta_speed, 1, ResultType.Normal.name)
-            else:
-                disbelief = delta_speed / threshold * (1 - SscFeature._UNCERTAINTY_FACTOR)
-                belief = 1 - SscFeature._UNCERTAINTY_FACTOR - disbelief
-                # opition = SubjectiveOpinion(belief, disbelief, SscFeature._UNCERTAINTY_FACTOR)
-                # expectation = opition.getExpectation()
-                return (delta_speed, belief, ResultType.Normal.name if belief >= 0.2 else ResultType.Attack.name)
-        else:
-            # opition = SubjectiveOpinion(0.0, 1 - SscFeature._UNCERTAINTY_FACTOR, SscFeature._UNCERTAINTY_FACTOR)
-            return (delta_speed, 0, ResultType.Attack.name)
+    def check_speed(
+        self,
+        thresholds: Sequence[float],
+        first: numpy.ndarray,
+        time_diff: numpy.ndarray,
+        dist_diff: numpy.ndarray,
+        speed: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, Opinion, numpy.ndarray]:
+        """ Check the reported speed against the speed implied by consecutive messages.
+
+            All arguments are row arrays, 'first' marks the first message of each
+            (receiver, sender) track. Returns the speed deviation for each row and
+            the (rows x thresholds) opinions on the reported speed and attack
+            detection matrix.
+        """
+        threshold = numpy.asarray(thresholds, dtype=float)[numpy.newaxis, :]
+        # v = s/t
+        actual_speed = dist_diff / numpy.where(time_diff == 0, 1, time_diff)
+        delta_speed = numpy.where(first, -1, numpy.abs(speed - actual_speed))[:, numpy.newaxis]
+
+        # Disbelief grows with the deviation up to the threshold
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            disbelief = numpy.clip(delta_speed / threshold, 0, 1) * (1 - SscFeature._UNCERTAINTY_FACTOR)
+        disbelief = numpy.where(delta_speed < threshold, disbelief, 1 - SscFeature._UNCERTAINTY_FACTOR)
+        opinion = Opinion.create(
+            1 - SscFeature._UNCERTAINTY_FACTOR - disbelief, disbelief, SscFeature._UNCERTAINTY_FACTOR)
+        detected = (delta_speed >= threshold) | ((delta_speed > 0) & (opinion.belief < 0.2))
+        return delta_speed[:, 0], opinion, detected
 
     # noinspection PyMethodMayBeStatic
-    def process(self, data: pandas.DataFrame) -> FeatureResult:
-        params: SscFeatureParam = self.factory.build(data)
-        df = params.data
-
-        # Create ssc Columns in the Data Frame
-        for threshold in params.thresholds:
-            df[f'ssc{threshold}'] = 'Unknown'
-        for threshold in params.thresholds:
-            df[f'cmtx{threshold}'] = 'Unknown'
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
+        params: SscFeatureParam = self.build(data)
+        columns = self.columns(data, columns)
+
+        # Sort the Data Frame by receiver and sender tracks
+        order = columns['receiverSenderOrder']
+        df = params.data.iloc[order].reset_index(drop=True)
+
+        # Reported speed of each message
+        speed = columns['senderSpeedNorm']
+
+        # Calculate actual speed for all thresholds
+        delta_speed, opinion, detected = self.check_speed(
+            params.thresholds, columns['previousMessage'][order] < 0, columns['timeDelta'][order],
+            columns['positionDelta'][order], speed[order])
+        df = self.verdicts(df, 'ssc', params.thresholds, detected)
         # Create Subjective Logic result
-        for threshold in params.thresholds:
-            df[f'subj{threshold}'] = 'Unknown'
-
-        # df = df.loc[(df['receiver'] == 7) & (df['sender'] == 13) | (df['receiver'] == 7) & (df['sender'] == 49)]
-
-        # Sort the Data Frame by Sender Column
-        print(f'Sorting DataFrame: {len(df)} rows')
-        df = df.sort_values(['receiver', 'sender'], ignore_index=True)
-        print(f'Finished sorting DataFrame: {len(df)} rows sorted.')
-
-        # Calculate actual speed
-        receiver = None
-        sender = None
-        for idx in range(0, len(df)):
-            curr = df.loc[idx]
-            if receiver != curr['receiver']:
-                receiver = curr['receiver']
-                sender = curr['sender']
-                prev = None
-            elif receiver == curr['receiver'] and sender != curr['sender']:
-                sender = curr['sender']
-                prev = None
-            elif receiver == curr['receiver'] and sender == curr['sender']:
-                prev = df.loc[idx - 1]
-
-            for threshold in params.thresholds:
-                attacker = curr.attackerType.item()
-                speed, opinion_exp, result = self.check_speed(threshold, curr, prev)
-                df.loc[idx, f'ssc{threshold}'] = result
-                df.loc[idx, f'cmtx{threshold}'] = self.confusion_matrix(
-                    attacker == 1 or attacker == 2 or attacker == 4 or attacker == 8
-                    or attacker == 16, result == ResultType.Attack.name).name
-                df.loc[idx, f'speed'] = speed
-                # df.loc[idx, f'subj{threshold}'] = opinion_exp
+        expectation = opinion.expectation()
+        for idx, threshold in enumerate(params.thresholds):
+            df[f'subj{threshold}'] = expectation[:, idx]
+        df['speed'] = delta_speed
+        df['score'] = numpy.where(delta_speed < 0, -numpy.inf, delta_speed)
 
         # Drop unnecessary columns from Data Frame
-        df = df.drop(columns=['senderPosition', 'senderSpeed', 'rcvTime'])
+        df = df.drop(columns=['senderPosition', 'senderSpeed', 'rcvTime'], errors='ignore')
 
         # Return result DataFrame
-        return FeatureResult(data=df, prefix='ssc-')
+        return FeatureResult(data=df, prefix='ssc-', rows=order)
+
+    def process_chunk(self, data: pandas.DataFrame, state: Dict, columns: DerivedColumns = None) -> FeatureResult:
+        """ Process a chunk with the last message of each (receiver, sender) track
+            from the previous chunks prepended as context. Tracks silent for the
+            factory 'ttl' seconds, or beyond its 'capacity', leave the context.
+        """
+        context = state.get('context')
+        if context is not None:
+            data = pandas.concat([context, data], ignore_index=True)
+        last = data.drop_duplicates(['receiver', 'sender'], keep='last')
+        state['context'] = last[self.evict(last.rcvTime.to_numpy(dtype=float))]
+
+        columns = DerivedColumns(data)
+        result = self.process(data, columns=columns)
+        if result.error is not None:
+            return result
+        # Remove the context rows from the result
+        skip = 0 if context is None else len(context)
+        keep = columns['receiverSenderOrder'] >= skip
+        offset = state.get('offset', 0)
+        state['offset'] = offset + len(data) - skip
+        df = result.data[keep]
+        df.index = pandas.RangeIndex(offset, state['offset'])
+        return result._replace(data=df, rows=result.rows[keep] - skip)
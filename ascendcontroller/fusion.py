@@ -0,0 +1,164 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+from abc import ABC, abstractmethod
+from typing import Sequence, Union
+from ascendcontroller.subjective import Opinion, averaging_fusion, cumulative_fusion
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureResult, FeatureParam
+
+
+class FusionRule(ABC):
+    """ FusionRule Base class
+
+        Combines the verdicts of several detectors into one score per message,
+        larger is more suspicious.
+    """
+
+    @abstractmethod
+    def score(self, detected: numpy.ndarray) -> numpy.ndarray:
+        """ Score of each row of the (rows x detectors) boolean detection matrix. """
+        pass
+
+
+class WeightedRule(FusionRule):
+    """ Sum of the weights of the detectors flagging the message. """
+
+    def __init__(self, weights: Sequence[float]):
+        self.weights = numpy.asarray(weights, dtype=float)
+
+    def score(self, detected: numpy.ndarray) -> numpy.ndarray:
+        return detected @ self.weights
+
+
+class VoteRule(FusionRule):
+    """ Number of detectors flagging the message: the threshold 'k' is a k-of-n vote. """
+
+    def score(self, detected: numpy.ndarray) -> numpy.ndarray:
+        return detected.sum(axis=1).astype(float)
+
+
+class OpinionRule(FusionRule):
+    """ Subjective Logic fusion of the detector verdicts.
+
+        Each verdict is an opinion on the message being honest, disbelief when
+        the detector flags it and belief otherwise, with the detector
+        'uncertainty' and optionally discounted by the 'trust' in the detector.
+        The score is the projected probability of an attack of the fused opinion.
+    """
+
+    def __init__(
+        self, uncertainty: Union[float, Sequence[float]] = 0.1, trust: Union[float, Sequence[float]] = None,
+        operator: str = 'cumulative', base_rate: float = 0.5
+    ):
+        self.uncertainty = uncertainty
+        self.trust = trust
+        self.fuse = {'cumulative': cumulative_fusion, 'averaging': averaging_fusion}[operator]
+        self.base_rate = base_rate
+
+    def score(self, detected: numpy.ndarray) -> numpy.ndarray:
+        uncertainty = numpy.broadcast_to(numpy.asarray(self.uncertainty, dtype=float), detected.shape[1:])
+        evidence = 1 - uncertainty
+        opinions = []
+        for col in range(detected.shape[1]):
+            flagged = detected[:, col]
+            opinion = Opinion.create(
+                numpy.where(flagged, 0.0, evidence[col]), numpy.where(flagged, evidence[col], 0.0),
+                uncertainty[col], self.base_rate)
+            if self.trust is not None:
+                opinion = opinion.discount(numpy.broadcast_to(self.trust, detected.shape[1:])[col])
+            opinions.append(opinion)
+        if len(opinions) == 0:
+            return numpy.zeros(len(detected))
+        return 1 - self.fuse(opinions).expectation()
+
+
+class FusionFeatureParam(FeatureParam, ABC):
+    # List of score thresholds, the message is an attack when 'score >= threshold'
+    thresholds: Sequence[float]
+    # Verdict columns of the previous features combined, e.g. 'art100' or 'ssc5'
+    verdicts: Sequence[str]
+    # Rule combining the verdicts
+    rule: FusionRule
+    # Result file prefix, distinct for each fusion feature of a runner
+    prefix = 'fusion-'
+
+
+class FusionFeature(Feature):
+    """
+        Required columns in Data Frame:
+            - sender                - sender ID
+            - receiver              - receiver ID
+            - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack,
+                                                               4-attack, 8-attack, 16-attack]
+
+        Combines, while the simulation is in memory, the verdicts of the features
+        placed before it in the runner. The runner shares their verdict columns
+        (as boolean arrays in the file row order) and their 'score' column, as
+        '{prefix}score', through the derived columns of the file. The verdicts
+        are combined by the factory 'rule' into the 'score' column and a message
+        is an attack for the threshold 't' when 'score >= t'.
+    """
+    inputs = MESSAGE_COLUMNS
+    fusion = True
+
+    def __init__(self, factory: FusionFeatureParam):
+        super().__init__(factory=factory)
+
+    # noinspection PyMethodMayBeStatic
+    def process(self, data: pandas.DataFrame, columns: DerivedColumns = None) -> FeatureResult:
+        params: FusionFeatureParam = self.build(data)
+        columns = self.columns(data, columns)
+        df = params.data
+
+        # Combine the verdicts published by the previous features
+        missing = [name for name in params.verdicts if name not in columns.cache]
+        if len(missing) > 0:
+            return FeatureResult(data=df, error=RuntimeError(f'Verdict columns not available: {missing}'))
+        detected = numpy.column_stack([columns[name] for name in params.verdicts]) \
+            if len(params.verdicts) > 0 else numpy.zeros((len(df), 0), dtype=bool)
+        score = params.rule.score(detected)
+
+        # Check for attacker and confusion matrix for all thresholds at once
+        thresholds = numpy.asarray(params.thresholds, dtype=float)
+        df = self.verdicts(df, 'fus', params.thresholds, score[:, numpy.newaxis] >= thresholds)
+        df['score'] = score
+
+        # Return result DataFrame
+        return FeatureResult(data=df, prefix=params.prefix)
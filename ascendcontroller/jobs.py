@@ -0,0 +1,180 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence, Tuple
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """ Lease-based queue of simulation files shared by several runners.
+
+        The queue is a SQLite database in the destination directory, so any
+        number of runner processes, on any node mounting the destination, can
+        claim files from it without an external service. A claimed file is
+        leased to its runner for 'lease' seconds and renewed by the runner
+        heartbeat. Files whose lease expired (the runner died or lost the
+        storage) are claimed again by the other runners, up to 'attempts'
+        times before they are marked as failed. Files completed with failed
+        features are queued again for those features within the same limit.
+
+        SQLite relies on the file locks of the storage: on network file
+        systems they must be enabled (e.g. NFS with lockd).
+    """
+
+    def __init__(self, path: str, lease: float = 300, attempts: int = 3):
+        # Queue database file path
+        self.path = path
+        # Lease duration in seconds
+        self.lease = lease
+        # Claims of a file before it is marked as failed
+        self.attempts = attempts
+        self.connection = self.connect()
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'file TEXT PRIMARY KEY, features TEXT NOT NULL, cost INTEGER NOT NULL, state TEXT NOT NULL, '
+            'owner TEXT, expires REAL, attempts INTEGER NOT NULL DEFAULT 0)')
+
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit mode, transactions are opened explicitly by 'lock'
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+
+    @contextmanager
+    def lock(self) -> Iterator:
+        """ Exclusive write transaction on the queue, shared by all runners. """
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def enqueue(self, jobs: Sequence[Tuple[str, Sequence[str], int]]):
+        """ Add (file, features, cost) jobs, restarting finished jobs with new pending features.
+
+            Jobs pending or leased by other runners are kept as they are.
+        """
+        self.connection.executemany(
+            'INSERT INTO jobs (file, features, cost, state) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (file) DO UPDATE SET features = excluded.features, cost = excluded.cost, '
+            'state = excluded.state, owner = NULL, expires = NULL, attempts = 0 '
+            f"WHERE jobs.state IN ('{DONE}', '{FAILED}')",
+            [(file, json.dumps(list(features)), cost, PENDING) for file, features, cost in jobs])
+
+    def claim(self, owner: str, count: int = 1) -> List[Tuple[str, List[str]]]:
+        """ Lease up to 'count' files to the owner, the most expensive first.
+
+            Returns the (file, features) of the claimed jobs.
+        """
+        now = time.time()
+        with self.lock():
+            self.connection.execute(
+                f"UPDATE jobs SET state = '{FAILED}', owner = NULL "
+                f"WHERE state = '{LEASED}' AND expires < ? AND attempts >= ?", (now, self.attempts))
+            rows = self.connection.execute(
+                f"SELECT file, features FROM jobs WHERE state = '{PENDING}' OR (state = '{LEASED}' AND expires < ?) "
+                'ORDER BY cost DESC, file LIMIT ?', (now, count)).fetchall()
+            self.connection.executemany(
+                f"UPDATE jobs SET state = '{LEASED}', owner = ?, expires = ?, attempts = attempts + 1 WHERE file = ?",
+                [(owner, now + self.lease, file) for file, _ in rows])
+        return [(file, json.loads(features)) for file, features in rows]
+
+    def renew(self, owner: str, connection: sqlite3.Connection = None):
+        """ Extend the leases of all the files claimed by the owner. """
+        (connection or self.connection).execute(
+            f"UPDATE jobs SET expires = ? WHERE owner = ? AND state = '{LEASED}'", (time.time() + self.lease, owner))
+
+    def complete(self, file: str, owner: str, finished: Sequence[str]):
+        """ Record the finished features of a file, unless its lease was lost to another runner.
+
+            The file is done when all its features finished. Otherwise it is
+            queued again with the failed features, or marked as failed after
+            'attempts' claims.
+        """
+        row = self.connection.execute(
+            'SELECT features FROM jobs WHERE file = ? AND owner = ?', (file, owner)).fetchone()
+        if row is None:
+            return
+        failed = [name for name in json.loads(row[0]) if name not in finished]
+        if len(failed) == 0:
+            self.connection.execute(
+                f"UPDATE jobs SET state = '{DONE}', owner = NULL, expires = NULL WHERE file = ? AND owner = ?",
+                (file, owner))
+            return
+        self.connection.execute(
+            f"UPDATE jobs SET state = CASE WHEN attempts >= ? THEN '{FAILED}' ELSE '{PENDING}' END, "
+            'features = ?, owner = NULL, expires = NULL WHERE file = ? AND owner = ?',
+            (self.attempts, json.dumps(failed), file, owner))
+
+    def remaining(self) -> int:
+        """ Number of files pending or leased. """
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE state IN ('{PENDING}', '{LEASED}')").fetchone()[0]
+
+    @contextmanager
+    def heartbeat(self, owner: str) -> Iterator:
+        """ Renew the leases of the owner in background while the context is open. """
+        stop = threading.Event()
+
+        def beat():
+            connection = self.connect()
+            try:
+                while not stop.wait(self.lease / 3):
+                    self.renew(owner, connection)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, name='heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,109 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import hashlib
+from typing import Dict
+
+
+def checksum(file: str) -> str:
+    """ SHA-256 checksum of a file. """
+    digest = hashlib.sha256()
+    with open(file, 'rb') as fp:
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def atomic_write(file: str, content: str):
+    """ Write a text file through a temporary file and a rename. """
+    temp = f'{file}.tmp'
+    with open(temp, 'w') as fp:
+        fp.write(content)
+    os.replace(temp, file)
+
+
+class RunManifest:
+    """ Completion manifest of a CsvRunner destination.
+
+        The manifest records every finished (input file, feature) pair with the
+        feature configuration hash, the output file, its size and checksum and
+        the processing time. A pair is finished only when the configuration hash
+        matches and the output file is still there with the recorded size.
+    """
+
+    def __init__(self, path: str):
+        # Manifest file path
+        self.path = path
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        self.reload()
+
+    def reload(self):
+        """ Read the manifest again, with the entries saved by other runners. """
+        if os.path.exists(self.path):
+            with open(self.path) as fp:
+                self.entries = json.load(fp)
+
+    def done(self, file: str, feature: str, config: str) -> bool:
+        entry = self.entries.get(file, {}).get(feature)
+        if entry is None or entry['config'] != config:
+            return False
+        output = entry['output']
+        return output is None or (os.path.isfile(output) and os.path.getsize(output) == entry['size'])
+
+    @staticmethod
+    def entry(feature: str, config: str, output: str, elapsed: float) -> Dict:
+        """ Manifest entry of a finished feature, computed by the worker. """
+        return {
+            'feature': feature,
+            'config': config,
+            'output': output,
+            'size': None if output is None else os.path.getsize(output),
+            'checksum': None if output is None else checksum(output),
+            'elapsed': elapsed,
+            'finished': time.time()
+        }
+
+    def record(self, file: str, entry: Dict):
+        entry = dict(entry)
+        self.entries.setdefault(file, {})[entry.pop('feature')] = entry
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.entries, indent=2))
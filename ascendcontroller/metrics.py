@@ -0,0 +1,91 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+from typing import Iterable, Sequence
+
+# Confusion matrix count columns
+CONFUSION = ['TP', 'FP', 'TN', 'FN']
+
+
+def counts(data: pandas.DataFrame, by: str = None) -> pandas.DataFrame:
+    """ Confusion matrix counts of a feature result.
+
+        Counts the 'cmtx{threshold}' columns of the result into one row per
+        threshold (and per value of the 'by' column, when given) with the
+        TP, FP, TN and FN columns.
+    """
+    columns = [c for c in data.columns if isinstance(c, str) and c.startswith('cmtx')]
+    groups = pandas.Categorical(data[by]) if by else pandas.Categorical(numpy.zeros(len(data), dtype=numpy.int8))
+    size = len(CONFUSION) * len(groups.categories)
+    frames = []
+    for column in columns:
+        codes = pandas.Categorical(data[column], categories=CONFUSION).codes.astype(numpy.intp)
+        key = groups.codes.astype(numpy.intp) * len(CONFUSION) + codes
+        matrix = numpy.bincount(key[codes >= 0], minlength=size).reshape(-1, len(CONFUSION))
+        frame = pandas.DataFrame(matrix, columns=CONFUSION)
+        frame.insert(0, 'threshold', column[len('cmtx'):])
+        if by:
+            frame.insert(0, by, groups.categories)
+        frames.append(frame)
+    if len(frames) == 0:
+        return pandas.DataFrame(columns=([by] if by else []) + ['threshold'] + CONFUSION)
+    return pandas.concat(frames, ignore_index=True)
+
+
+def merge(frames: Iterable[pandas.DataFrame]) -> pandas.DataFrame:
+    """ Sum the confusion matrix counts of several results by their key columns. """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 0:
+        return pandas.DataFrame(columns=['threshold'] + CONFUSION)
+    data = pandas.concat(frames, ignore_index=True)
+    keys = [c for c in data.columns if c not in CONFUSION]
+    return data.groupby(keys, sort=False, as_index=False)[CONFUSION].sum()
+
+
+def scores(data: pandas.DataFrame, keys: Sequence[str] = ('threshold',)) -> pandas.DataFrame:
+    """ Precision, recall and F1 score of merged confusion matrix counts. """
+    data = data.groupby(list(keys), sort=False)[CONFUSION].sum()
+    precision = data.TP / (data.TP + data.FP).where(lambda x: x > 0)
+    recall = data.TP / (data.TP + data.FN).where(lambda x: x > 0)
+    return pandas.DataFrame({
+        'Precision': precision,
+        'Recall': recall,
+        'F1': 2 * precision * recall / (precision + recall).where(lambda x: x > 0),
+    })
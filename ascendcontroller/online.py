@@ -0,0 +1,272 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+"""
+    Online detectors for live V2X beacon feeds.
+
+    OnlineDetector runs the ART, SAW, SSC and DMV checks on one message at a
+    time, with the same rules as the batch features, keeping per (receiver,
+    sender) pair and per sender state bounded in size and age. The replay
+    harness feeds a VeReMi CSV at given rates and reports the latency
+    percentiles and the maximum sustainable message rate:
+
+        python -m ascendcontroller.online simulation.csv --rates 10000 50000
+"""
+
+import sys
+import math
+import time
+import numpy
+import pandas
+import argparse
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Mapping, NamedTuple, Sequence, Tuple
+from ascendcontroller.features.ssc import SscFeature
+
+# Default thresholds of the detectors
+THRESHOLDS: Dict[str, Sequence[float]] = {
+    'art': [100, 200, 300, 400, 450, 500, 550, 600, 700, 800],
+    'saw': [25, 100, 200],
+    'ssc': [2.5, 5, 7.5, 10, 15, 20, 25],
+    'dmv': [1, 5, 10, 15, 20, 25],
+}
+
+
+class ExpiringCache:
+    """ Mapping bounded in size and in age.
+
+        Entries are kept in least recently used order: inserting beyond the
+        'capacity' evicts the least recently used entry and entries not
+        updated for 'ttl' seconds (in message time) are evicted from the front.
+    """
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.items: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key: Hashable, now: float) -> Any:
+        """ Value of a key, None when missing or expired. """
+        item = self.items.get(key)
+        if item is None:
+            return None
+        if now - item[0] > self.ttl:
+            del self.items[key]
+            return None
+        return item[1]
+
+    def put(self, key: Hashable, value: Any, now: float):
+        items = self.items
+        items[key] = (now, value)
+        items.move_to_end(key)
+        if len(items) > self.capacity:
+            items.popitem(last=False)
+        while now - next(iter(items.values()))[0] > self.ttl:
+            items.popitem(last=False)
+
+
+class Verdicts(NamedTuple):
+    # Attack detection for each threshold of the detectors
+    art: Tuple[bool, ...]
+    saw: Tuple[bool, ...]
+    ssc: Tuple[bool, ...]
+    dmv: Tuple[bool, ...]
+    # Scores of the detectors, as in the 'score' column of the batch results
+    scores: Tuple[float, float, float, float]
+
+
+class OnlineDetector:
+    """ ART, SAW, SSC and DMV checks of one message at a time.
+
+        Messages are mappings with the raw VeReMi columns (rcvTime, sendTime,
+        sender, messageID, receiver, pxSnd, pySnd, pzSnd, sxSnd, sySnd, szSnd,
+        pxRcv, pyRcv, pzRcv) arriving in reception order. The last message of
+        each (receiver, sender) pair (SAW and SSC) and the messages of each
+        sender sent in the last 'time_threshold' seconds (DMV) are kept in
+        ExpiringCache instances of 'capacity' entries and 'ttl' seconds; a pair
+        evicted and heard again is a new first contact.
+    """
+
+    def __init__(
+        self, art: Sequence[float] = (), saw: Sequence[float] = (), ssc: Sequence[float] = (),
+        dmv: Sequence[float] = (), time_threshold: float = 10, capacity: int = 100_000, ttl: float = 60
+    ):
+        self.art = tuple(float(t) for t in art)
+        self.saw = tuple(float(t) for t in saw)
+        self.ssc = tuple(float(t) for t in ssc)
+        self.dmv = tuple(float(t) for t in dmv)
+        self.time_threshold = time_threshold
+        # (receiver, sender) -> (rcvTime, x, y, z) of the last message
+        self.pairs = ExpiringCache(capacity, ttl)
+        # sender -> {messageID: (sendTime, x, y, z, moved, first)} inside the time window
+        self.senders = ExpiringCache(capacity, ttl)
+
+    def process(self, message: Mapping) -> Verdicts:
+        now = float(message['rcvTime'])
+        sender = int(message['sender'])
+        x, y, z = float(message['pxSnd']), float(message['pySnd']), float(message['pzSnd'])
+        distance = math.sqrt((x - float(message['pxRcv'])) ** 2 + (y - float(message['pyRcv'])) ** 2
+                             + (z - float(message['pzRcv'])) ** 2)
+
+        # Previous message of the (receiver, sender) pair
+        key = (int(message['receiver']), sender)
+        previous = self.pairs.get(key, now)
+        self.pairs.put(key, (now, x, y, z), now)
+
+        # ART: sender farther than the threshold
+        art = tuple(distance > t for t in self.art)
+
+        # SAW: first contact already closer than the threshold
+        first = previous is None
+        saw = tuple(first and distance < t for t in self.saw)
+
+        # SSC: reported speed against the speed implied by the previous message
+        if previous is None:
+            delta = -1.0
+            ssc = (False,) * len(self.ssc)
+        else:
+            elapsed = now - previous[0]
+            moved = math.sqrt((x - previous[1]) ** 2 + (y - previous[2]) ** 2 + (z - previous[3]) ** 2)
+            speed = math.sqrt(float(message['sxSnd']) ** 2 + float(message['sySnd']) ** 2
+                              + float(message['szSnd']) ** 2)
+            delta = abs(speed - moved / (elapsed if elapsed != 0 else 1))
+            ssc = tuple(self.suspicious_speed(delta, t) for t in self.ssc)
+
+        # DMV: distance moved since the oldest message of the sender in the window
+        moved, still = self.moved(sender, int(message['messageID']), float(message['sendTime']), x, y, z)
+        dmv = tuple(not still and moved <= t for t in self.dmv)
+
+        return Verdicts(art, saw, ssc, dmv, (
+            distance, -distance if first else -math.inf, delta if delta >= 0 else -math.inf,
+            -math.inf if still else -moved))
+
+    # noinspection PyMethodMayBeStatic
+    def suspicious_speed(self, delta: float, threshold: float) -> bool:
+        """ SscFeature.check_speed rule for one message and threshold. """
+        if delta >= threshold:
+            return True
+        disbelief = delta / threshold * (1 - SscFeature._UNCERTAINTY_FACTOR)
+        return delta > 0 and 1 - SscFeature._UNCERTAINTY_FACTOR - disbelief < 0.2
+
+    def moved(self, sender: int, message_id: int, send_time: float, x: float, y: float, z: float) -> Tuple[float, bool]:
+        """ Distance moved by the sender inside the time window and whether the message opens it.
+
+            Every received copy of a message gets the result of its first copy.
+        """
+        track = self.senders.get(sender, send_time)
+        if track is None:
+            track = {}
+        else:
+            sent = track.get(message_id)
+            if sent is not None:
+                self.senders.put(sender, track, send_time)
+                return sent[4], sent[5]
+            # Drop the messages sent before the window
+            for old in list(track):
+                if track[old][0] > send_time - self.time_threshold:
+                    break
+                del track[old]
+        if len(track) == 0:
+            moved, first = 0.0, True
+        else:
+            oldest = next(iter(track.values()))
+            moved, first = math.sqrt((x - oldest[1]) ** 2 + (y - oldest[2]) ** 2 + (z - oldest[3]) ** 2), False
+        track[message_id] = (send_time, x, y, z, moved, first)
+        self.senders.put(sender, track, send_time)
+        return moved, first
+
+
+def messages(file: str, rows: int = None) -> Sequence[Dict]:
+    """ Messages of a VeReMi CSV file in reception order. """
+    data = pandas.read_csv(file, nrows=rows)
+    return data.sort_values('rcvTime', kind='stable').to_dict('records')
+
+
+def replay(detector: OnlineDetector, feed: Sequence[Mapping], rate: float = None) -> Dict:
+    """ Feed the messages to the detector, paced at 'rate' messages per second or as fast as possible.
+
+        The latency of a message is measured from its scheduled arrival, so it
+        includes the time waiting behind slower messages when the detector does
+        not keep up with the rate.
+    """
+    latency = numpy.empty(len(feed))
+    service = 0.0
+    clock = time.perf_counter
+    start_time = clock()
+    for idx, message in enumerate(feed):
+        due = start_time + idx / rate if rate else clock()
+        now = clock()
+        while now < due:
+            now = clock()
+        begin = clock()
+        detector.process(message)
+        end = clock()
+        service += end - begin
+        latency[idx] = end - (due if rate else begin)
+    elapsed = clock() - start_time
+    return {
+        'rate': rate, 'messages': len(feed), 'achieved': len(feed) / elapsed if elapsed > 0 else None,
+        'p50_us': float(numpy.percentile(latency, 50)) * 1e6 if len(feed) > 0 else None,
+        'p99_us': float(numpy.percentile(latency, 99)) * 1e6 if len(feed) > 0 else None,
+        'max_rate': len(feed) / service if service > 0 else None,
+    }
+
+
+def main(args: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description='Replay a VeReMi simulation through the online detectors.')
+    parser.add_argument('file', help='VeReMi simulation CSV file')
+    parser.add_argument('--rates', type=float, nargs='*', default=[], help='paced rates in messages per second')
+    parser.add_argument('--rows', type=int, default=None, help='replay only the first rows of the file')
+    parser.add_argument('--capacity', type=int, default=100_000, help='state entries per cache')
+    parser.add_argument('--ttl', type=float, default=60, help='state time to live in seconds')
+    options = parser.parse_args(args)
+    feed = messages(options.file, options.rows)
+    results = []
+    for rate in [None] + options.rates:
+        detector = OnlineDetector(**THRESHOLDS, capacity=options.capacity, ttl=options.ttl)
+        results.append(replay(detector, feed, rate))
+        print(f"{rate or 'max':>10}: p50 {results[-1]['p50_us']:.1f}us p99 {results[-1]['p99_us']:.1f}us",
+              file=sys.stderr)
+    print(pandas.DataFrame(results).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import numpy
+import pandas
+import zipfile
+from abc import ABC, abstractmethod
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+
+class OutputFormat(ABC):
+    """ OutputFormat Base class
+
+        Output formats write and read back the result Data Frames of the
+        features. Appendable formats can receive the result of a file in
+        several parts (streaming mode).
+    """
+    appendable = False
+
+    @abstractmethod
+    def write(self, data: pandas.DataFrame, file: str, append: bool = False):
+        pass
+
+    @abstractmethod
+    def read(self, file: str) -> pandas.DataFrame:
+        pass
+
+
+class CsvFormat(OutputFormat):
+    """ Plain CSV with the verdict and confusion matrix labels as text. """
+    appendable = True
+
+    def write(self, data: pandas.DataFrame, file: str, append: bool = False):
+        data.to_csv(file, mode='a' if append else 'w', header=not append)
+
+    def read(self, file: str) -> pandas.DataFrame:
+        return pandas.read_csv(file, index_col=0)
+
+
+class NpzFormat(OutputFormat):
+    """ Compressed columnar NumPy archive.
+
+        Each written part is stored as a '{part}.json' member with the column
+        names and one '{part}/{position}.npy' member per column. Numeric columns
+        keep their dtype, every other column (verdicts, confusion matrix, text)
+        is stored as categorical codes ('int8' for the result labels) with the
+        categories in '{part}/{position}.categories.npy'. Parts are appended to
+        the archive, so results can be written chunk by chunk.
+    """
+    appendable = True
+
+    def write(self, data: pandas.DataFrame, file: str, append: bool = False):
+        with zipfile.ZipFile(file, 'a' if append else 'w', zipfile.ZIP_DEFLATED) as archive:
+            part = f'{sum(name.endswith(".json") for name in archive.namelist()):05d}'
+            meta = {'index': data.index.name, 'columns': []}
+            self.put(archive, f'{part}/index', data.index.to_numpy())
+            for position, (name, column) in enumerate(data.items()):
+                categorical = not (is_numeric_dtype(column.dtype) or is_bool_dtype(column.dtype))
+                if categorical:
+                    values = pandas.Categorical(column)
+                    self.put(archive, f'{part}/{position}', values.codes)
+                    self.put(archive, f'{part}/{position}.categories', values.categories.to_numpy(dtype=str))
+                else:
+                    self.put(archive, f'{part}/{position}', column.to_numpy())
+                meta['columns'].append({'name': name, 'categorical': categorical})
+            archive.writestr(f'{part}.json', json.dumps(meta))
+
+    def read(self, file: str) -> pandas.DataFrame:
+        frames = []
+        with zipfile.ZipFile(file) as archive:
+            for meta_name in sorted(name for name in archive.namelist() if name.endswith('.json')):
+                part = meta_name[:-len('.json')]
+                meta = json.loads(archive.read(meta_name))
+                columns = {}
+                for position, column in enumerate(meta['columns']):
+                    values = self.get(archive, f'{part}/{position}')
+                    if column['categorical']:
+                        categories = self.get(archive, f'{part}/{position}.categories')
+                        values = pandas.Categorical.from_codes(values, categories=categories)
+                    columns[column['name']] = values
+                index = pandas.Index(self.get(archive, f'{part}/index'), name=meta['index'])
+                frames.append(pandas.DataFrame(columns, index=index))
+        return frames[0] if len(frames) == 1 else pandas.concat(frames)
+
+    # noinspection PyMethodMayBeStatic
+    def put(self, archive: zipfile.ZipFile, name: str, array: numpy.ndarray):
+        with archive.open(f'{name}.npy', 'w', force_zip64=True) as fp:
+            numpy.lib.format.write_array(fp, numpy.asarray(array), allow_pickle=False)
+
+    # noinspection PyMethodMayBeStatic
+    def get(self, archive: zipfile.ZipFile, name: str) -> numpy.ndarray:
+        with archive.open(f'{name}.npy') as fp:
+            return numpy.lib.format.read_array(fp, allow_pickle=False)
+
+
+class ParquetFormat(OutputFormat):
+    """ Apache Parquet, categorical columns are dictionary encoded. Requires pyarrow. """
+
+    def write(self, data: pandas.DataFrame, file: str, append: bool = False):
+        data.to_parquet(file, engine='pyarrow', compression='zstd')
+
+    def read(self, file: str) -> pandas.DataFrame:
+        return pandas.read_parquet(file, engine='pyarrow')
+
+
+class FeatherFormat(OutputFormat):
+    """ Apache Arrow IPC (Feather), categorical columns are dictionary encoded. Requires pyarrow. """
+
+    def write(self, data: pandas.DataFrame, file: str, append: bool = False):
+        data.reset_index().to_feather(file, compression='zstd')
+
+    def read(self, file: str) -> pandas.DataFrame:
+        data = pandas.read_feather(file)
+        return data.set_index(data.columns[0]).rename_axis(None)
+
+
+# Output formats by result file extension
+FORMATS = {
+    'csv': CsvFormat,
+    'npz': NpzFormat,
+    'parquet': ParquetFormat,
+    'feather': FeatherFormat,
+}
+
+
+# Bookkeeping files written by CsvRunner next to the result files
+BOOKKEEPING = ('manifest.json', 'telemetry.jsonl', 'metrics.csv', 'jobs.db')
+
+
+def extension(file: str) -> str:
+    return os.path.splitext(file)[1].lstrip('.').lower()
+
+
+def readable(file: str) -> bool:
+    """ Check if the file is a result file of a known output format. """
+    return extension(file) in FORMATS and os.path.basename(file) not in BOOKKEEPING
+
+
+def read(file: str) -> pandas.DataFrame:
+    """ Read a result file in the output format of its extension. """
+    return FORMATS[extension(file)]().read(file)
@@ -0,0 +1,501 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+"""
+    Asyncio ingestion service running the detectors on micro-batches.
+
+    Vehicles or simulators push beacons over TCP or UDP, framed as JSON (one
+    object per line, or per datagram) or as fixed size binary RECORD structs.
+    The messages are buffered into micro-batches closed by size or time, the
+    features process each batch as the next chunk of a stream, and the
+    verdicts are sent back to the TCP clients as JSON lines and appended to an
+    optional sink file. The features are the service FEATURES, with the online
+    detector thresholds, or a configured list given as 'module:attribute'. A
+    local load generator replays VeReMi files:
+
+        python -m ascendcontroller.service serve --port 9000 --sink verdicts.jsonl
+        python -m ascendcontroller.service serve --features detectors:FEATURES
+        python -m ascendcontroller.service load simulation.csv --port 9000 --framing binary
+"""
+
+import sys
+import json
+import time
+import numpy
+import pandas
+import socket
+import asyncio
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple, Union
+from ascendcontroller.online import THRESHOLDS, messages
+from ascendcontroller.base import MESSAGE_COLUMNS, DerivedColumns, Feature, FeatureParam, FeatureResult
+from ascendcontroller.features.art import ArtFeature, ArtFeatureParam
+from ascendcontroller.features.dmv import DmvFeature, DmvFeatureParam
+from ascendcontroller.features.ssc import SscFeature, SscFeatureParam
+from ascendcontroller.features.saw import SawFeature, SawFeatureParam
+
+# Binary framing: one little-endian record per message
+RECORD = numpy.dtype([
+    ('rcvTime', '<f8'), ('sendTime', '<f8'),
+    ('sender', '<i4'), ('messageID', '<i4'), ('receiver', '<i4'), ('attackerType', '<i4'),
+    ('pxSnd', '<f4'), ('pySnd', '<f4'), ('pzSnd', '<f4'), ('sxSnd', '<f4'), ('sySnd', '<f4'), ('szSnd', '<f4'),
+    ('pxRcv', '<f4'), ('pyRcv', '<f4'), ('pzRcv', '<f4'),
+])
+
+# Columns identifying the message of each verdict
+KEY_COLUMNS = ['sender', 'messageID', 'receiver']
+
+# Fields of every JSON message, 'attackerType' is optional
+FIELDS = [name for name in RECORD.names if name != 'attackerType']
+
+# Messages of one client, a list of JSON objects or an array of binary records
+Payload = Union[List[Dict], numpy.ndarray]
+
+
+def encode(data: pandas.DataFrame) -> bytes:
+    """ Binary records of the messages of a Data Frame. """
+    records = numpy.zeros(len(data), dtype=RECORD)
+    for name in RECORD.names:
+        if name in data.columns:
+            records[name] = data[name].to_numpy()
+    return records.tobytes()
+
+
+def decode(data: bytes, framing: str) -> Payload:
+    """ Messages of a datagram or of complete TCP frames, reporting and dropping the invalid JSON messages. """
+    if framing == 'binary':
+        return numpy.frombuffer(data, dtype=RECORD)
+    payload = []
+    for line in data.splitlines():
+        if line.strip():
+            message = json.loads(line)
+            for record in (message if isinstance(message, list) else [message]):
+                error = invalid(record)
+                if error is None:
+                    payload.append(record)
+                else:
+                    print(f'Invalid message {str(record)[:80]}. Error: {error}', file=sys.stderr)
+    return payload
+
+
+def invalid(message: Any) -> str:
+    """ Reason to drop a JSON message, None when it holds a number in every field. """
+    if not isinstance(message, dict):
+        return 'not an object'
+    missing = [name for name in FIELDS
+               if not isinstance(message.get(name), (int, float)) or isinstance(message.get(name), bool)]
+    return f'missing or non-numeric fields {missing}' if len(missing) > 0 else None
+
+
+def _prepare(param: FeatureParam, data: pandas.DataFrame, thresholds: Sequence) -> FeatureParam:
+    param.thresholds = thresholds
+    param.data = data[list(MESSAGE_COLUMNS)]
+    return param
+
+
+class ArtParam(ArtFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(ArtParam(), data, THRESHOLDS['art'])
+
+
+class SawParam(SawFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(SawParam(), data, THRESHOLDS['saw'])
+
+
+class SscParam(SscFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(SscParam(), data, THRESHOLDS['ssc'])
+
+
+class DmvParam(DmvFeatureParam):
+    def build(data: pandas.DataFrame):
+        return _prepare(DmvParam(), data, THRESHOLDS['dmv'])
+
+
+# Features of the service, with the thresholds of the online detector
+FEATURES: List[Feature] = [
+    ArtFeature(factory=ArtParam),
+    SawFeature(factory=SawParam),
+    SscFeature(factory=SscParam),
+    DmvFeature(factory=DmvParam),
+]
+
+
+def load_features(name: str) -> List[Feature]:
+    """ Features configured in a module, named 'module:attribute' (a list or a dict of features). """
+    module, _, attribute = name.partition(':')
+    features = getattr(importlib.import_module(module), attribute or 'FEATURES')
+    return list(features.values() if isinstance(features, dict) else features)
+
+
+class IngestionService:
+    """ Micro-batching detector service.
+
+        Incoming messages are buffered until 'batch_size' messages arrived or
+        'batch_time' seconds passed since the first buffered one. Each batch
+        runs on a single worker thread, so the features see the batches in
+        arrival order through 'process_chunk' with their state kept between
+        batches, while the event loop keeps receiving. While a batch runs the
+        next one keeps growing, so a backlog is processed in larger batches. Each verdict is a JSON
+        object with the message keys, the verdict columns (true for an attack)
+        and the scores of the features. Messages without 'attackerType' (live
+        feeds have no ground truth) are taken as normal.
+
+        The features see each batch in reception time order. Messages received
+        before the last processed one, by at most 'lateness' seconds, are late:
+        they skip the features and their verdict is only marked 'late' (null or
+        absent verdict columns). An older message means the feed went back in
+        time (a replay or a simulator restart) and the features start over with
+        new state.
+    """
+
+    def __init__(
+        self, features: Sequence[Feature], batch_size: int = 1024, batch_time: float = 0.01, sink: str = None,
+        lateness: float = 1.0
+    ):
+        self.features = features
+        self.states = [{} for _ in features]
+        self.lateness = lateness
+        # Reception time of the last processed message
+        self.clock = -numpy.inf
+        self.batch_size = batch_size
+        self.batch_time = batch_time
+        self.sink = open(sink, 'a') if sink else None
+        self.buffer: List[Tuple[Any, Payload]] = []
+        self.size = 0
+        self.timer: asyncio.TimerHandle = None
+        self.worker = ThreadPoolExecutor(1)
+        self.running: List[asyncio.Future] = []
+        self.servers = []
+        self.stats = {'messages': 0, 'batches': 0, 'seconds': 0.0, 'late': 0, 'restarts': 0}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 9000, tcp: bool = True, udp: bool = True,
+                    framing: str = 'json'):
+        """ Listen for TCP connections and UDP datagrams on the port. """
+        loop = asyncio.get_running_loop()
+        if tcp:
+            self.servers.append(await loop.create_server(lambda: _TcpProtocol(self, framing), host, port))
+        if udp:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self, framing), (host, port))
+            # Room for the datagrams arriving while the loop is busy
+            transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+            self.servers.append(transport)
+
+    async def close(self):
+        """ Stop listening and process the buffered messages. """
+        for server in self.servers:
+            server.close()
+        self.flush()
+        while len(self.running) > 0:
+            await asyncio.gather(*self.running)
+        self.worker.shutdown()
+        if self.sink is not None:
+            self.sink.close()
+
+    def submit(self, origin: Any, payload: Payload):
+        """ Buffer the messages of a client ('origin' is its TCP transport, None for UDP). """
+        if len(payload) == 0:
+            return
+        self.buffer.append((origin, payload))
+        self.size += len(payload)
+        if self.size >= self.batch_size:
+            self.flush()
+        elif self.timer is None and len(self.running) == 0:
+            self.timer = asyncio.get_running_loop().call_later(self.batch_time, self.flush)
+
+    def flush(self):
+        """ Close the current batch and run it on the worker thread, unless it is busy. """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if len(self.buffer) == 0 or len(self.running) > 0:
+            return
+        batch, self.buffer, self.size = self.buffer, [], 0
+        future = asyncio.get_running_loop().run_in_executor(self.worker, self.detect, batch)
+        future.add_done_callback(lambda done: self.deliver(batch, done))
+        self.running.append(future)
+
+    def detect(self, batch: Sequence[Tuple[Any, Payload]]) -> List[str]:
+        """ Run the features over a batch and return the JSON lines of the verdicts of each payload. """
+        start_time = time.perf_counter()
+        data = self.frame([payload for _, payload in batch])
+        data['attackerType'] = data['attackerType'].fillna(0) if 'attackerType' in data.columns else 0
+        rows, late = self.schedule(data.rcvTime.to_numpy(dtype=float))
+        chunk = data.iloc[rows].reset_index(drop=True)
+        verdicts = {}
+        columns = DerivedColumns(chunk)
+        for idx, feature in enumerate(self.features if len(chunk) > 0 else []):
+            try:
+                result: FeatureResult = feature.process_chunk(chunk, self.states[idx], columns=columns)
+            except Exception as e:
+                result = FeatureResult(data=None, error=e)
+            if result.error is not None:
+                print(f'Error processing a batch on feature {feature.name}. Error: {result.error}', file=sys.stderr)
+                continue
+            for name in columns.publish(result):
+                verdicts[name] = columns[name]
+
+        # Verdicts in the order of the messages, null for the late ones
+        verdicts = pandas.DataFrame(verdicts, index=rows).reindex(numpy.arange(len(data)))
+        verdicts.insert(0, 'late', late)
+        for position, name in enumerate(KEY_COLUMNS):
+            verdicts.insert(position, name, data[name].to_numpy())
+        lines = verdicts.to_json(orient='records', lines=True).splitlines(keepends=True)
+        if self.sink is not None:
+            self.sink.writelines(lines)
+            self.sink.flush()
+        self.stats['messages'] += len(data)
+        self.stats['batches'] += 1
+        self.stats['seconds'] += time.perf_counter() - start_time
+        # Split the lines by payload
+        bounds = numpy.cumsum([0] + [len(payload) for _, payload in batch])
+        return [''.join(lines[begin:end]) for begin, end in zip(bounds[:-1], bounds[1:])]
+
+    def schedule(self, time: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """ Rows of a batch processed by the features, in reception time order, and its late messages. """
+        if len(time) > 0 and time.min() < self.clock - self.lateness:
+            print(f'Reception time went back from {self.clock} to {time.min()}, restarting the features',
+                  file=sys.stderr)
+            self.states = [{} for _ in self.features]
+            self.clock = -numpy.inf
+            self.stats['restarts'] += 1
+        late = time < self.clock
+        order = numpy.argsort(time, kind='stable')
+        rows = order[~late[order]]
+        if len(rows) > 0:
+            self.clock = time[rows[-1]]
+        self.stats['late'] += int(late.sum())
+        return rows, late
+
+    # noinspection PyMethodMayBeStatic
+    def frame(self, payloads: Sequence[Payload]) -> pandas.DataFrame:
+        """ Data Frame of the messages, joining the consecutive payloads of the same framing first. """
+        frames = []
+        start = 0
+        for end in range(1, len(payloads) + 1):
+            if end == len(payloads) or type(payloads[end]) is not type(payloads[start]):
+                group = payloads[start:end]
+                if isinstance(group[0], numpy.ndarray):
+                    frames.append(pandas.DataFrame(numpy.concatenate(group)))
+                else:
+                    frames.append(pandas.DataFrame([message for payload in group for message in payload]))
+                start = end
+        return pandas.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def deliver(self, batch: Sequence[Tuple[Any, Payload]], done: asyncio.Future):
+        """ Send the verdicts back to the TCP clients still connected and start the next batch. """
+        self.running.remove(done)
+        self.flush()
+        if done.exception() is not None:
+            print(f'Error processing a batch. Error: {done.exception()}', file=sys.stderr)
+            return
+        for (origin, _), text in zip(batch, done.result()):
+            if origin is not None and not origin.is_closing():
+                origin.write(text.encode())
+
+
+class _TcpProtocol(asyncio.Protocol):
+    def __init__(self, service: IngestionService, framing: str):
+        self.service = service
+        self.framing = framing
+        self.buffer = bytearray()
+        self.transport = None
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        # Keep the incomplete frame for the next data
+        if self.framing == 'binary':
+            end = len(self.buffer) - len(self.buffer) % RECORD.itemsize
+        else:
+            end = self.buffer.rfind(b'\n') + 1
+        if end > 0:
+            frames = bytes(self.buffer[:end])
+            del self.buffer[:end]
+            try:
+                payload = decode(frames, self.framing)
+            except ValueError:
+                payload = self.decode_lines(frames)
+            self.service.submit(self.transport, payload)
+
+    def decode_lines(self, frames: bytes) -> Payload:
+        """ Messages of the valid JSON lines, reporting and dropping the malformed ones. """
+        payload = []
+        for line in frames.splitlines():
+            try:
+                payload.extend(decode(line, self.framing))
+            except ValueError as e:
+                peer = self.transport.get_extra_info('peername')
+                print(f'Invalid frame from {peer}. Error: {e}', file=sys.stderr)
+        return payload
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service: IngestionService, framing: str):
+        self.service = service
+        self.framing = framing
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            payload = decode(data, self.framing)
+        except ValueError as e:
+            print(f'Invalid datagram from {addr}. Error: {e}', file=sys.stderr)
+            return
+        self.service.submit(None, payload)
+
+
+async def generate(
+    file: str, host: str = '127.0.0.1', port: int = 9000, protocol: str = 'tcp', framing: str = 'json',
+    rate: float = None, rows: int = None, timeout: float = 30
+) -> Dict:
+    """ Replay a VeReMi file to the service at 'rate' messages per second (as fast as possible by default).
+
+        Over TCP the verdicts are awaited and their latency from the message send
+        time is reported; UDP only reports the send rate.
+    """
+    feed = messages(file, rows)
+    data = pandas.DataFrame(feed)
+    if framing == 'binary':
+        frames = [record.tobytes() for record in numpy.frombuffer(encode(data), dtype=RECORD)]
+    else:
+        frames = [(json.dumps(message) + '\n').encode() for message in feed]
+    keys = list(zip(*[data[name].astype(int).tolist() for name in KEY_COLUMNS]))
+    loop = asyncio.get_running_loop()
+    sent = {}
+    latency = []
+
+    async def pace(idx: int, start_time: float):
+        if rate:
+            delay = start_time + idx / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif idx % 256 == 0:
+            await asyncio.sleep(0)
+
+    start_time = time.perf_counter()
+    if protocol == 'udp':
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+        for idx, frame in enumerate(frames):
+            await pace(idx, start_time)
+            transport.sendto(frame)
+        transport.close()
+        elapsed = time.perf_counter() - start_time
+        return {'protocol': protocol, 'framing': framing, 'messages': len(frames), 'send_rate': len(frames) / elapsed}
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def receive():
+        while len(latency) < len(frames):
+            line = await reader.readline()
+            if not line:
+                break
+            verdict = json.loads(line)
+            latency.append(time.perf_counter() - sent[tuple(verdict[name] for name in KEY_COLUMNS)])
+
+    receiver = asyncio.ensure_future(receive())
+    for idx, frame in enumerate(frames):
+        await pace(idx, start_time)
+        sent[keys[idx]] = time.perf_counter()
+        writer.write(frame)
+        if idx % 256 == 255:
+            await writer.drain()
+    await writer.drain()
+    try:
+        await asyncio.wait_for(receiver, timeout)
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start_time
+    writer.close()
+    return {
+        'protocol': protocol, 'framing': framing, 'messages': len(frames), 'verdicts': len(latency),
+        'rate': len(latency) / elapsed,
+        'p50_ms': float(numpy.percentile(latency, 50)) * 1e3 if latency else None,
+        'p99_ms': float(numpy.percentile(latency, 99)) * 1e3 if latency else None,
+    }
+
+
+async def serve(options: argparse.Namespace):
+    features = load_features(options.features) if options.features else FEATURES
+    service = IngestionService(features, options.batch_size, options.batch_time, options.sink, options.lateness)
+    await service.start(options.host, options.port, framing=options.framing)
+    print(f'Listening on {options.host}:{options.port} (TCP and UDP, {options.framing} framing)', file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+        print(service.stats, file=sys.stderr)
+
+
+def main(args: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description='Detector ingestion service and load generator.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    server = commands.add_parser('serve', help='run the ingestion service')
+    server.add_argument('--batch-size', type=int, default=1024, help='messages per batch')
+    server.add_argument('--batch-time', type=float, default=0.01, help='seconds before closing a batch')
+    server.add_argument('--sink', default=None, help='JSON-lines file receiving every verdict')
+    server.add_argument('--features', default=None, help='features configured as module:attribute')
+    server.add_argument('--lateness', type=float, default=1.0,
+                        help='seconds a message may arrive late before the features restart')
+    load = commands.add_parser('load', help='replay a VeReMi file to the service')
+    load.add_argument('file', help='VeReMi simulation CSV file')
+    load.add_argument('--protocol', choices=['tcp', 'udp'], default='tcp')
+    load.add_argument('--rate', type=float, default=None, help='messages per second')
+    load.add_argument('--rows', type=int, default=None, help='replay only the first rows of the file')
+    for command in (server, load):
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=9000)
+        command.add_argument('--framing', choices=['json', 'binary'], default='json')
+    options = parser.parse_args(args)
+    if options.command == 'serve':
+        try:
+            asyncio.run(serve(options))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(generate(
+            options.file, options.host, options.port, options.protocol, options.framing, options.rate,
+            options.rows))))
+
+
+if __name__ == '__main__':
+    main()
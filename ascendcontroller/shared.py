@@ -0,0 +1,146 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+
+class SharedArray(NamedTuple):
+    # Column or derived column name
+    name: str
+    # Shared memory block name
+    block: str
+    dtype: str
+    shape: Tuple[int, ...]
+
+
+class SharedFrame(NamedTuple):
+    """ Descriptor of a simulation Data Frame published in shared memory.
+
+        Numeric columns and derived columns live in shared memory blocks, other
+        columns are shipped by value with the descriptor.
+    """
+    # Column names in the Data Frame order
+    names: Sequence[str]
+    columns: Sequence[SharedArray]
+    objects: Dict[str, numpy.ndarray]
+    derived: Sequence[SharedArray]
+
+
+def _share(name: str, values: numpy.ndarray, blocks: List[shared_memory.SharedMemory]) -> SharedArray:
+    values = numpy.ascontiguousarray(values)
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    blocks.append(block)
+    numpy.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+    return SharedArray(name, block.name, values.dtype.str, values.shape)
+
+
+def _attach(array: SharedArray, blocks: List[shared_memory.SharedMemory]) -> numpy.ndarray:
+    block = shared_memory.SharedMemory(name=array.block)
+    blocks.append(block)
+    values = numpy.ndarray(array.shape, dtype=numpy.dtype(array.dtype), buffer=block.buf)
+    # Shared arrays are read only, features replace columns instead of writing into them
+    values.flags.writeable = False
+    return values
+
+
+def prepare():
+    """ Start the resource tracker before creating the worker processes.
+
+        Workers started afterwards share the publisher tracker, otherwise each
+        worker would track, and unlink at exit, the blocks it attaches to.
+    """
+    resource_tracker.ensure_running()
+
+
+def publish(
+    data: pandas.DataFrame, derived: Dict[str, numpy.ndarray] = {}
+) -> Tuple[SharedFrame, List[shared_memory.SharedMemory]]:
+    """ Copy the numeric columns and derived columns into shared memory blocks.
+
+        Returns the descriptor to send to other processes and the blocks, which
+        must be released by the publisher with 'release'.
+    """
+    blocks = []
+    columns = []
+    objects = {}
+    try:
+        for name in data.columns:
+            values = data[name].to_numpy()
+            if values.dtype == object:
+                objects[name] = values
+            else:
+                columns.append(_share(name, values, blocks))
+        arrays = [_share(name, values, blocks) for name, values in derived.items()]
+    except Exception:
+        release(blocks)
+        raise
+    return SharedFrame(list(data.columns), columns, objects, arrays), blocks
+
+
+def attach(
+    frame: SharedFrame
+) -> Tuple[pandas.DataFrame, Dict[str, numpy.ndarray], List[shared_memory.SharedMemory]]:
+    """ Rebuild the Data Frame and derived columns over the shared blocks without copying. """
+    blocks = []
+    columns = {array.name: _attach(array, blocks) for array in frame.columns}
+    columns.update(frame.objects)
+    data = pandas.DataFrame({name: columns[name] for name in frame.names}, copy=False)
+    derived = {array.name: _attach(array, blocks) for array in frame.derived}
+    return data, derived, blocks
+
+
+def detach(blocks: List[shared_memory.SharedMemory]):
+    """ Close the attached blocks. Blocks still referenced are left to the process exit. """
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+
+def release(blocks: List[shared_memory.SharedMemory]):
+    """ Close and remove the published blocks. """
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass
+        block.unlink()
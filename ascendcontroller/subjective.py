@@ -0,0 +1,145 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+from typing import NamedTuple, Sequence, Union
+
+# Uncertainties below this value are treated as dogmatic opinions
+_DOGMATIC = 1e-9
+
+
+class Opinion(NamedTuple):
+    """ Binomial Subjective Logic opinions stored as arrays.
+
+        The four arrays have the same shape, one opinion per element, with
+        'belief + disbelief + uncertainty = 1'. All operators are element-wise,
+        so a detector can build one opinion per row and threshold at once.
+    """
+    belief: numpy.ndarray
+    disbelief: numpy.ndarray
+    uncertainty: numpy.ndarray
+    base_rate: numpy.ndarray
+
+    @staticmethod
+    def create(belief, disbelief, uncertainty, base_rate=0.5) -> 'Opinion':
+        """ Build opinions broadcasting scalars and arrays to a common shape. """
+        arrays = [numpy.asarray(values, dtype=float) for values in (belief, disbelief, uncertainty, base_rate)]
+        return Opinion(*numpy.broadcast_arrays(*arrays))
+
+    @staticmethod
+    def vacuous(shape, base_rate=0.5) -> 'Opinion':
+        """ Opinions with no evidence at all. """
+        return Opinion.create(numpy.zeros(shape), 0.0, 1.0, base_rate)
+
+    def expectation(self) -> numpy.ndarray:
+        """ Projected probability 'belief + base_rate * uncertainty'. """
+        return self.belief + self.base_rate * self.uncertainty
+
+    def discount(self, trust: Union['Opinion', numpy.ndarray, float]) -> 'Opinion':
+        """ Trust discounting: scale the evidence by the projected probability
+            of the trust opinion (or by a trust probability).
+        """
+        p = trust.expectation() if isinstance(trust, Opinion) else numpy.asarray(trust, dtype=float)
+        belief = p * self.belief
+        disbelief = p * self.disbelief
+        return Opinion.create(belief, disbelief, 1 - belief - disbelief, self.base_rate)
+
+
+def _stack(opinions: Sequence[Opinion]) -> Opinion:
+    shape = numpy.broadcast_shapes(*[opinion.belief.shape for opinion in opinions])
+    return Opinion(*[numpy.stack([numpy.broadcast_to(values, shape) for values in field])
+                     for field in zip(*opinions)])
+
+
+def _others(uncertainty: numpy.ndarray) -> numpy.ndarray:
+    """ Product of the uncertainties of the other sources, without divisions. """
+    ones = numpy.ones_like(uncertainty[:1])
+    before = numpy.cumprod(numpy.concatenate((ones, uncertainty[:-1])), axis=0)
+    after = numpy.cumprod(numpy.concatenate((ones, uncertainty[:0:-1])), axis=0)[::-1]
+    return before * after
+
+
+def _dogmatic(stacked: Opinion) -> Opinion:
+    """ Equal weight fusion of the dogmatic sources, which dominate the others. """
+    weight = (stacked.uncertainty < _DOGMATIC).astype(float)
+    count = numpy.maximum(weight.sum(axis=0), 1)
+    belief = (weight * stacked.belief).sum(axis=0) / count
+    disbelief = (weight * stacked.disbelief).sum(axis=0) / count
+    base_rate = (weight * stacked.base_rate).sum(axis=0) / count
+    return Opinion.create(belief, disbelief, 0.0, base_rate)
+
+
+def cumulative_fusion(opinions: Sequence[Opinion]) -> Opinion:
+    """ Cumulative belief fusion of independent sources (evidence is added). """
+    stacked = _stack(opinions)
+    others = _others(stacked.uncertainty)
+    product = numpy.prod(stacked.uncertainty, axis=0)
+    dogmatic = (stacked.uncertainty < _DOGMATIC).any(axis=0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        norm = others.sum(axis=0) - (len(opinions) - 1) * product
+        belief = (stacked.belief * others).sum(axis=0) / norm
+        uncertainty = product / norm
+        weight = (1 - stacked.uncertainty) * others
+        total = weight.sum(axis=0)
+        base_rate = numpy.where(
+            total > 0, (stacked.base_rate * weight).sum(axis=0) / total, stacked.base_rate.mean(axis=0))
+
+    fallback = _dogmatic(stacked)
+    belief = numpy.where(dogmatic, fallback.belief, belief)
+    uncertainty = numpy.where(dogmatic, 0.0, uncertainty)
+    base_rate = numpy.where(dogmatic, fallback.base_rate, base_rate)
+    return Opinion.create(belief, 1 - belief - uncertainty, uncertainty, base_rate)
+
+
+def averaging_fusion(opinions: Sequence[Opinion]) -> Opinion:
+    """ Averaging belief fusion of dependent sources (evidence is averaged). """
+    stacked = _stack(opinions)
+    others = _others(stacked.uncertainty)
+    product = numpy.prod(stacked.uncertainty, axis=0)
+    dogmatic = (stacked.uncertainty < _DOGMATIC).any(axis=0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        norm = others.sum(axis=0)
+        belief = (stacked.belief * others).sum(axis=0) / norm
+        uncertainty = len(opinions) * product / norm
+
+    fallback = _dogmatic(stacked)
+    belief = numpy.where(dogmatic, fallback.belief, belief)
+    uncertainty = numpy.where(dogmatic, 0.0, uncertainty)
+    return Opinion.create(belief, 1 - belief - uncertainty, uncertainty, stacked.base_rate.mean(axis=0))
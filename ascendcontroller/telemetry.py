@@ -0,0 +1,129 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import pandas
+import threading
+from typing import Dict, Iterable
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Factory build time of the feature running in the current thread
+_build = threading.local()
+
+
+def reset_build_time():
+    _build.time = 0.0
+
+
+def add_build_time(elapsed: float):
+    _build.time = getattr(_build, 'time', 0.0) + elapsed
+
+
+def build_time() -> float:
+    return getattr(_build, 'time', 0.0)
+
+
+def peak_rss() -> int:
+    """ Peak resident set size of the current process in bytes (None when unavailable). """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if os.uname().sysname == 'Darwin' else rss * 1024
+
+
+class Telemetry:
+    """ Per-file, per-feature run telemetry written as JSON lines.
+
+        Each record holds the load, build, process and write times in seconds,
+        the row count and throughput, the peak RSS of the worker process so far,
+        the output size and the error, if any.
+    """
+
+    def __init__(self, path: str):
+        # JSON-lines file path
+        self.path = path
+        self.records = []
+
+    @staticmethod
+    def record(file: str, feature: str, rows: int = 0, load: float = 0.0) -> Dict:
+        return {
+            'file': file, 'feature': feature, 'rows': rows,
+            'load': load, 'build': 0.0, 'process': 0.0, 'write': 0.0,
+            'rows_per_sec': None, 'peak_rss': None, 'output_bytes': 0, 'error': None
+        }
+
+    @staticmethod
+    def finish(record: Dict, output_file: str = None) -> Dict:
+        compute = record['build'] + record['process']
+        record['rows_per_sec'] = record['rows'] / compute if compute > 0 else None
+        record['peak_rss'] = peak_rss()
+        if output_file is not None:
+            record['output_bytes'] = os.path.getsize(output_file)
+        record['time'] = time.time()
+        return record
+
+    def emit(self, records: Iterable[Dict]):
+        records = list(records)
+        with open(self.path, 'a') as fp:
+            for record in records:
+                fp.write(json.dumps(record) + '\n')
+        self.records.extend(records)
+
+    def summary(self) -> pandas.DataFrame:
+        """ Totals by feature of the records emitted in this run. """
+        columns = ['files', 'rows', 'load', 'build', 'process', 'write', 'rows_per_sec',
+                   'peak_rss', 'output_bytes', 'errors']
+        if len(self.records) == 0:
+            return pandas.DataFrame(columns=columns)
+        df = pandas.DataFrame(self.records)
+        # Errors raised before any feature ran
+        df['feature'] = df.feature.fillna('(file)')
+        summary = df.groupby('feature').agg(
+            files=('file', 'nunique'), rows=('rows', 'sum'), load=('load', 'sum'), build=('build', 'sum'),
+            process=('process', 'sum'), write=('write', 'sum'), peak_rss=('peak_rss', 'max'),
+            output_bytes=('output_bytes', 'sum'), errors=('error', 'count'))
+        compute = summary.build + summary.process
+        summary['rows_per_sec'] = summary.rows / compute.where(compute > 0)
+        return summary[columns]
@@ -110,6 +110,8 @@ import os
 import re
 import pandas
 from enum import Enum
+from ascendcontroller import output
+from ascendcontroller import curves
 from matplotlib import pyplot as plt
 from typing import Dict, Sequence, Tuple
 
@@ -164,6 +166,11 @@ class PeformanceResult:
 
         - cmtx[XXX]             - [XXX] is the number of Threshold in each algorithm (ART, SAW, SSC and DMV)
                                         and the values for each type can be TP, FP, TN and FN.
+
+        Result files are read in the output format of their extension (CSV, NPZ,
+        Parquet or Feather), only the 'cmtx' columns are kept. 'curve' computes
+        the full resolution curve from the 'score' column instead of the fixed
+        thresholds.
     """
     thresholds = [100, 200, 300, 400, 450, 500, 550, 600, 700, 800]
     thresholds_saw = [25, 100, 200]
@@ -172,7 +179,6 @@ class PeformanceResult:
 
     @staticmethod
     def run(ctype: ChartFeature, files: Sequence) -> Sequence:
-        df = pandas.concat([pandas.read_csv(f) for f in files])
         values = {}
         lst = None
         if ctype is ChartFeature.ART:
@@ -184,15 +190,27 @@ class PeformanceResult:
         elif ctype is ChartFeature.DMV:
             lst = PeformanceResult.thresholds_dmv
 
+        columns = [f'cmtx{threshold}' for threshold in lst]
+        df = pandas.concat([output.read(f)[columns] for f in files])
+
         for threshold in lst:
             # Calculate the precision and recall
             counts = df[f'cmtx{threshold}'].value_counts()
-            precision = getattr(counts, 'TP', 0) / (getattr(counts, 'TP', 0) + getattr(counts, 'FP', 0))
-            recall = getattr(counts, 'TP', 0) / (getattr(counts, 'TP', 0) + getattr(counts, 'FN', 0))
+            precision = counts.get('TP', 0) / (counts.get('TP', 0) + counts.get('FP', 0))
+            recall = counts.get('TP', 0) / (counts.get('TP', 0) + counts.get('FN', 0))
             values[threshold] = [precision, recall]
 
         return values
 
+    @staticmethod
+    def curve(files: Sequence, decimals: int = None) -> pandas.DataFrame:
+        """ Precision and recall at every distinct score of the result files (columns
+            Distance, Precision and Recall as in 'get_result_data', plus the counts,
+            FPR and F1).
+        """
+        table = curves.curve(files, decimals).table()
+        return table.rename(columns={'threshold': 'Distance'})
+
     @staticmethod
     def get_result_data(
         result_path: str,
@@ -207,8 +225,9 @@ class PeformanceResult:
             pandas.read_csv(f'{result_path}{fh}')
 
         if high_df is None or low_df is None:
-            # Process result files
-            result_files = [f for f in os.listdir(result_path) if os.path.isfile(f'{result_path}{f}')]
+            # Process result files, without the density results saved next to them
+            result_files = [f for f in os.listdir(result_path)
+                            if os.path.isfile(f'{result_path}{f}') and output.readable(f) and f not in (fl, fh)]
 
             # Process the results for LOW density
             low_density_indexes = lowidx
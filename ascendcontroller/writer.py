@@ -0,0 +1,111 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import queue
+import threading
+from typing import Any, Callable
+from typing_extensions import Self
+from concurrent.futures import Future
+
+
+def completed(value: Any) -> Future:
+    """ Future already resolved with the given value. """
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class Writer:
+    """ Writer Base class
+
+        Writers run the result writes submitted by a runner worker. The base
+        writer runs each write synchronously when it is submitted.
+    """
+
+    def submit(self, function: Callable, *args) -> Future:
+        future = Future()
+        self.execute(future, function, args)
+        return future
+
+    # noinspection PyMethodMayBeStatic
+    def execute(self, future: Future, function: Callable, args):
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(function(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BackgroundWriter(Writer):
+    """ Write-behind queue served by one writer thread.
+
+        Writes run in submission order (chunks of a streamed result are appended
+        in order) while the worker computes the next feature or chunk. The queue
+        holds at most 'depth' results: 'submit' blocks when it is full, which
+        caps the memory held by pending results.
+    """
+
+    def __init__(self, depth: int = 2):
+        self.queue = queue.Queue(maxsize=depth)
+        self.thread = threading.Thread(target=self.serve, name='writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, function: Callable, *args) -> Future:
+        future = Future()
+        self.queue.put((future, function, args))
+        return future
+
+    def serve(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self.execute(*item)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
@@ -43,13 +43,14 @@ from ascendcontroller.features.art import ArtFeature, ArtFeatureParam
 from ascendcontroller.features.dmv import DmvFeature, DmvFeatureParam
 from ascendcontroller.features.ssc import SscFeature, SscFeatureParam
 from ascendcontroller.features.saw import SawFeature, SawFeatureParam
+from ascendcontroller.fusion import FusionFeature, FusionFeatureParam, VoteRule
 
 
 class ArtParam(ArtFeatureParam):
     """ ArtFeature requires a specific Data Frame with the following columns:
 
-        - senderPosition        - (x, y, z) tuple
-        - receiverPosition      - (x, y, z) tuple
+        - senderPosition        - pxSnd, pySnd, pzSnd
+        - receiverPosition      - pxRcv, pyRcv, pzRcv
         - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                            4-attack, 8-attack, 16-attack]
     """
@@ -58,16 +59,14 @@ class ArtParam(ArtFeatureParam):
         # Configure the Thresolds for Acceptance Range feature
         param.thresholds = [100, 200, 300, 400, 450, 500, 550, 600, 700, 800]
 
-        # Create the required columns for the feature
-        data['senderPosition'] = data.apply(lambda row: (row.pxSnd, row.pySnd, row.pzSnd), axis=1)
-        data['receiverPosition'] = data.apply(lambda row: (row.pxRcv, row.pyRcv, row.pzRcv), axis=1)
-        data['messageID'] = data.apply(lambda row: int(row.messageID), axis=1)
-        data['sender'] = data.apply(lambda row: int(row.sender), axis=1)
+        # Positions and speeds are derived by the feature from the raw columns
+        data['messageID'] = data.messageID.astype(int)
+        data['sender'] = data.sender.astype(int)
 
         # Drop unnecessary columns from Data Frame
         data = data.drop(columns=['Unnamed: 0', 'sendTime', 'gpsTime', 'rcvTime', 'pxSnd', 'pySnd',
                                   'pzSnd', 'sxSnd', 'sySnd', 'szSnd', 'pxRcv', 'pyRcv', 'pzRcv',
-                                  'sxRcv', 'syRcv', 'szRcv'])
+                                  'sxRcv', 'syRcv', 'szRcv'], errors='ignore')
 
         param.data = data
         return param
@@ -77,7 +76,9 @@ class DmvParam(DmvFeatureParam):
     """ DmvFeature requires a specific Data Frame with the following columns:
 
         - sender                - sender ID
-        - senderPosition        - (x, y, z) tuple
+        - messageID             - message ID
+        - senderPosition        - pxSnd, pySnd, pzSnd
+        - sendTime              - Message send time
         - rcvTime               - Message arrival time
         - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                            4-attack, 8-attack, 16-attack]
@@ -87,15 +88,14 @@ class DmvParam(DmvFeatureParam):
         # Configure the Thresolds for Distance Moved Verifier
         param.thresholds = [1, 5, 10, 15, 20, 25]
 
-        # Create the required columns for the feature
-        data['senderPosition'] = data.apply(lambda row: (row.pxSnd, row.pySnd, row.pzSnd), axis=1)
-        data['messageID'] = data.apply(lambda row: int(row.messageID), axis=1)
-        data['sender'] = data.apply(lambda row: int(row.sender), axis=1)
+        # Positions and speeds are derived by the feature from the raw columns
+        data['messageID'] = data.messageID.astype(int)
+        data['sender'] = data.sender.astype(int)
 
         # Drop unnecessary columns from Data Frame
         data = data.drop(columns=['Unnamed: 0', 'sendTime', 'gpsTime', 'pxSnd', 'pySnd',
                                   'pzSnd', 'sxSnd', 'sySnd', 'szSnd', 'pxRcv', 'pyRcv', 'pzRcv',
-                                  'sxRcv', 'syRcv', 'szRcv'])
+                                  'sxRcv', 'syRcv', 'szRcv'], errors='ignore')
 
         param.data = data
         return param
@@ -105,8 +105,8 @@ class SscParam(SscFeatureParam):
     """ SscFeature requires a specific Data Frame with the following columns:
 
         - sender                - sender ID
-        - senderPosition        - (x, y, z) tuple
-        - senderSpeed           - (x, y, z) tuple
+        - senderPosition        - pxSnd, pySnd, pzSnd
+        - senderSpeed           - sxSnd, sySnd, szSnd
         - rcvTime               - Message arrival time
         - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                            4-attack, 8-attack, 16-attack]
@@ -116,16 +116,14 @@ class SscParam(SscFeatureParam):
         # Configure the Thresolds for Distance Moved Verifier
         param.thresholds = [2.5, 5, 7.5, 10, 15, 20, 25]  # [35, 40, 45, 50, 60, 70, 80] # [5, 10, 15, 20, 30, 40, 50]
 
-        # Create the required columns for the feature
-        data['senderPosition'] = data.apply(lambda row: (row.pxSnd, row.pySnd, row.pzSnd), axis=1)
-        data['senderSpeed'] = data.apply(lambda row: (row.sxSnd, row.sySnd, row.szSnd), axis=1)
-        data['messageID'] = data.apply(lambda row: int(row.messageID), axis=1)
-        data['sender'] = data.apply(lambda row: int(row.sender), axis=1)
+        # Positions and speeds are derived by the feature from the raw columns
+        data['messageID'] = data.messageID.astype(int)
+        data['sender'] = data.sender.astype(int)
 
         # Drop unnecessary columns from Data Frame
         data = data.drop(columns=['Unnamed: 0', 'sendTime', 'gpsTime', 'pxSnd', 'pySnd',
                                   'pzSnd', 'sxSnd', 'sySnd', 'szSnd', 'pxRcv', 'pyRcv', 'pzRcv',
-                                  'sxRcv', 'syRcv', 'szRcv'])
+                                  'sxRcv', 'syRcv', 'szRcv'], errors='ignore')
 
         param.data = data
         return param
@@ -134,8 +132,8 @@ class SscParam(SscFeatureParam):
 class SawParam(SawFeatureParam):
     """ SawFeature requires a specific Data Frame with the following columns:
 
-        - senderPosition        - (x, y, z) tuple
-        - receiverPosition      - (x, y, z) tuple
+        - senderPosition        - pxSnd, pySnd, pzSnd
+        - receiverPosition      - pxRcv, pyRcv, pzRcv
         - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
                                                            4-attack, 8-attack, 16-attack]
     """
@@ -144,21 +142,41 @@ class SawParam(SawFeatureParam):
         # Configure the Thresolds for Sudden Appearance Warning
         param.thresholds = [25, 100, 200]
 
-        # Create the required columns for the feature
-        data['senderPosition'] = data.apply(lambda row: (row.pxSnd, row.pySnd, row.pzSnd), axis=1)
-        data['receiverPosition'] = data.apply(lambda row: (row.pxRcv, row.pyRcv, row.pzRcv), axis=1)
-        data['messageID'] = data.apply(lambda row: int(row.messageID), axis=1)
-        data['sender'] = data.apply(lambda row: int(row.sender), axis=1)
+        # Positions and speeds are derived by the feature from the raw columns
+        data['messageID'] = data.messageID.astype(int)
+        data['sender'] = data.sender.astype(int)
 
         # Drop unnecessary columns from Data Frame
         data = data.drop(columns=['Unnamed: 0', 'sendTime', 'gpsTime', 'rcvTime', 'pxSnd', 'pySnd',
                                   'pzSnd', 'sxSnd', 'sySnd', 'szSnd', 'pxRcv', 'pyRcv', 'pzRcv',
-                                  'sxRcv', 'syRcv', 'szRcv'])
+                                  'sxRcv', 'syRcv', 'szRcv'], errors='ignore')
 
         param.data = data
         return param
 
 
+class FusionParam(FusionFeatureParam):
+    """ FusionFeature requires a specific Data Frame with the following columns:
+
+        - sender                - sender ID
+        - receiver              - receiver ID
+        - attackerType          - integer for attack type [0-normal, 1-attack, 2-attack, 
+                                                           4-attack, 8-attack, 16-attack]
+
+        The features producing the fused verdicts must run before FusionFeature.
+    """
+    def build(data: pandas.DataFrame):
+        param = FusionParam()
+        # k-of-n vote of the verdicts of the plausibility features
+        param.thresholds = [1, 2, 3, 4]
+        param.verdicts = ['art100', 'saw100', 'ssc5', 'dmv5']
+        param.rule = VoteRule()
+
+        # Keep only the message identification columns
+        param.data = data[['sender', 'messageID', 'receiver', 'attackerType']].copy()
+        return param
+
+
 def process(root_path: str, result_path: str):
     # VeReMi Misbehavior file filter
     file_filter = VEHICULAR_LOW_ATTACK1_HIGH + VEHICULAR_HIGH_ATTACK1_HIGH + \
@@ -170,7 +188,14 @@ def process(root_path: str, result_path: str):
     CsvRunner(
         path=root_path,
         destination=result_path,
-        features=[SscFeature(factory=SscParam)],
+        features=[
+            ArtFeature(factory=ArtParam),
+            SawFeature(factory=SawParam),
+            SscFeature(factory=SscParam),
+            DmvFeature(factory=DmvParam),
+            # Fuses the verdicts of the features above, so it runs after them
+            FusionFeature(factory=FusionParam),
+        ],
         idxfilter=file_filter,
         # processes=1,
     ).process()
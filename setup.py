@@ -32,8 +32,11 @@ setup(
         'typing_extensions>=4.1.1',
         'scipy>=1.8.0',
         'ipykernel>=6.13.0',
-        'matplotlib>=3.5.1',
-        'jpype1>=1.3.0'
+        'matplotlib>=3.5.1'
     ],
+    # Parquet and Feather output formats
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     include_package_data=True
 )
@@ -0,0 +1,94 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+import pytest
+from scipy.spatial import distance
+from ascendcontroller.base import ConfusionMatrix, ResultType
+from ascendcontroller.benchmark import ArtParam, simulation
+from ascendcontroller.features.art import ArtFeature
+
+
+THRESHOLDS = [100, 200, 300, 400, 450, 500, 550, 600, 700, 800]
+
+
+def reference_process(data, thresholds):
+    """ Row-wise ArtFeature.process of the original implementation. """
+    df = data[['sender', 'messageID', 'receiver', 'attackerType']].copy()
+    df['senderPosition'] = list(zip(data.pxSnd, data.pySnd, data.pzSnd))
+    df['receiverPosition'] = list(zip(data.pxRcv, data.pyRcv, data.pzRcv))
+    df['distance'] = df.apply(
+        lambda row: distance.euclidean(row.senderPosition, row.receiverPosition), axis=1)
+    df = df.drop(columns=['senderPosition', 'receiverPosition'])
+    feature = ArtFeature(factory=ArtParam)
+    for threshold in thresholds:
+        df[f'art{threshold}'] = df.apply(lambda row: ResultType.Normal.name
+                                         if row.distance <= threshold else ResultType.Attack.name, axis=1)
+    for threshold in thresholds:
+        df[f'cmtx{threshold}'] = df.apply(lambda row: feature.confusion_matrix(
+            row.attackerType in (1, 2, 4, 8, 16), row[f'art{threshold}'] == ResultType.Attack.name).name, axis=1)
+    return df
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(1000, seed=7)
+    # Senders exactly at the threshold distances
+    for row, threshold in enumerate(THRESHOLDS):
+        data.loc[row, ['pxSnd', 'pySnd', 'pzSnd', 'pxRcv', 'pyRcv', 'pzRcv']] = [0, 0, 0, threshold, 0, 0]
+    return data
+
+
+def test_matches_reference(data):
+    result = ArtFeature(factory=ArtParam).process(data.copy())
+    assert result.error is None
+    df = result.data
+    reference = reference_process(data, THRESHOLDS)
+    numpy.testing.assert_allclose(df['distance'].to_numpy(), reference['distance'].to_numpy())
+    columns = [f'{kind}{t}' for kind in ('art', 'cmtx') for t in THRESHOLDS]
+    pandas.testing.assert_frame_equal(df[columns].astype(str), reference[columns])
+    assert (df[columns].astype(str) == ConfusionMatrix.FP.name).any().any()
+
+
+def test_threshold_tie_is_normal(data):
+    df = ArtFeature(factory=ArtParam).process(data.copy()).data
+    for row, threshold in enumerate(THRESHOLDS):
+        assert df.loc[row, 'distance'] == threshold
+        assert df.loc[row, f'art{threshold}'] == ResultType.Normal.name
+        assert df.loc[row, 'score'] == threshold
@@ -0,0 +1,95 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pytest
+from ascendcontroller import metrics
+from ascendcontroller.benchmark import FEATURES, simulation
+from ascendcontroller.curves import Curve
+
+
+def point(curve: Curve, cut: float, inclusive: bool) -> dict:
+    """ Counts of the curve at the cut detecting the scores above it (or equal, when inclusive). """
+    table = curve.table()
+    selected = table[table.threshold >= cut] if inclusive else table[table.threshold > cut]
+    if len(selected) == 0:
+        positives = int(curve.positives.sum())
+        negatives = int(curve.negatives.sum())
+        return {'TP': 0, 'FP': 0, 'TN': negatives, 'FN': positives}
+    return selected.iloc[-1][metrics.CONFUSION].astype(int).to_dict()
+
+
+def check(curve: Curve, counts, cut, inclusive: bool):
+    """ Compare the curve points with the confusion matrix counts of every threshold. """
+    assert len(counts) > 0
+    for row in counts.itertuples(index=False):
+        expected = {name: int(getattr(row, name)) for name in metrics.CONFUSION}
+        assert point(curve, cut(float(row.threshold)), inclusive) == expected, row.threshold
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(3000, seed=11)
+    # Senders exactly at the ART threshold distances
+    for row, threshold in enumerate(FEATURES['art'].factory.build(data).thresholds):
+        data.loc[row, ['pxSnd', 'pySnd', 'pzSnd', 'pxRcv', 'pyRcv', 'pzRcv']] = [0, 0, 0, threshold, 0, 0]
+    return data
+
+
+@pytest.mark.parametrize('name, cut, inclusive', [
+    ('art', lambda t: t, False),
+    ('saw', lambda t: -t, False),
+    ('dmv', lambda t: -t, True),
+])
+def test_curve_matches_counts(data, name, cut, inclusive):
+    df = FEATURES[name].process(data.copy()).data
+    check(Curve().add_result(df), metrics.counts(df), cut, inclusive)
+
+
+def test_curve_of_several_results_matches_merged_counts(data):
+    feature = FEATURES['art']
+    results = [feature.process(data.iloc[rows].reset_index(drop=True)).data
+               for rows in (slice(0, 1200), slice(1200, None))]
+    curve = Curve()
+    for df in results:
+        curve.add_result(df)
+    whole = Curve().add_result(feature.process(data.copy()).data)
+    numpy.testing.assert_array_equal(curve.values, whole.values)
+    numpy.testing.assert_array_equal(curve.positives, whole.positives)
+    numpy.testing.assert_array_equal(curve.negatives, whole.negatives)
+    check(curve, metrics.merge(map(metrics.counts, results)), lambda t: t, inclusive=False)
@@ -0,0 +1,127 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import math
+import numpy
+import pytest
+from ascendcontroller.base import ResultType
+from ascendcontroller.benchmark import DmvParam, simulation
+from ascendcontroller.features.dmv import DmvFeature
+
+
+THRESHOLDS = [1, 5, 10, 15, 20, 25]
+
+
+def reference_window_start(sender, time, time_threshold):
+    """ Quadratic rescan: oldest message of the same sender sent less than
+        'time_threshold' seconds before each row.
+    """
+    start = []
+    for row in range(len(sender)):
+        for other in range(row + 1):
+            if sender[other] == sender[row] and time[other] > time[row] - time_threshold:
+                start.append(other)
+                break
+    return numpy.array(start)
+
+
+def test_window_start_known_values():
+    feature = DmvFeature(factory=DmvParam)
+    sender = numpy.array([1, 1, 1, 1, 1, 2, 2, 2])
+    time = numpy.array([0, 5, 10, 10.5, 15, 0, 10, 10])
+    # Messages exactly 'time_threshold' seconds older are outside the window
+    numpy.testing.assert_array_equal(feature.window_start(sender, time, 10), [0, 0, 1, 1, 2, 5, 6, 6])
+    numpy.testing.assert_array_equal(feature.window_start(sender, time, 10.5), [0, 0, 0, 1, 1, 5, 5, 5])
+    numpy.testing.assert_array_equal(feature.window_start(sender[:0], time[:0], 10), [])
+
+
+@pytest.mark.parametrize('time_threshold', [0.5, 1, 3, 10])
+def test_window_start_matches_reference(time_threshold):
+    rng = numpy.random.default_rng(13)
+    sender = numpy.sort(rng.integers(0, 8, 400))
+    # Whole and half seconds produce exact ties at the window boundary
+    time = rng.integers(0, 60, 400) / 2
+    order = numpy.lexsort((time, sender))
+    sender, time = sender[order], time[order]
+    numpy.testing.assert_array_equal(
+        DmvFeature(factory=DmvParam).window_start(sender, time, time_threshold),
+        reference_window_start(sender, time, time_threshold))
+
+
+def test_process_matches_reference():
+    data = simulation(3000, seed=17)
+    df = DmvFeature(factory=DmvParam).process(data.copy()).data
+    time_threshold = DmvParam.time_threshold
+
+    # Sent messages of each sender in send time order, once per messageID
+    sent = data.drop_duplicates(['sender', 'messageID']).sort_values(['sender', 'sendTime'], kind='stable')
+    tracks = {sender: list(group.itertuples()) for sender, group in sent.groupby('sender')}
+    for row in data.itertuples():
+        track = tracks[row.sender]
+        oldest = next(m for m in track if m.sendTime > row.sendTime - time_threshold)
+        moved = math.dist((row.pxSnd, row.pySnd, row.pzSnd), (oldest.pxSnd, oldest.pySnd, oldest.pzSnd))
+        first = oldest.messageID == row.messageID
+        assert df.at[row.Index, 'distance'] == pytest.approx(moved, abs=1e-9)
+        assert df.at[row.Index, 'score'] == (-math.inf if first else pytest.approx(-moved, abs=1e-9))
+        for threshold in THRESHOLDS:
+            expected = ResultType.Attack.name if not first and moved <= threshold else ResultType.Normal.name
+            assert df.at[row.Index, f'dmv{threshold}'] == expected
+
+
+def test_chunk_back_in_time_is_an_error():
+    data = simulation(3000, seed=19)
+    feature = DmvFeature(factory=DmvParam)
+    state = {}
+    assert feature.process_chunk(data.iloc[1000:2000].reset_index(drop=True), state).error is None
+    offset = state['offset']
+
+    # Arrived before the previous chunk
+    result = feature.process_chunk(data.iloc[:1000].reset_index(drop=True), state)
+    assert isinstance(result.error, RuntimeError)
+    assert 'rcvTime' in str(result.error)
+
+    # Arrived later, but sent before the carried window
+    late = data.iloc[2000:2100].reset_index(drop=True)
+    late.loc[0, 'sendTime'] = data.sendTime.iloc[1999] - 2 * DmvParam.time_threshold
+    result = feature.process_chunk(late, state)
+    assert isinstance(result.error, RuntimeError)
+    assert 'sendTime' in str(result.error)
+
+    # The rejected chunks leave the state untouched
+    assert state['offset'] == offset
+    assert feature.process_chunk(data.iloc[2000:].reset_index(drop=True), state).error is None
@@ -0,0 +1,141 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import pandas
+import pytest
+from ascendcontroller import output
+from ascendcontroller.base import CsvRunner
+from ascendcontroller.benchmark import FEATURES, ArtParam, simulation
+from ascendcontroller.executor import IsolatedExecutor
+from ascendcontroller.features.art import ArtFeature
+
+# Row numbers of the simulation stalling the attempts
+STALLED = 100_000
+
+
+class StallingFeature(ArtFeature):
+    """ ART stalling on the second chunk of the simulation numbered from STALLED,
+        after the first chunk was written to its temporary output. Only the first
+        attempt stalls when a 'marker' file is given, every attempt otherwise.
+    """
+
+    def __init__(self, factory, marker: str = None):
+        super().__init__(factory=factory)
+        self.marker = marker
+
+    def process_chunk(self, data, state, columns=None):
+        state['chunks'] = state.get('chunks', 0) + 1
+        if state['chunks'] == 2 and data['Unnamed: 0'].iloc[0] >= STALLED:
+            if self.marker is None or not os.path.exists(self.marker):
+                if self.marker is not None:
+                    open(self.marker, 'w').close()
+                time.sleep(60)
+        return super().process_chunk(data, state, columns=columns)
+
+
+@pytest.fixture(autouse=True)
+def cwd(monkeypatch, tmp_path):
+    # CsvRunner changes the working directory to the simulations path
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def simulations(tmp_path_factory):
+    path = tmp_path_factory.mktemp('sims')
+    for idx in range(2):
+        data = simulation(3000, seed=idx)
+        data['Unnamed: 0'] += idx * STALLED
+        data.to_csv(path / f'sim{idx:03d}.csv', index=False)
+    return path
+
+
+def run(simulations, destination, feature, executor):
+    CsvRunner(path=str(simulations), destination=f'{destination}/', features=[feature], processes=2,
+              idxfilter=[0, 1], chunksize=1000, executor=executor).process()
+
+
+@pytest.fixture(scope='module')
+def expected(simulations, tmp_path_factory):
+    destination = tmp_path_factory.mktemp('expected')
+    run(simulations, destination, FEATURES['art'], 'serial')
+    return destination
+
+
+def temporary(destination):
+    return [name for name in os.listdir(destination) if name.endswith('.tmp')]
+
+
+def check_outputs(destination, expected, files=(0, 1)):
+    assert sorted(name for name in os.listdir(destination) if name.startswith('art-')) == \
+        [f'art-result{idx:03d}.csv' for idx in files]
+    for idx in files:
+        pandas.testing.assert_frame_equal(output.read(f'{destination}/art-result{idx:03d}.csv'),
+                                          output.read(f'{expected}/art-result{idx:03d}.csv'))
+
+
+def test_timed_out_attempt_is_retried(simulations, expected, tmp_path):
+    marker = str(tmp_path / 'stalled')
+    run(simulations, tmp_path, StallingFeature(ArtParam, marker),
+        IsolatedExecutor(1, timeout=3, retries=1, backoff=0.1))
+    assert os.path.exists(marker)
+    check_outputs(tmp_path, expected)
+    assert temporary(tmp_path) == []
+
+
+def test_exhausted_retries_fail_the_file(simulations, expected, tmp_path):
+    feature = StallingFeature(ArtParam)
+    run(simulations, tmp_path, feature, IsolatedExecutor(1, timeout=2, retries=1, backoff=0.1))
+    check_outputs(tmp_path, expected, files=(0,))
+    assert temporary(tmp_path) == []
+    with open(tmp_path / 'telemetry.jsonl') as fp:
+        errors = {record['file']: record['error'] for record in map(json.loads, fp)}
+    assert errors['sim000.csv'] is None
+    assert 'TimeoutError' in errors['sim001.csv']
+
+
+def test_speculative_attempt_wins(simulations, expected, tmp_path):
+    marker = str(tmp_path / 'stalled')
+    start_time = time.monotonic()
+    run(simulations, tmp_path, StallingFeature(ArtParam, marker), IsolatedExecutor(2, speculate=2))
+    assert time.monotonic() - start_time < 30
+    assert os.path.exists(marker)
+    check_outputs(tmp_path, expected)
+    assert temporary(tmp_path) == []
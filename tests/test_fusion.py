@@ -0,0 +1,139 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+import pytest
+from ascendcontroller import output
+from ascendcontroller.base import CsvRunner, ResultType
+from ascendcontroller.benchmark import FEATURES, simulation
+from ascendcontroller.fusion import FusionFeature, FusionFeatureParam, OpinionRule, VoteRule, WeightedRule
+
+VERDICTS = ['art100', 'saw100', 'ssc5', 'dmv5']
+DETECTED = numpy.array([
+    [False, False, False],
+    [True, False, False],
+    [False, True, True],
+    [True, True, True],
+])
+
+
+class FusionParam(FusionFeatureParam):
+    def build(data: pandas.DataFrame):
+        param = FusionParam()
+        param.thresholds = [1, 2, 3]
+        param.verdicts = VERDICTS
+        param.rule = VoteRule()
+        param.data = data[['sender', 'messageID', 'receiver', 'attackerType']].copy()
+        return param
+
+
+def test_vote_rule():
+    numpy.testing.assert_array_equal(VoteRule().score(DETECTED), [0, 1, 2, 3])
+
+
+def test_weighted_rule():
+    numpy.testing.assert_allclose(WeightedRule([0.5, 0.3, 0.2]).score(DETECTED), [0, 0.5, 0.5, 1])
+
+
+def test_opinion_rule():
+    detected = DETECTED[:, :2]
+    # Two detectors with 0.1 uncertainty: agreeing verdicts fuse to 0.18/0.19 belief and 0.01/0.19 uncertainty
+    agree = (0.18 + 0.005) / 0.19
+    numpy.testing.assert_allclose(OpinionRule().score(detected), [1 - agree, 0.5, 0.5, agree])
+    # Averaging fusion keeps 0.9 belief and 0.1 uncertainty
+    numpy.testing.assert_allclose(OpinionRule(operator='averaging').score(detected), [0.05, 0.5, 0.5, 0.95])
+    # Trust 0.5 halves the evidence: 0.45 belief and 0.55 uncertainty for each detector
+    norm = 1.1 - 0.55 ** 2
+    trusted = (2 * 0.45 * 0.55 + 0.5 * 0.55 ** 2) / norm
+    numpy.testing.assert_allclose(OpinionRule(trust=0.5).score(detected), [1 - trusted, 0.5, 0.5, trusted])
+
+
+def test_opinion_rule_per_detector():
+    # A confident detector outweighs an uncertain one
+    score = OpinionRule(uncertainty=[0.05, 0.5]).score(DETECTED[1:3, :2])
+    assert score[0] > 0.5 > score[1]
+    numpy.testing.assert_array_equal(OpinionRule().score(numpy.zeros((3, 0), dtype=bool)), [0, 0, 0])
+
+
+@pytest.fixture(autouse=True)
+def cwd(monkeypatch, tmp_path):
+    # CsvRunner changes the working directory to the simulations path
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def data():
+    return simulation(4000, seed=9)
+
+
+@pytest.fixture(scope='module')
+def simulations(data, tmp_path_factory):
+    path = tmp_path_factory.mktemp('sims')
+    data.to_csv(path / 'sim000.csv', index=False)
+    return path
+
+
+@pytest.fixture(scope='module')
+def expected(data):
+    """ Vote of the verdicts of the features run one by one, in the file row order. """
+    detected = numpy.zeros((len(data), len(VERDICTS)), dtype=bool)
+    for idx, verdict in enumerate(VERDICTS):
+        result = FEATURES[verdict[:3]].process(data.copy())
+        rows = numpy.arange(len(data)) if result.rows is None else result.rows
+        detected[rows, idx] = result.data[verdict].astype(str) == ResultType.Attack.name
+    return detected.sum(axis=1)
+
+
+@pytest.mark.parametrize('chunksize', [0, 1500])
+def test_runner_fuses_the_previous_features(simulations, expected, tmp_path, chunksize):
+    CsvRunner(path=str(simulations), destination=f'{tmp_path}/', processes=1, idxfilter=[0], executor='serial',
+              features=[*FEATURES.values(), FusionFeature(factory=FusionParam)], chunksize=chunksize).process()
+    df = output.read(f'{tmp_path}/fusion-result000.csv')
+    assert len(df) == len(expected)
+    numpy.testing.assert_array_equal(df['score'].to_numpy(), expected)
+    for threshold in FusionParam.build(df).thresholds:
+        numpy.testing.assert_array_equal(
+            df[f'fus{threshold}'].astype(str) == ResultType.Attack.name, expected >= threshold)
+    assert (expected >= 2).any()
+
+
+def test_missing_verdicts_are_an_error(data):
+    result = FusionFeature(factory=FusionParam).process(data.copy())
+    assert isinstance(result.error, RuntimeError)
+    assert 'art100' in str(result.error)
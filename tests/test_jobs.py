@@ -0,0 +1,147 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import sys
+import sqlite3
+import subprocess
+import pytest
+from ascendcontroller import output
+from ascendcontroller.base import CsvRunner
+from ascendcontroller.benchmark import FEATURES, simulation
+from ascendcontroller.jobs import DONE, FAILED, PENDING, JobQueue
+from ascendcontroller.manifest import RunManifest
+
+FILES = 9
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNNER = '''
+import sys
+from ascendcontroller.base import CsvRunner
+from ascendcontroller.benchmark import FEATURES
+CsvRunner(path=sys.argv[1], destination=sys.argv[2], features=list(FEATURES.values()), processes=1,
+          idxfilter=list(range(9)), executor='serial', distributed=True, lease=float(sys.argv[3])).process()
+'''
+
+
+@pytest.fixture(autouse=True)
+def cwd(monkeypatch, tmp_path):
+    # CsvRunner changes the working directory to the simulations path
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def simulations(tmp_path_factory):
+    path = tmp_path_factory.mktemp('sims')
+    for idx in range(FILES):
+        simulation(2000 + 500 * idx, seed=idx).to_csv(path / f'sim{idx:03d}.csv', index=False)
+    return path
+
+
+def jobs(destination):
+    with sqlite3.connect(f'{destination}/jobs.db') as connection:
+        return {file: (state, attempts) for file, state, attempts in
+                connection.execute('SELECT file, state, attempts FROM jobs')}
+
+
+def start(simulations, destination, lease):
+    return subprocess.Popen([sys.executable, '-c', RUNNER, str(simulations), f'{destination}/', str(lease)],
+                            cwd=ROOT, env={**os.environ, 'PYTHONPATH': ROOT}, stdout=subprocess.PIPE, text=True)
+
+
+def test_runners_split_the_files(simulations, tmp_path):
+    runners = [start(simulations, tmp_path, 30) for _ in range(3)]
+    logs = [runner.communicate(timeout=120)[0] for runner in runners]
+    assert [runner.returncode for runner in runners] == [0, 0, 0]
+
+    # Every file was claimed once, by one of the runners
+    claimed = [file.strip() for log in logs for line in log.splitlines() if ' claimed ' in line
+               for file in line.split(' claimed ')[1].split(',')]
+    files = [f'sim{idx:03d}.csv' for idx in range(FILES)]
+    assert sorted(claimed) == files
+    assert jobs(tmp_path) == {file: (DONE, 1) for file in files}
+
+    manifest = RunManifest(f'{tmp_path}/manifest.json')
+    for file in files:
+        for feature in FEATURES.values():
+            assert manifest.done(file, feature.name, feature.signature())
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_expired_lease_is_taken_over(simulations, tmp_path):
+    destination = f'{tmp_path}/'
+    names = [feature.name for feature in FEATURES.values()]
+    queue = JobQueue(f'{destination}jobs.db', lease=1)
+    queue.enqueue([('sim004.csv', names, 1)])
+    # A runner that dies after claiming the file never renews its lease
+    assert queue.claim('dead:1') == [('sim004.csv', names)]
+
+    runner = start(simulations, tmp_path, 1)
+    assert 'claimed sim004.csv' in runner.communicate(timeout=120)[0]
+    assert runner.returncode == 0
+    assert jobs(tmp_path)['sim004.csv'] == (DONE, 2)
+    # The late completion of the dead runner is ignored
+    queue.complete('sim004.csv', 'dead:1', [])
+    queue.close()
+    assert jobs(tmp_path)['sim004.csv'] == (DONE, 2)
+    assert output.read(f'{destination}dmv-result004.csv') is not None
+
+
+def test_failed_features_are_retried(tmp_path):
+    queue = JobQueue(f'{tmp_path}/jobs.db', attempts=2)
+    queue.enqueue([('sim000.csv', ['art', 'saw'], 1), ('sim001.csv', ['art'], 1)])
+    assert [file for file, _ in queue.claim('runner:1', 2)] == ['sim000.csv', 'sim001.csv']
+    queue.complete('sim000.csv', 'runner:1', ['art'])
+    queue.complete('sim001.csv', 'runner:1', ['art'])
+    assert jobs(tmp_path) == {'sim000.csv': (PENDING, 1), 'sim001.csv': (DONE, 1)}
+
+    # Only the failed feature runs again, until the attempts are exhausted
+    assert queue.claim('runner:2') == [('sim000.csv', ['saw'])]
+    queue.complete('sim000.csv', 'runner:2', [])
+    assert jobs(tmp_path)['sim000.csv'] == (FAILED, 2)
+    assert queue.remaining() == 0
+    queue.close()
+
+
+def test_feature_mismatch_is_reported(simulations, tmp_path):
+    queue = JobQueue(f'{tmp_path}/jobs.db')
+    queue.enqueue([('sim000.csv', ['OtherFeature.OtherParam'], 1)])
+    queue.close()
+    runner = CsvRunner(path=str(simulations), destination=f'{tmp_path}/', features=list(FEATURES.values()),
+                       processes=1, idxfilter=[0], executor='serial', distributed=True)
+    with pytest.raises(ValueError, match='OtherFeature.OtherParam'):
+        runner.process()
@@ -0,0 +1,131 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pytest
+from ascendcontroller.base import ResultType
+from ascendcontroller.benchmark import FEATURES, simulation
+from ascendcontroller.online import THRESHOLDS, ExpiringCache, OnlineDetector
+
+DETECTORS = ['art', 'saw', 'ssc', 'dmv']
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(5000, seed=4)
+    # Vehicles closer together, so every detector flags some messages and passes others
+    positions = [column for column in data.columns if column[:2] in ('px', 'py', 'pz')]
+    data[positions] *= 0.1
+    return data
+
+
+@pytest.fixture(scope='module')
+def verdicts(data):
+    detector = OnlineDetector(**THRESHOLDS)
+    verdicts = [None] * len(data)
+    records = data.to_dict('records')
+    for row in numpy.argsort(data.rcvTime.to_numpy(), kind='stable'):
+        verdicts[row] = detector.process(records[row])
+    return verdicts
+
+
+@pytest.mark.parametrize('position, name', list(enumerate(DETECTORS)))
+def test_matches_batch_features(data, verdicts, position, name):
+    result = FEATURES[name].process(data.copy())
+    assert result.error is None
+    rows = numpy.arange(len(data)) if result.rows is None else result.rows
+    params = FEATURES[name].factory.build(data.copy())
+    assert tuple(params.thresholds) == tuple(THRESHOLDS[name])
+    for idx, threshold in enumerate(params.thresholds):
+        batch = numpy.empty(len(data), dtype=bool)
+        batch[rows] = result.data[f'{name}{threshold}'].astype(str).to_numpy() == ResultType.Attack.name
+        online = numpy.array([getattr(verdict, name)[idx] for verdict in verdicts])
+        numpy.testing.assert_array_equal(online, batch, err_msg=f'{name}{threshold}')
+    score = numpy.empty(len(data))
+    score[rows] = result.data['score'].to_numpy()
+    numpy.testing.assert_allclose([verdict.scores[position] for verdict in verdicts], score)
+
+
+def test_parity_exercises_verdicts(verdicts):
+    for name in DETECTORS:
+        detected = numpy.array([getattr(verdict, name) for verdict in verdicts])
+        assert detected.any() and not detected.all(), name
+
+
+def test_cache_evicts_beyond_capacity():
+    cache = ExpiringCache(capacity=2, ttl=60)
+    cache.put('a', 1, 0)
+    cache.put('b', 2, 1)
+    # Updating an entry makes it the most recently used
+    cache.put('a', 3, 2)
+    cache.put('c', 4, 3)
+    assert len(cache) == 2
+    assert cache.get('b', 3) is None
+    assert cache.get('a', 3) == 3
+    assert cache.get('c', 3) == 4
+
+
+def test_cache_evicts_expired_entries():
+    cache = ExpiringCache(capacity=10, ttl=10)
+    cache.put('a', 1, 0)
+    cache.put('b', 2, 5)
+    # Entries exactly 'ttl' seconds old are kept
+    cache.put('c', 3, 10)
+    assert len(cache) == 3
+    cache.put('d', 4, 12)
+    assert len(cache) == 3
+    assert cache.get('a', 12) is None
+    assert cache.get('b', 15) == 2
+    assert cache.get('b', 16) is None
+    assert len(cache) == 2
+
+
+def message(time: float, message_id: int):
+    return {'rcvTime': time, 'sendTime': time, 'sender': 1, 'messageID': message_id, 'receiver': 2,
+            'pxSnd': 10.0, 'pySnd': 0.0, 'pzSnd': 0.0, 'sxSnd': 0.0, 'sySnd': 0.0, 'szSnd': 0.0,
+            'pxRcv': 0.0, 'pyRcv': 0.0, 'pzRcv': 0.0}
+
+
+@pytest.mark.parametrize('ttl, capacity, first', [(60, 10, False), (5, 10, True), (60, 1, True)])
+def test_evicted_pair_is_a_new_first_contact(ttl, capacity, first):
+    detector = OnlineDetector(saw=[25], capacity=capacity, ttl=ttl)
+    assert detector.process(message(0, 1)).saw == (True,)
+    if capacity == 1:
+        # Another pair takes the only entry
+        detector.process({**message(1, 2), 'receiver': 3})
+    assert detector.process(message(10, 3)).saw == (first,)
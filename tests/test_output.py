@@ -0,0 +1,78 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pandas
+import pytest
+from ascendcontroller import output
+from ascendcontroller.benchmark import SscParam, simulation
+from ascendcontroller.features.ssc import SscFeature
+
+
+@pytest.fixture(scope='module')
+def result():
+    return SscFeature(factory=SscParam).process(simulation(2000, seed=5)).data
+
+
+@pytest.mark.parametrize('ext', sorted(output.FORMATS))
+def test_round_trip(tmp_path, result, ext):
+    if ext in ('parquet', 'feather'):
+        pytest.importorskip('pyarrow')
+    file = str(tmp_path / f'ssc-result000.{ext}')
+    output.FORMATS[ext]().write(result, file)
+    data = output.read(file)
+    if ext == 'csv':
+        # Labels are read back as text
+        result = result.astype({name: str for name in result.columns if result[name].dtype == 'category'})
+    pandas.testing.assert_frame_equal(data, result, check_index_type=False)
+
+
+def test_appended_parts(tmp_path, result):
+    for ext, format in output.FORMATS.items():
+        if not format.appendable:
+            continue
+        file = str(tmp_path / f'ssc-result000.{ext}')
+        for start in range(0, len(result), 500):
+            format().write(result.iloc[start:start + 500], file, append=start > 0)
+        numpy.testing.assert_allclose(output.read(file)['speed'].to_numpy(), result['speed'].to_numpy())
+
+
+def test_bookkeeping_not_readable():
+    assert output.readable('/results/ssc-result000.parquet')
+    for name in output.BOOKKEEPING:
+        assert not output.readable(f'/results/{name}')
@@ -0,0 +1,112 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import math
+import numpy
+import pandas
+import pytest
+from ascendcontroller.base import ConfusionMatrix, ResultType
+from ascendcontroller.benchmark import SawParam, simulation
+from ascendcontroller.features.saw import SawFeature
+
+
+THRESHOLDS = [25, 100, 200]
+
+
+def reference_process(data, thresholds):
+    """ Row-wise first contact check: a message is an attack when it is the first
+        of its (receiver, sender) pair in file order and closer than the threshold.
+    """
+    feature = SawFeature(factory=SawParam)
+    seen = set()
+    rows = []
+    for row in data.itertuples():
+        first = (row.receiver, row.sender) not in seen
+        seen.add((row.receiver, row.sender))
+        dist = math.dist((row.pxSnd, row.pySnd, row.pzSnd), (row.pxRcv, row.pyRcv, row.pzRcv))
+        values = {'distance': dist}
+        for threshold in thresholds:
+            values[f'saw{threshold}'] = ResultType.Attack.name if first and dist < threshold else ResultType.Normal.name
+        for threshold in thresholds:
+            real = row.attackerType in (1, 2, 4, 8, 16)
+            values[f'cmtx{threshold}'] = feature.confusion_matrix(
+                real, values[f'saw{threshold}'] == ResultType.Attack.name).name
+        values['score'] = -dist if first else -math.inf
+        rows.append(values)
+    return pandas.DataFrame(rows)
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(1000, seed=11)
+    # First contacts exactly at and just inside the threshold distances
+    for row, threshold in enumerate(THRESHOLDS):
+        for offset, gap in enumerate((0, 1)):
+            idx = 2 * row + offset
+            data.loc[idx, ['receiver', 'sender']] = [1000 + idx, 2000 + idx]
+            data.loc[idx, ['pxSnd', 'pySnd', 'pzSnd', 'pxRcv', 'pyRcv', 'pzRcv']] = [0, 0, 0, threshold - gap, 0, 0]
+    return data
+
+
+@pytest.fixture(scope='module')
+def result(data):
+    result = SawFeature(factory=SawParam).process(data.copy())
+    assert result.error is None
+    return result.data
+
+
+def test_matches_reference(data, result):
+    reference = reference_process(data, THRESHOLDS)
+    numpy.testing.assert_allclose(result['distance'].to_numpy(), reference['distance'].to_numpy())
+    numpy.testing.assert_allclose(result['score'].to_numpy(), reference['score'].to_numpy())
+    columns = [f'{kind}{t}' for kind in ('saw', 'cmtx') for t in THRESHOLDS]
+    pandas.testing.assert_frame_equal(result[columns].astype(str), reference[columns])
+    assert (result[columns].astype(str) == ConfusionMatrix.TP.name).any().any()
+
+
+def test_threshold_tie_is_normal(result):
+    for row, threshold in enumerate(THRESHOLDS):
+        assert result.loc[2 * row, f'saw{threshold}'] == ResultType.Normal.name
+        assert result.loc[2 * row + 1, f'saw{threshold}'] == ResultType.Attack.name
+
+
+def test_only_first_contacts(data, result):
+    first = ~data.duplicated(['receiver', 'sender']).to_numpy()
+    attacks = (result[[f'saw{t}' for t in THRESHOLDS]].astype(str) == ResultType.Attack.name).any(axis=1)
+    assert not attacks[~first].any()
+    assert numpy.isneginf(result['score'].to_numpy()[~first]).all()
@@ -0,0 +1,217 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import json
+import numpy
+import socket
+import asyncio
+import pytest
+from ascendcontroller.base import ResultType
+from ascendcontroller.benchmark import simulation
+from ascendcontroller.benchmark import FEATURES as BATCH_FEATURES
+from ascendcontroller.online import THRESHOLDS
+from ascendcontroller.service import FEATURES, IngestionService, generate, invalid, load_features
+
+VERDICTS = [f'{name}{threshold}' for name, thresholds in THRESHOLDS.items() for threshold in thresholds]
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(1500, seed=12)
+    # Vehicles closer together, so every detector flags some messages and passes others
+    positions = [column for column in data.columns if column[:2] in ('px', 'py', 'pz')]
+    data[positions] *= 0.1
+    return data
+
+
+@pytest.fixture(scope='module')
+def expected(data):
+    """ Verdicts of the batch features over the whole simulation, one dict per row. """
+    columns = {}
+    for name, feature in BATCH_FEATURES.items():
+        result = feature.process(data.copy())
+        rows = numpy.arange(len(data)) if result.rows is None else result.rows
+        for threshold in THRESHOLDS[name]:
+            detected = numpy.empty(len(data), dtype=bool)
+            detected[rows] = result.data[f'{name}{threshold}'].astype(str).to_numpy() == ResultType.Attack.name
+            columns[f'{name}{threshold}'] = detected
+    return [{name: bool(values[row]) for name, values in columns.items()} for row in range(len(data))]
+
+
+@pytest.fixture
+def simulation_file(data, tmp_path):
+    path = tmp_path / 'simulation.csv'
+    data.to_csv(path, index=False)
+    return str(path)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read(sink) -> list:
+    with open(sink) as fp:
+        return [json.loads(line) for line in fp]
+
+
+def check(verdicts, expected):
+    assert len(verdicts) == len(expected)
+    for verdict, row in zip(verdicts, expected):
+        assert verdict['late'] is False
+        assert {name: verdict[name] for name in VERDICTS} == row
+
+
+async def exchange(reader, writer, records) -> list:
+    """ Send JSON messages to the service and wait for their verdicts. """
+    writer.write(''.join(json.dumps(record) + '\n' for record in records).encode())
+    await writer.drain()
+    return [json.loads(await asyncio.wait_for(reader.readline(), 30)) for _ in records]
+
+
+def test_tcp_replay(data, expected, simulation_file, tmp_path):
+    port = free_port()
+    sink = tmp_path / 'verdicts.jsonl'
+
+    async def replay():
+        service = IngestionService(FEATURES, batch_size=200, sink=str(sink))
+        await service.start(port=port)
+        try:
+            return await generate(simulation_file, port=port, protocol='tcp')
+        finally:
+            await service.close()
+
+    result = asyncio.run(replay())
+    assert result['verdicts'] == len(data)
+    check(read(sink), expected)
+
+
+def test_udp_replay(data, expected, simulation_file, tmp_path):
+    port = free_port()
+    sink = tmp_path / 'verdicts.jsonl'
+
+    async def replay():
+        service = IngestionService(FEATURES, batch_size=200, sink=str(sink))
+        await service.start(port=port)
+        try:
+            await generate(simulation_file, port=port, protocol='udp', rate=20_000)
+            for _ in range(300):
+                if service.stats['messages'] + service.size >= len(data):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await service.close()
+        return service.stats
+
+    stats = asyncio.run(replay())
+    assert stats['messages'] == len(data)
+    check(read(sink), expected)
+
+
+def test_late_messages_and_restart(data, expected, tmp_path):
+    port = free_port()
+    sink = tmp_path / 'verdicts.jsonl'
+    records = data.to_dict('records')
+    half = len(records) // 2
+    # A copy of an earlier message arriving after the first half, under a new message ID
+    late = {**records[half - 10], 'messageID': 1_000_000, 'rcvTime': records[half - 1]['rcvTime'] - 0.5}
+
+    async def replay():
+        service = IngestionService(FEATURES, batch_size=100, sink=str(sink), lateness=1.0)
+        await service.start(port=port, udp=False)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            first = await exchange(reader, writer, records[:half])
+            delayed = await exchange(reader, writer, [late])
+            second = await exchange(reader, writer, records[half:])
+            # The feed starts over, as in a replay
+            replayed = await exchange(reader, writer, records[:half])
+        finally:
+            writer.close()
+            await service.close()
+        return first, delayed, second, replayed, service.stats
+
+    first, delayed, second, replayed, stats = asyncio.run(replay())
+    assert delayed[0]['late'] is True
+    assert delayed[0]['messageID'] == 1_000_000
+    assert all(delayed[0].get(name) is None for name in VERDICTS)
+    # The late message did not disturb the detectors, nor the replay
+    check(first + second, expected)
+    assert replayed == first
+    assert stats['late'] == 1
+    assert stats['restarts'] == 1
+    assert len(read(sink)) == len(records) + half + 1
+
+
+def test_invalid_records_are_dropped(data, tmp_path):
+    port = free_port()
+    records = data.head(4).to_dict('records')
+    missing = {name: value for name, value in records[1].items() if name != 'pxSnd'}
+
+    async def replay():
+        service = IngestionService(FEATURES, batch_time=0.001)
+        await service.start(port=port, udp=False)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            # One JSON line with an incomplete and a non-numeric record between valid ones
+            batch = [records[0], missing, {**records[2], 'sender': 'x'}, records[3]]
+            writer.write((json.dumps(batch) + '\n').encode())
+            await writer.drain()
+            return [json.loads(await asyncio.wait_for(reader.readline(), 30)) for _ in range(2)]
+        finally:
+            writer.close()
+            await service.close()
+
+    verdicts = asyncio.run(replay())
+    assert [verdict['messageID'] for verdict in verdicts] == [records[0]['messageID'], records[3]['messageID']]
+    assert all(verdict['late'] is False for verdict in verdicts)
+
+
+def test_invalid():
+    message = simulation(1).drop(columns=['attackerType']).to_dict('records')[0]
+    assert invalid(message) is None
+    assert 'pxSnd' in invalid({**message, 'pxSnd': None})
+    assert 'sender' in invalid({**message, 'sender': True})
+    assert invalid([message]) == 'not an object'
+
+
+def test_load_features():
+    assert load_features('ascendcontroller.service') == FEATURES
+    features = load_features('ascendcontroller.benchmark:FEATURES')
+    assert features == list(BATCH_FEATURES.values())
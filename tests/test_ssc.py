@@ -0,0 +1,178 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import math
+import numpy
+import pandas
+import pytest
+from ascendcontroller.base import ConfusionMatrix, ResultType
+from ascendcontroller.benchmark import SscParam, simulation
+from ascendcontroller.features.ssc import SscFeature
+
+
+THRESHOLDS = [2.5, 5, 7.5, 10, 15, 20, 25]
+ATTACKER_TYPES = (1, 2, 4, 8, 16)
+# Fixes applied to the per-row loop by the vectorized implementation
+FIXES = ('previous-position', 'speed-precedence')
+
+
+def reference_check_speed(threshold, curr, prev, fixes=FIXES):
+    """ Per-row check_speed of the original SscFeature implementation.
+
+        'previous-position': the previous message position was its 'rcvTime'.
+        'speed-precedence': 'dist_diff / 1 if time_diff == 0 else time_diff'
+        made the implied speed the elapsed time.
+        The scipy euclidean distance is replaced by its definition, it broadcast
+        the 'rcvTime' scalar in the scipy versions the loop ran with.
+    """
+    if prev is None or curr.sender != prev.sender:
+        return (-1, 1, ResultType.Normal.name)
+    curr_time = curr['rcvTime']
+    prev_time = prev['rcvTime']
+    curr_pos = curr['senderPosition']
+    prev_pos = prev['senderPosition'] if 'previous-position' in fixes else prev['rcvTime']
+    curr_speed = curr['senderSpeed']
+    time_diff = curr_time - prev_time
+    dist_diff = math.sqrt(sum(pow(c - p, 2) for c, p in zip(curr_pos, numpy.broadcast_to(prev_pos, 3))))
+    if 'speed-precedence' in fixes:
+        actual_speed = dist_diff / (1 if time_diff == 0 else time_diff)
+    else:
+        actual_speed = dist_diff / 1 if time_diff == 0 else time_diff
+    last_speed = math.sqrt(pow(curr_speed[0], 2) + pow(curr_speed[1], 2) + pow(curr_speed[2], 2))
+    delta_speed = abs(last_speed - actual_speed)
+    if delta_speed < threshold:
+        if delta_speed <= 0:
+            return (delta_speed, 1, ResultType.Normal.name)
+        else:
+            disbelief = delta_speed / threshold * (1 - SscFeature._UNCERTAINTY_FACTOR)
+            belief = 1 - SscFeature._UNCERTAINTY_FACTOR - disbelief
+            return (delta_speed, belief, ResultType.Normal.name if belief >= 0.2 else ResultType.Attack.name)
+    else:
+        return (delta_speed, 0, ResultType.Attack.name)
+
+
+def reference_process(data, thresholds, fixes=FIXES):
+    """ Per-row SscFeature.process loop of the original implementation. """
+    df = data[['sender', 'messageID', 'receiver', 'attackerType', 'rcvTime']].copy()
+    df['senderPosition'] = list(zip(data.pxSnd, data.pySnd, data.pzSnd))
+    df['senderSpeed'] = list(zip(data.sxSnd, data.sySnd, data.szSnd))
+    for threshold in thresholds:
+        df[f'ssc{threshold}'] = 'Unknown'
+    for threshold in thresholds:
+        df[f'cmtx{threshold}'] = 'Unknown'
+    df['speed'] = 0.0
+    df = df.sort_values(['receiver', 'sender'], ignore_index=True)
+
+    receiver = None
+    sender = None
+    for idx in range(0, len(df)):
+        curr = df.loc[idx]
+        if receiver != curr['receiver']:
+            receiver = curr['receiver']
+            sender = curr['sender']
+            prev = None
+        elif receiver == curr['receiver'] and sender != curr['sender']:
+            sender = curr['sender']
+            prev = None
+        elif receiver == curr['receiver'] and sender == curr['sender']:
+            prev = df.loc[idx - 1]
+
+        for threshold in thresholds:
+            attacker = curr.attackerType.item()
+            speed, _, result = reference_check_speed(threshold, curr, prev, fixes)
+            df.loc[idx, f'ssc{threshold}'] = result
+            real = attacker in ATTACKER_TYPES
+            detected = result == ResultType.Attack.name
+            df.loc[idx, f'cmtx{threshold}'] = (
+                ConfusionMatrix.TP if real and detected else
+                ConfusionMatrix.TN if not real and not detected else
+                ConfusionMatrix.FN if real else ConfusionMatrix.FP).name
+            df.loc[idx, 'speed'] = speed
+    return df.drop(columns=['senderPosition', 'senderSpeed', 'rcvTime'])
+
+
+@pytest.fixture(scope='module')
+def data():
+    data = simulation(1200, seed=3)
+    # Pairs of beacons arrive together, exercising the zero elapsed time case
+    data['rcvTime'] = numpy.floor(data.rcvTime / 2) * 2
+    return data
+
+
+@pytest.fixture(scope='module')
+def result(data):
+    result = SscFeature(factory=SscParam).process(data)
+    assert result.error is None
+    return result.data
+
+
+def verdicts(df):
+    columns = [f'{kind}{t}' for kind in ('ssc', 'cmtx') for t in THRESHOLDS]
+    return df[columns].astype(str)
+
+
+def test_matches_reference(data, result):
+    reference = reference_process(data, THRESHOLDS)
+    assert len(result) == len(reference)
+    for column in ('sender', 'messageID', 'receiver'):
+        numpy.testing.assert_array_equal(result[column].to_numpy(), reference[column].to_numpy())
+    numpy.testing.assert_allclose(result['speed'].to_numpy(), reference['speed'].to_numpy(), rtol=1e-9, atol=1e-9)
+    pandas.testing.assert_frame_equal(verdicts(result), verdicts(reference))
+
+
+def test_reference_exercises_verdicts(result):
+    verdicts = result[[f'ssc{t}' for t in THRESHOLDS]].astype(str)
+    assert (verdicts == ResultType.Attack.name).any().any()
+    assert (verdicts == ResultType.Normal.name).any().any()
+    assert (result['speed'] == -1).any()
+
+
+@pytest.mark.parametrize('fix', FIXES)
+def test_fix_changes_speed(data, result, fix):
+    reference = reference_process(data, THRESHOLDS, fixes=[f for f in FIXES if f != fix])
+    first = reference['speed'].to_numpy() == -1
+    delta = ~numpy.isclose(result['speed'].to_numpy(), reference['speed'].to_numpy(), rtol=1e-9, atol=1e-9)
+    # Only messages following a previous one in their track are affected
+    assert not delta[first].any()
+    assert delta.any()
+
+
+def test_message_id_is_optional(data, result):
+    # The reported speed is read per row, the sender tracks are not needed
+    df = SscFeature(factory=SscParam).process(data.drop(columns=['messageID'])).data
+    pandas.testing.assert_frame_equal(df, result.drop(columns=['messageID']))
@@ -0,0 +1,110 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import pandas
+import pytest
+from ascendcontroller import output
+from ascendcontroller.base import CsvRunner
+from ascendcontroller.benchmark import FEATURES, ArtParam, simulation
+from ascendcontroller.features.art import ArtFeature
+
+
+class FailingFeature(ArtFeature):
+    """ ART failing on the second chunk of a file. """
+
+    def process_chunk(self, data, state, columns=None):
+        state['chunks'] = state.get('chunks', 0) + 1
+        if state['chunks'] > 1:
+            raise RuntimeError('chunk failure')
+        return super().process_chunk(data, state, columns=columns)
+
+
+@pytest.fixture(autouse=True)
+def cwd(monkeypatch, tmp_path):
+    # CsvRunner changes the working directory to the simulations path
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def simulations(tmp_path_factory):
+    path = tmp_path_factory.mktemp('sims')
+    simulation(6000, seed=21).to_csv(path / 'sim000.csv', index=False)
+    return path
+
+
+def run(simulations, destination, features, chunksize=0):
+    CsvRunner(path=str(simulations), destination=f'{destination}/', features=features, processes=1,
+              idxfilter=[0], chunksize=chunksize, executor='serial').process()
+
+
+@pytest.fixture(scope='module')
+def batch(simulations, tmp_path_factory):
+    destination = tmp_path_factory.mktemp('batch')
+    run(simulations, destination, list(FEATURES.values()))
+    return destination
+
+
+@pytest.mark.parametrize('chunksize', [700, 2500, 6000])
+def test_stream_matches_batch(simulations, batch, tmp_path, chunksize):
+    run(simulations, tmp_path, list(FEATURES.values()), chunksize)
+    for name in FEATURES:
+        expected = output.read(f'{batch}/{name}-result000.csv')
+        streamed = output.read(f'{tmp_path}/{name}-result000.csv')
+        if name == 'ssc':
+            # SSC sorts the rows of each chunk by (receiver, sender) track
+            key = ['receiver', 'sender', 'messageID']
+            expected = expected.sort_values(key, ignore_index=True)
+            streamed = streamed.sort_values(key, ignore_index=True)
+        pandas.testing.assert_frame_equal(streamed, expected)
+
+
+def test_failing_feature_does_not_abort_the_others(simulations, batch, tmp_path):
+    features = [FailingFeature(factory=ArtParam), FEATURES['saw'], FEATURES['dmv']]
+    run(simulations, tmp_path, features, 2000)
+    files = os.listdir(tmp_path)
+    assert 'art-result000.csv' not in files
+    assert not [name for name in files if name.endswith('.tmp')]
+    for name in ('saw', 'dmv'):
+        pandas.testing.assert_frame_equal(
+            output.read(f'{tmp_path}/{name}-result000.csv'), output.read(f'{batch}/{name}-result000.csv'))
+    with open(tmp_path / 'telemetry.jsonl') as fp:
+        errors = {record['feature']: record['error'] for record in map(json.loads, fp)}
+    assert 'chunk failure' in errors[features[0].name]
+    assert errors[features[1].name] is None and errors[features[2].name] is None
@@ -0,0 +1,136 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import numpy
+import pytest
+from ascendcontroller.subjective import Opinion, averaging_fusion, cumulative_fusion
+
+
+def check(opinion: Opinion, belief, disbelief, uncertainty, base_rate=0.5):
+    numpy.testing.assert_allclose(opinion.belief, belief, atol=1e-12)
+    numpy.testing.assert_allclose(opinion.disbelief, disbelief, atol=1e-12)
+    numpy.testing.assert_allclose(opinion.uncertainty, uncertainty, atol=1e-12)
+    numpy.testing.assert_allclose(opinion.base_rate, base_rate, atol=1e-12)
+
+
+def evidence_fusion(opinions, average=False):
+    """ Fusion through the evidence (r, s) of the opinions with a prior weight of 2. """
+    r = numpy.array([2 * o.belief / o.uncertainty for o in opinions])
+    s = numpy.array([2 * o.disbelief / o.uncertainty for o in opinions])
+    r, s = (r.mean(axis=0), s.mean(axis=0)) if average else (r.sum(axis=0), s.sum(axis=0))
+    total = r + s + 2
+    return r / total, s / total, 2 / total
+
+
+A = Opinion.create(0.4, 0.2, 0.4)
+B = Opinion.create(0.6, 0.1, 0.3)
+
+
+def test_expectation():
+    numpy.testing.assert_allclose(Opinion.create(0.4, 0.2, 0.4, 0.25).expectation(), 0.5)
+    numpy.testing.assert_allclose(Opinion.vacuous(3, 0.3).expectation(), [0.3, 0.3, 0.3])
+
+
+def test_cumulative_fusion():
+    check(cumulative_fusion([A, B]), 0.36 / 0.58, 0.10 / 0.58, 0.12 / 0.58)
+
+
+def test_cumulative_fusion_base_rate():
+    # Base rates weighted by the evidence of each source
+    fused = cumulative_fusion([Opinion.create(0.4, 0.2, 0.4, 0.2), Opinion.create(0.6, 0.1, 0.3, 0.6)])
+    numpy.testing.assert_allclose(fused.base_rate, (0.6 * 0.3 * 0.2 + 0.7 * 0.4 * 0.6) / (0.6 * 0.3 + 0.7 * 0.4))
+
+
+def test_averaging_fusion():
+    check(averaging_fusion([A, B]), 0.36 / 0.7, 0.10 / 0.7, 0.24 / 0.7)
+
+
+@pytest.mark.parametrize('fusion, average', [(cumulative_fusion, False), (averaging_fusion, True)])
+def test_fusion_matches_evidence(fusion, average):
+    rng = numpy.random.default_rng(5)
+    opinions = []
+    for _ in range(4):
+        # Uncertainties of at least 0.01
+        belief, disbelief, uncertainty = rng.dirichlet([1, 1, 1], size=50).T * 0.99 + [[0], [0], [0.01]]
+        opinions.append(Opinion.create(belief, disbelief, uncertainty))
+    fused = fusion(opinions)
+    for actual, expected in zip(fused[:3], evidence_fusion(opinions, average)):
+        numpy.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+
+def test_vacuous_source_is_neutral_in_cumulative_fusion():
+    check(cumulative_fusion([A, Opinion.vacuous(())]), 0.4, 0.2, 0.4)
+    check(cumulative_fusion([Opinion.vacuous(()), Opinion.vacuous(())]), 0, 0, 1)
+
+
+# The cumulative base rate comes from the dogmatic sources, the averaging one from all the sources
+@pytest.mark.parametrize('fusion, base_rates', [
+    (cumulative_fusion, (0.3, 0.3, 0.35)),
+    (averaging_fusion, (0.4, 0.1 / 0.3, 0.4)),
+])
+def test_dogmatic_sources(fusion, base_rates):
+    dogmatic = Opinion.create(0.7, 0.3, 0.0, 0.3)
+    check(fusion([A, dogmatic]), 0.7, 0.3, 0.0, base_rates[0])
+    # A single dogmatic source dominates
+    check(fusion([dogmatic, B, Opinion.create(0.4, 0.2, 0.4, 0.2)]), 0.7, 0.3, 0.0, base_rates[1])
+    # Several dogmatic sources have equal weights
+    fused = fusion([dogmatic, A, Opinion.create(0.1, 0.9, 0.0, 0.4)])
+    check(fused, 0.4, 0.6, 0.0, base_rates[2])
+
+
+@pytest.mark.parametrize('fusion', [cumulative_fusion, averaging_fusion])
+def test_dogmatic_rows_do_not_leak(fusion):
+    # One dogmatic row among regular ones, fused element-wise
+    first = Opinion.create([0.4, 0.7], [0.2, 0.3], [0.4, 0.0])
+    fused = fusion([first, Opinion.create(0.6, 0.1, 0.3)])
+    expected = fusion([A, B])
+    check(Opinion(*[values[0] for values in fused]), expected.belief, expected.disbelief, expected.uncertainty)
+    check(Opinion(*[values[1] for values in fused]), 0.7, 0.3, 0.0)
+    assert numpy.isfinite(numpy.stack(fused)).all()
+
+
+def test_discount():
+    trust = Opinion.create(0.6, 0.2, 0.2)
+    check(A.discount(trust), 0.28, 0.14, 0.58)
+    check(A.discount(0.5), 0.2, 0.1, 0.7)
+
+
+def test_discount_by_dogmatic_trust():
+    check(A.discount(Opinion.create(1.0, 0.0, 0.0)), 0.4, 0.2, 0.4)
+    check(A.discount(Opinion.create(0.0, 1.0, 0.0)), 0, 0, 1)
+    check(Opinion.create(0.7, 0.3, 0.0).discount(0.5), 0.35, 0.15, 0.5)
@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------------
+# ASCEND Controller Framework
+#
+# Copyright (c) 2011-2022, ASCEND Controller Development Team
+# Copyright (c) 2011-2022, Open source contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    1. Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#
+#    2. Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in
+#       the documentation and/or other materials provided with the
+#       distribution.
+#
+#    3. Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ---------------------------------------------------------------------------
+
+import os
+import json
+import time
+import threading
+import pytest
+from ascendcontroller.base import CsvRunner
+from ascendcontroller.benchmark import FEATURES, ArtParam, simulation
+from ascendcontroller.features.art import ArtFeature
+from ascendcontroller.manifest import RunManifest
+from ascendcontroller.writer import BackgroundWriter, Writer
+
+
+class UnwritableFeature(ArtFeature):
+    """ ART whose result goes to a directory that does not exist. """
+
+    def process(self, data, columns=None):
+        return super().process(data, columns=columns)._replace(suffix='/missing/part')
+
+    def process_chunk(self, data, state, columns=None):
+        return super().process_chunk(data, state, columns=columns)._replace(suffix='/missing/part')
+
+
+@pytest.fixture(autouse=True)
+def cwd(monkeypatch, tmp_path):
+    # CsvRunner changes the working directory to the simulations path
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def simulations(tmp_path_factory):
+    path = tmp_path_factory.mktemp('sims')
+    for idx in range(2):
+        simulation(3000, seed=idx).to_csv(path / f'sim{idx:03d}.csv', index=False)
+    return path
+
+
+def run(simulations, destination, features, write_behind, chunksize=0):
+    CsvRunner(path=str(simulations), destination=f'{destination}/', features=features, processes=1,
+              idxfilter=[0, 1], chunksize=chunksize, executor='serial', write_behind=write_behind).process()
+
+
+def results(destination):
+    files = {}
+    for name in sorted(os.listdir(destination)):
+        if name.endswith('.csv'):
+            with open(os.path.join(destination, name), 'rb') as fp:
+                files[name] = fp.read()
+    return files
+
+
+def test_background_writer_order_and_errors():
+    done = []
+
+    def write(value):
+        time.sleep(0.001)
+        if value == 2:
+            raise OSError('disk full')
+        done.append((value, threading.current_thread().name))
+        return value
+
+    with BackgroundWriter(depth=1) as writer:
+        futures = [writer.submit(write, value) for value in range(5)]
+    assert [value for value, _ in done] == [0, 1, 3, 4]
+    assert {name for _, name in done} == {'writer'}
+    assert futures[0].result() == 0
+    with pytest.raises(OSError):
+        futures[2].result()
+    assert Writer().submit(write, 1).result() == 1
+
+
+@pytest.mark.parametrize('chunksize', [0, 1000])
+def test_output_independent_of_write_behind(simulations, tmp_path, chunksize):
+    features = list(FEATURES.values())
+    run(simulations, tmp_path / 'sync', features, 0, chunksize)
+    run(simulations, tmp_path / 'behind', features, 2, chunksize)
+    expected = results(tmp_path / 'sync')
+    assert len(expected) == 2 * len(features)
+    assert results(tmp_path / 'behind') == expected
+
+
+@pytest.mark.parametrize('write_behind', [0, 2])
+@pytest.mark.parametrize('chunksize', [0, 1000])
+def test_failing_write_fails_only_its_feature(simulations, tmp_path, write_behind, chunksize):
+    features = [UnwritableFeature(factory=ArtParam), FEATURES['saw'], FEATURES['dmv']]
+    run(simulations, tmp_path, features, write_behind, chunksize)
+    assert sorted(results(tmp_path)) == [f'{name}-result{idx:03d}.csv' for name in ('dmv', 'saw') for idx in range(2)]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    manifest = RunManifest(f'{tmp_path}/manifest.json')
+    for file in ('sim000.csv', 'sim001.csv'):
+        assert not manifest.done(file, features[0].name, features[0].signature())
+        for feature in features[1:]:
+            assert manifest.done(file, feature.name, feature.signature())
+    with open(tmp_path / 'telemetry.jsonl') as fp:
+        records = [json.loads(line) for line in fp]
+    for record in records:
+        assert (record['error'] is not None) == (record['feature'] == features[0].name)